@@ -1,23 +1,97 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+import importlib
+
 from .plugin import *
-from .plugin_accert import *
-from .plugin_openmc import *
-from .plugin_moose import *
-from .plugin_pyarc import *
-from .plugin_sas import *
-from .plugin_relap5 import *
-from .plugin_mcnp import *
-from .plugin_serpent import *
-from .plugin_abce import *
-from .plugin_dakota import *
 from .results import *
 from .template import *
 from .parameters import *
 from .database import *
 
-# This allows a user to write watts.Quantity
-from astropy.units import Quantity
-
 __version__ = '0.5.2-dev'
+
+# Plugins and their dependencies are only imported when they are first used so
+# that importing watts (e.g., for the command-line tool) stays fast
+_LAZY_ATTRIBUTES = {
+    'PluginABCE': '.plugin_abce',
+    'ResultsABCE': '.plugin_abce',
+    'PluginACCERT': '.plugin_accert',
+    'ResultsACCERT': '.plugin_accert',
+    'PluginDakota': '.plugin_dakota',
+    'ResultsDakota': '.plugin_dakota',
+    'DakotaEvaluationServer': '.plugin_dakota',
+    'run_dakota_driver': '.plugin_dakota',
+    'PluginMCNP': '.plugin_mcnp',
+    'ResultsMCNP': '.plugin_mcnp',
+    'expand_element': '.plugin_mcnp',
+    'PluginMOOSE': '.plugin_moose',
+    'ResultsMOOSE': '.plugin_moose',
+    'PluginOpenMC': '.plugin_openmc',
+    'ResultsOpenMC': '.plugin_openmc',
+    'PluginPyARC': '.plugin_pyarc',
+    'ResultsPyARC': '.plugin_pyarc',
+    'PluginRELAP5': '.plugin_relap5',
+    'ResultsRELAP5': '.plugin_relap5',
+    'PluginSAS': '.plugin_sas',
+    'ResultsSAS': '.plugin_sas',
+    'PluginSerpent': '.plugin_serpent',
+    'ResultsSerpent': '.plugin_serpent',
+    'ATOMIC_NUMBER': '.fundamental_data',
+    'ATOMIC_SYMBOL': '.fundamental_data',
+    'atomic_mass': '.fundamental_data',
+    'isotopes': '.fundamental_data',
+    'cd_tmpdir': '.fileutils',
+    # This allows a user to write watts.Quantity
+    'Quantity': 'astropy.units',
+    'ufloat': 'uncertainties',
+}
+
+# Modules that were available as attributes when all plugins were imported
+# eagerly, which are kept for backwards compatibility
+_LAZY_MODULES = {
+    'fundamental_data': '.fundamental_data',
+    'plugin_abce': '.plugin_abce',
+    'plugin_accert': '.plugin_accert',
+    'plugin_dakota': '.plugin_dakota',
+    'plugin_mcnp': '.plugin_mcnp',
+    'plugin_moose': '.plugin_moose',
+    'plugin_openmc': '.plugin_openmc',
+    'plugin_pyarc': '.plugin_pyarc',
+    'plugin_relap5': '.plugin_relap5',
+    'plugin_sas': '.plugin_sas',
+    'plugin_serpent': '.plugin_serpent',
+    'copy': 'copy',
+    'csv': 'csv',
+    'glob': 'glob',
+    'jinja2': 'jinja2',
+    'np': 'numpy',
+    'pd': 'pandas',
+    'pickle': 'pickle',
+    'subprocess': 'subprocess',
+    'u': 'astropy.units',
+}
+
+
+def _import(name):
+    # Imperial units are enabled whenever astropy.units is accessed via watts
+    if name == 'astropy.units':
+        from .parameters import _units
+        return _units()
+    return importlib.import_module(name, __name__)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(_import(_LAZY_ATTRIBUTES[name]), name)
+        globals()[name] = value
+        return value
+    if name in _LAZY_MODULES:
+        value = _import(_LAZY_MODULES[name])
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | set(_LAZY_MODULES))
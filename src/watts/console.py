@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+import json
 import sys
 
 import click
@@ -14,36 +15,44 @@ def main():
     pass
 
 
+def _parse_param(ctx, param, values):
+    """Convert KEY=VALUE options into a dictionary of parameters"""
+    params = {}
+    for item in values:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise click.BadParameter(f"'{item}' is not of the form KEY=VALUE")
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
 @click.command()
 @click.option('--job-id', default=None, type=int, help='Filter by job ID')
 @click.option('--last-job', is_flag=True, help='Display most recent job')
 @click.option('--plugin', default=None, help='Filter by plugin name')
 @click.option('--name', default=None, help='Filter by name')
+@click.option('--param', multiple=True, callback=_parse_param, metavar='KEY=VALUE',
+              help='Filter by parameter value (can be given multiple times)')
 @click.option('--database', default=None, help='Path to database')
-def results(job_id, last_job, plugin, name, database):
+def results(job_id, last_job, plugin, name, param, database):
     """List results"""
     db = Database(database) if database else Database()
     table = PrettyTable(field_names=['Index', 'Job ID', 'Plugin', 'Name', 'Time'], align='l')
 
     # Determine most recent job
-    if last_job:
-        job_ids = set()
-        for result in db:
-            if result.job_id is not None:
-                job_ids.add(result.job_id)
-        if job_ids:
-            job_id = max(job_ids)
-
-    for i, result in enumerate(db):
-        # Apply filters
-        if job_id is not None and job_id != result.job_id:
-            continue
-        if plugin is not None and plugin != result.plugin:
-            continue
-        if name is not None and name != result.name:
-            continue
-
-        table.add_row([i, result.job_id, result.plugin, result.name, result.time])
+    if last_job and db.last_job_id is not None:
+        job_id = db.last_job_id
+
+    # Matching results are found from the index without loading results
+    try:
+        records = db.query(plugin=plugin, name=name, job_id=job_id, params=param)
+    except TypeError as e:
+        raise click.BadParameter(str(e), param_hint="'--param'")
+    for record in records:
+        table.add_row([record.index, record.job_id, record.plugin, record.name, record.time])
     click.echo(table.get_string())
 
 
@@ -68,21 +77,41 @@ def dir(database, index):
 
 @click.command()
 @click.option('--database', default=None, help='Path to database')
+@click.option('--head', default=None, type=int, metavar='N',
+              help='Show only the first N lines')
+@click.option('--tail', default=None, type=int, metavar='N',
+              help='Show only the last N lines')
+@click.option('--grep', default=None, metavar='PATTERN',
+              help='Show only lines matching a regular expression')
 @click.argument('index', type=int)
-def stdout(database, index):
+def stdout(database, head, tail, grep, index):
     """Show standard output from a specific result
 
     The 'index' can be determined from the Index column when running 'watts
-    results'.
+    results'. Output is read as it is displayed, so the log is never loaded
+    into memory as a whole.
 
     """
+    if sum(x is not None for x in (head, tail, grep)) > 1:
+        raise click.UsageError("Only one of --head, --tail, and --grep can be given.")
+
     db = Database(database) if database else Database()
     try:
         result = db[index]
     except IndexError:
         click.echo(f"No result with index {index} in database at {db.path}", err=True)
         sys.exit(1)
-    click.echo(result.stdout)
+
+    if head is not None:
+        lines = result.stdout_head(head)
+    elif tail is not None:
+        lines = result.stdout_tail(tail)
+    elif grep is not None:
+        lines = result.grep_stdout(grep)
+    else:
+        lines = result.iter_stdout()
+    for line in lines:
+        click.echo(line, nl=False)
 
 
 @click.command()
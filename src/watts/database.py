@@ -1,21 +1,189 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+from collections import namedtuple, OrderedDict
 from collections.abc import Sequence
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import json
+import os
 from pathlib import Path
 import pprint
 import shutil
-from typing import Union
+import sqlite3
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from warnings import warn
 
 import platformdirs
 
+from .fileutils import PathLike, clone_file, file_hash
 from .results import Results
 
 
+# Name of the file within the database directory that holds the index
+_INDEX_FILENAME = '.index.sqlite3'
+
+# Name of the directory within the database directory where results are
+# assembled before being committed
+_STAGING_DIRNAME = '.staging'
+
+# Name of the directory within the database directory where the contents of
+# extra input files are stored once, named by their SHA-256 digest
+_BLOB_DIRNAME = '.blobs'
+
+# Number of seconds to wait for another process to release the index
+_INDEX_TIMEOUT = 60.0
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT UNIQUE NOT NULL,
+    job_id INTEGER,
+    plugin TEXT,
+    name TEXT,
+    timestamp INTEGER,
+    parameters TEXT,
+    input_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    result_id INTEGER NOT NULL REFERENCES results (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value
+);
+CREATE INDEX IF NOT EXISTS parameters_name_value ON parameters (name, value);
+CREATE INDEX IF NOT EXISTS parameters_result_id ON parameters (result_id);
+CREATE INDEX IF NOT EXISTS results_job_id ON results (job_id);
+CREATE INDEX IF NOT EXISTS results_plugin ON results (plugin);
+CREATE INDEX IF NOT EXISTS results_name ON results (name);
+CREATE INDEX IF NOT EXISTS results_timestamp ON results (timestamp);
+CREATE INDEX IF NOT EXISTS results_input_hash ON results (input_hash);
+"""
+
+# Columns of the results table used to create ResultRecord objects
+_RECORD_COLUMNS = "id, job_id, plugin, name, timestamp, path, parameters"
+
+# Number of matches above which record positions are determined from a single
+# scan of the index rather than counting for each match
+_POSITION_SCAN_THRESHOLD = 64
+
+
+def make_staging_directory(db_path: Path) -> Path:
+    """Create a new staging directory within a database directory
+
+    Staging directories are hidden from the database until they are committed
+    with :meth:`Database.add_result`. Because they live on the same filesystem
+    as the database, committing a result is a single directory rename.
+
+    Parameters
+    ----------
+    db_path
+        Path to database directory
+
+    Returns
+    -------
+    Path to the new staging directory
+    """
+    staging_root = Path(db_path) / _STAGING_DIRNAME
+    staging_root.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(dir=staging_root))
+
+
+def _save_result_info(result: Results, directory: Path):
+    """Atomically write the pickled result into a directory"""
+    # Results.save writes to a temporary file that replaces the pickle once
+    # it is complete
+    result.save(directory / ".result_info.pkl", separate_arrays=True)
+
+
+class ResultRecord(namedtuple('ResultRecord', [
+    'index', 'job_id', 'plugin', 'name', 'timestamp', 'path', 'parameters'])):
+    """Summary of a result as stored in the database index
+
+    Attributes
+    ----------
+    index
+        Position of the result in the database
+    job_id
+        Integer ID of job
+    plugin
+        Name of plugin
+    name
+        Name associated with execution of plugin
+    timestamp
+        Time at which plugin was executed in nanoseconds since the epoch
+    path
+        Path to directory storing results
+    parameters
+        Dictionary of parameters that have scalar values
+
+    """
+    __slots__ = ()
+
+    @property
+    def time(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp * 1e-9)
+
+
+def _summarize_parameters(result: Results) -> Dict[str, Any]:
+    """Return the scalar-valued parameters of a result"""
+    summary = {}
+    for key, value in result.parameters.items():
+        if not isinstance(key, str):
+            continue
+        if hasattr(value, 'item') and getattr(value, 'ndim', None) == 0:
+            # Convert numpy scalars to Python scalars (but not quantities)
+            if type(value).__module__ == 'numpy':
+                value = value.item()
+        if isinstance(value, (bool, int, float, str)):
+            summary[key] = value
+    return summary
+
+
+def _to_timestamp(time: Union[datetime, int, None]) -> Optional[int]:
+    """Convert a datetime to nanoseconds since the epoch"""
+    if isinstance(time, datetime):
+        return int(time.timestamp() * 1e6) * 1000
+    return time
+
+
 class Database(Sequence):
     """Database of simulation results
 
+    Results are stored in separate directories within the database directory.
+    An index of the results is kept in a SQLite file alongside them so that the
+    database can be opened without loading every result; a :class:`Results`
+    object is only unpickled when it is accessed, and at most
+    :attr:`cache_size` of the most recently used results are kept in memory.
+
+    Results can also be recorded with a hash of the inputs that produced them
+    so that a later execution with identical inputs can reuse them (see the
+    `reuse` argument of :meth:`Plugin.__call__`). Which results are eligible
+    for reuse is controlled by :attr:`reuse_max_age` and
+    :attr:`reuse_max_entries`.
+
+    Extra input files that are placed in execution directories with
+    :meth:`link_file` are stored once in the database, named by the digest of
+    their contents, and hard-linked into each result that uses them. Digests of
+    files are cached in the index by path, size, and modification time.
+
+    Several processes may use the same database directory at once. Changes to
+    the index are made in exclusive SQLite transactions, job IDs are taken
+    from a counter stored in the index, and a result directory only appears in
+    the database once it is complete.
+
     Parameters
     ----------
     path
@@ -23,19 +191,36 @@ class Database(Sequence):
 
     Attributes
     ----------
+    cache_size
+        Maximum number of loaded results kept in memory
     default_path
         Path used by default when creating instances if no path is specified
     job_id
         Integer ID assigned to new results
+    last_job_id
+        Largest job ID of results in the database, or None if there are none
+    link_inputs
+        Whether :meth:`link_file` stores files once in the database and links
+        them into directories, in which case the extra inputs stored with
+        results are read-only and shared between results. If False, files are
+        copied instead.
     path
         Base path for the database directory
-    results
-        List of simulation results in database
+    reuse_max_age
+        Maximum age of results that can be reused. If None, results of any age
+        can be reused.
+    reuse_max_entries
+        Maximum number of most recent results that can be reused. If None, any
+        result with an input hash can be reused.
 
     """
 
     _default_path = platformdirs.user_data_path('watts')
     _instances = {}
+    cache_size = 128
+    reuse_max_age: Optional[timedelta] = None
+    reuse_max_entries: Optional[int] = None
+    link_inputs = True
 
     def __new__(cls, path=None):
         # If no path specified, use global default
@@ -56,7 +241,7 @@ class Database(Sequence):
             path = self._default_path
 
         # If instance has already been created, no need to perform setup logic
-        if path in Database._instances:
+        if Path(path).resolve() in Database._instances:
             return
 
         # Create database directory if it doesn't already
@@ -64,38 +249,237 @@ class Database(Sequence):
         path.mkdir(parents=True, exist_ok=True)
         self._path = path
 
-        # Read previous results
-        self._results = []
-        for dir in sorted(self.path.iterdir(), key=lambda x: x.stat().st_ctime):
-            try:
-                self._results.append(Results.from_pickle(dir / ".result_info.pkl"))
-            except Exception:
-                warn(f"Could not read results from {dir}")
-
-        # Determine unique job ID based on what has already been used
-        used_job_ids = set()
-        for result in self:
-            job_id = getattr(result, 'job_id', None)
-            if job_id is not None:
-                used_job_ids.add(job_id)
-        self.job_id = max(used_job_ids, default=-1) + 1
+        # Results may be added from callbacks running on other threads
+        self._lock = threading.RLock()
+
+        # Open index and bring it up to date with the directories on disk
+        self._index = sqlite3.connect(
+            str(path / _INDEX_FILENAME), timeout=_INDEX_TIMEOUT,
+            isolation_level=None, check_same_thread=False)
+        self._index.execute("PRAGMA foreign_keys = ON")
+        self._index.executescript(_INDEX_SCHEMA)
+        self._cache = OrderedDict()
+        self._sync_index()
+
+        # Initialize the job ID counter based on what has already been used if
+        # this index predates the counter. The job ID for this instance is only
+        # taken from the counter when it is first needed.
+        row = self._index.execute(
+            "SELECT 1 FROM counters WHERE name = 'job_id'").fetchone()
+        if row is None:
+            with self._transaction():
+                self._index.execute(
+                    "INSERT OR IGNORE INTO counters (name, value) "
+                    "SELECT 'job_id', COALESCE(MAX(job_id) + 1, 0) FROM results")
+        self._job_id = None
 
         # Add instance to class-wide dictionary
         Database._instances[path.resolve()] = self
 
+    @contextmanager
+    def _transaction(self):
+        """Perform changes to the index in a transaction
+
+        The transaction takes the write lock on the index immediately, so other
+        threads and processes cannot modify the index until it is finished.
+        """
+        with self._lock:
+            self._index.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._index.execute("ROLLBACK")
+                raise
+            else:
+                self._index.execute("COMMIT")
+
+    def _index_changes(self) -> Tuple[List[str], List[os.DirEntry]]:
+        """Find index entries without a directory and directories not indexed"""
+        on_disk = {
+            entry.name: entry for entry in os.scandir(self.path)
+            if entry.is_dir() and not entry.name.startswith('.')
+        }
+        indexed = {row[0] for row in self._index.execute("SELECT path FROM results")}
+
+        # Entries whose directory no longer exists. Results that were added
+        # from outside the database directory are stored with an absolute path.
+        stale = [
+            p for p in indexed
+            if not (Path(p).is_dir() if Path(p).is_absolute() else p in on_disk)
+        ]
+
+        # Directories that haven't been indexed yet, e.g. ones created by older
+        # versions of WATTS
+        new_dirs = sorted(
+            (entry for name, entry in on_disk.items() if name not in indexed),
+            key=lambda x: x.stat().st_ctime
+        )
+        return stale, new_dirs
+
+    def _sync_index(self):
+        """Add directories missing from the index and remove stale entries"""
+        # The index is normally up to date, so it is first checked without
+        # taking the write lock to avoid serializing processes that only read
+        stale, new_dirs = self._index_changes()
+        if not stale and not new_dirs:
+            return
+
+        # Directories are listed again while holding the write lock so that
+        # results being committed by other processes are seen either with their
+        # index entry or not at all
+        with self._transaction():
+            stale, new_dirs = self._index_changes()
+            new_results = []
+            for entry in new_dirs:
+                try:
+                    result = Results.from_pickle(Path(entry.path) / ".result_info.pkl")
+                except Exception:
+                    warn(f"Could not read results from {entry.path}")
+                else:
+                    new_results.append((entry.name, result))
+
+            self._index.executemany(
+                "DELETE FROM results WHERE path = ?", [(p,) for p in stale])
+            for name, result in new_results:
+                self._insert(name, result)
+
+    def _insert(self, path: str, result: Results, input_hash: Optional[str] = None):
+        """Insert a row in the index for a result"""
+        parameters = _summarize_parameters(result)
+        cursor = self._index.execute(
+            "INSERT INTO results (path, job_id, plugin, name, timestamp, parameters, "
+            "input_hash) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, result.job_id, result.plugin, result.name,
+             result.exec_info.timestamp, json.dumps(parameters), input_hash)
+        )
+        self._index.executemany(
+            "INSERT INTO parameters (result_id, name, value) VALUES (?, ?, ?)",
+            [(cursor.lastrowid, key, value) for key, value in parameters.items()]
+        )
+
+        # Make sure job IDs handed out later don't collide with this result
+        if result.job_id is not None:
+            self._index.execute(
+                "UPDATE counters SET value = MAX(value, ?) WHERE name = 'job_id'",
+                (result.job_id + 1,))
+
+        # Only keep input hashes for the most recent results
+        if input_hash is not None and self.reuse_max_entries is not None:
+            self._index.execute(
+                "UPDATE results SET input_hash = NULL WHERE input_hash IS NOT NULL "
+                "AND id NOT IN (SELECT id FROM results WHERE input_hash IS NOT NULL "
+                "ORDER BY id DESC LIMIT ?)", (max(self.reuse_max_entries, 0),))
+
+    def _relative_path(self, result: Results) -> str:
+        """Path of a result directory as stored in the index"""
+        try:
+            return str(result.base_path.resolve().relative_to(self.path.resolve()))
+        except ValueError:
+            return str(result.base_path)
+
+    def _load(self, path: str) -> Results:
+        """Return result for an index path, unpickling it if necessary"""
+        with self._lock:
+            if path in self._cache:
+                self._cache.move_to_end(path)
+                return self._cache[path]
+        result = Results.from_pickle(self.path / path / ".result_info.pkl")
+        with self._lock:
+            return self._cache_result(path, result)
+
+    def _cache_result(self, path: str, result: Results) -> Results:
+        """Keep a result in memory, evicting the least recently used ones"""
+        result = self._cache.setdefault(path, result)
+        self._cache.move_to_end(path)
+        while len(self._cache) > max(self.cache_size, 0):
+            self._cache.popitem(last=False)
+        return result
+
+    def _positions(self, ids: List[int]) -> List[int]:
+        """Positions in the database of results with given index IDs"""
+        if len(ids) <= _POSITION_SCAN_THRESHOLD:
+            return [
+                self._index.execute(
+                    "SELECT COUNT(*) FROM results WHERE id < ?", (i,)).fetchone()[0]
+                for i in ids
+            ]
+        position = {i: n for n, (i,) in enumerate(
+            self._index.execute("SELECT id FROM results ORDER BY id"))}
+        return [position[i] for i in ids]
+
+    def _records(self, rows: Iterable[tuple]) -> List[ResultRecord]:
+        """Create records from rows of the results table"""
+        rows = list(rows)
+        positions = self._positions([row[0] for row in rows])
+        return [
+            ResultRecord(index, job_id, plugin, name, timestamp,
+                         self.path / path, json.loads(parameters))
+            for index, (_, job_id, plugin, name, timestamp, path, parameters)
+            in zip(positions, rows)
+        ]
+
+    def _paths(self) -> List[str]:
+        return [row[0] for row in self._index.execute(
+            "SELECT path FROM results ORDER BY id")]
+
     def __repr__(self):
-        return pprint.pformat(self._results)
+        return pprint.pformat(list(self))
+
+    def __contains__(self, value):
+        if not isinstance(value, Results):
+            return False
+        row = self._index.execute(
+            "SELECT 1 FROM results WHERE path = ?", (self._relative_path(value),)
+        ).fetchone()
+        return row is not None
+
+    def __reversed__(self) -> Iterator[Results]:
+        for path, in self._index.execute("SELECT path FROM results ORDER BY id DESC"):
+            yield self._load(path)
 
     def __getitem__(self, index):
-        return self._results[index]
+        if isinstance(index, slice):
+            return [self._load(p) for p in self._paths()[index]]
+
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("Database index out of range")
+        row = self._index.execute(
+            "SELECT path FROM results ORDER BY id LIMIT 1 OFFSET ?", (index,)
+        ).fetchone()
+        return self._load(row[0])
+
+    def __iter__(self) -> Iterator[Results]:
+        for path, in self._index.execute("SELECT path FROM results ORDER BY id"):
+            yield self._load(path)
 
     def __len__(self):
-        return len(self._results)
+        n, = self._index.execute("SELECT COUNT(*) FROM results").fetchone()
+        return n
 
     @property
     def path(self) -> Path:
         return self._path
 
+    @property
+    def job_id(self) -> int:
+        if self._job_id is None:
+            # Take the next job ID from the counter stored in the index
+            with self._transaction():
+                self._index.execute(
+                    "UPDATE counters SET value = value + 1 WHERE name = 'job_id'")
+                value, = self._index.execute(
+                    "SELECT value FROM counters WHERE name = 'job_id'").fetchone()
+                self._job_id = value - 1
+        return self._job_id
+
+    @property
+    def last_job_id(self) -> Optional[int]:
+        value, = self._index.execute("SELECT MAX(job_id) FROM results").fetchone()
+        return value
+
     @property
     def default_path(self) -> Path:
         return self.get_default_path()
@@ -126,25 +510,306 @@ class Database(Sequence):
         """
         return cls._default_path
 
-    def add_result(self, result: Results):
+    def records(self) -> List[ResultRecord]:
+        """Return summaries of all results from the index
+
+        Unlike iterating over the database, this does not load any
+        :class:`Results` objects.
+
+        Returns
+        -------
+        List of result summaries in the same order as the database
+        """
+        return self._records(self._index.execute(
+            f"SELECT {_RECORD_COLUMNS} FROM results ORDER BY id"))
+
+    def query(
+        self,
+        plugin: Optional[str] = None,
+        name: Optional[str] = None,
+        job_id: Optional[int] = None,
+        time_range: Optional[Tuple[Optional[datetime], Optional[datetime]]] = None,
+        params: Optional[Dict[str, Any]] = None
+    ) -> List[ResultRecord]:
+        """Find results matching all of the given criteria
+
+        The search is answered from the index without loading any
+        :class:`Results` objects. Use the :attr:`ResultRecord.index` of a
+        match to retrieve the corresponding result from the database.
+
+        Parameters
+        ----------
+        plugin
+            Name of plugin
+        name
+            Name associated with execution of plugin
+        job_id
+            Integer ID of job
+        time_range
+            Tuple of (start, end) times between which the plugin was executed,
+            inclusive. Either may be None to leave that side unbounded.
+        params
+            Dictionary of parameter values. Only parameters with scalar values
+            (bool, int, float, or str) can be matched.
+
+        Returns
+        -------
+        Records of matching results in the same order as the database
+        """
+        clauses = []
+        args = []
+        for column, value in [('plugin', plugin), ('name', name), ('job_id', job_id)]:
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if time_range is not None:
+            start, end = map(_to_timestamp, time_range)
+            if start is not None:
+                clauses.append("timestamp >= ?")
+                args.append(start)
+            if end is not None:
+                clauses.append("timestamp <= ?")
+                args.append(end)
+        for key, value in (params or {}).items():
+            if not isinstance(value, (bool, int, float, str)):
+                raise TypeError(
+                    f"Cannot query parameter '{key}' with non-scalar value {value!r}")
+            clauses.append(
+                "id IN (SELECT result_id FROM parameters WHERE name = ? AND value = ?)")
+            args.extend([key, value])
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._index.execute(
+            f"SELECT {_RECORD_COLUMNS} FROM results{where} ORDER BY id", args)
+        return self._records(rows)
+
+    def add_result(self, result: Results, staging_path: Optional[PathLike] = None,
+                   input_hash: Optional[str] = None):
         """Add a result to the database
 
         Parameters
         ----------
         result
             Simulation results to add
+        staging_path
+            Directory created by :func:`make_staging_directory` that currently
+            holds the files of the result. If given, it is renamed to
+            ``result.base_path`` as part of adding the result; if the result
+            cannot be added, the staging directory is removed.
+        input_hash
+            Hash of the inputs that produced the result, allowing it to be
+            found by :meth:`find_reusable`
+
+        """
+        if staging_path is None:
+            # Save result info that can be recreated
+            _save_result_info(result, result.base_path)
+            path = self._relative_path(result)
+            with self._transaction():
+                self._insert(path, result, input_hash)
+                self._cache_result(path, result)
+            return
+
+        staging_path = Path(staging_path)
+        try:
+            _save_result_info(result, staging_path)
+            path = self._relative_path(result)
+            with self._transaction():
+                # The destination is checked while holding the write lock since
+                # renaming onto an empty directory would silently replace it
+                if result.base_path.exists():
+                    raise FileExistsError(
+                        f"Result directory {result.base_path} already exists")
+                os.rename(staging_path, result.base_path)
+                try:
+                    self._insert(path, result, input_hash)
+                except BaseException:
+                    os.rename(result.base_path, staging_path)
+                    raise
+                self._cache_result(path, result)
+        except BaseException:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+
+    def find_reusable(self, input_hash: str) -> Optional[Results]:
+        """Find the most recent result produced from identical inputs
 
+        Parameters
+        ----------
+        input_hash
+            Hash of the inputs of an execution
+
+        Returns
+        -------
+        Result that can be reused, or None if there is no such result
+        """
+        sql = "SELECT path FROM results WHERE input_hash = ?"
+        args = [input_hash]
+        if self.reuse_max_age is not None:
+            sql += " AND timestamp >= ?"
+            args.append(_to_timestamp(datetime.now() - self.reuse_max_age))
+        sql += " ORDER BY id DESC"
+        for path, in self._index.execute(sql, args).fetchall():
+            try:
+                return self._load(path)
+            except OSError:
+                # Files were removed without going through the database
+                continue
+        return None
+
+    def clear_input_hashes(self, plugin: Optional[str] = None):
+        """Prevent existing results from being reused
+
+        The results themselves remain in the database.
+
+        Parameters
+        ----------
+        plugin
+            Only prevent results of this plugin from being reused
         """
-        self._results.append(result)
+        sql = "UPDATE results SET input_hash = NULL"
+        args = []
+        if plugin is not None:
+            sql += " WHERE plugin = ?"
+            args.append(plugin)
+        with self._transaction():
+            self._index.execute(sql, args)
 
-        # Save result info that can be recreated
-        result.save(result.base_path / ".result_info.pkl")
+    def file_digest(self, path: PathLike) -> str:
+        """Compute the SHA-256 digest of a file, reusing a cached value
+
+        The digest is cached in the index and only recomputed when the size or
+        modification time of the file changes.
+
+        Parameters
+        ----------
+        path
+            Path to file
+
+        Returns
+        -------
+        Hexadecimal digest of the file contents
+        """
+        path = Path(path).resolve()
+        stat = path.stat()
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        row = self._index.execute(
+            "SELECT digest FROM file_hashes WHERE path = ? AND size = ? "
+            "AND mtime_ns = ?", key).fetchone()
+        if row is not None:
+            return row[0]
+
+        digest = file_hash(path)
+
+        # Only cache the digest if the file didn't change while being read
+        stat = path.stat()
+        if key == (str(path), stat.st_size, stat.st_mtime_ns):
+            with self._transaction():
+                self._index.execute(
+                    "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, digest) "
+                    "VALUES (?, ?, ?, ?)", key + (digest,))
+        return digest
+
+    def _store_blob(self, path: Path, digest: str) -> Path:
+        """Store the contents of a file in the database if not already present"""
+        # Files that are executable are stored separately so that links to the
+        # stored file have the same permissions as the original
+        mode = 0o555 if path.stat().st_mode & 0o111 else 0o444
+        blob = self.path / _BLOB_DIRNAME / digest[:2] / f'{digest}-{mode:o}'
+        if blob.exists():
+            return blob
+
+        # Write to a temporary file first so that other processes never see a
+        # partially written file
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=blob.parent, prefix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(path, tmp_name)
+            # Stored files are shared by every result linking to them, so they
+            # are made read-only. On Windows, read-only files can't be deleted
+            # by shutil.rmtree, so they are left as is.
+            if sys.platform != 'win32':
+                os.chmod(tmp_name, mode)
+            os.replace(tmp_name, blob)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        return blob
+
+    def link_file(self, path: PathLike, directory: PathLike,
+                  digest: Optional[str] = None) -> str:
+        """Place a file in a directory, storing its contents once in the database
+
+        The contents of the file are stored in the database the first time the
+        file is seen, and the file in `directory` is created as a hard link to
+        the stored copy, so any number of results can hold the same file while
+        it only takes up space once. Because of this, linked files are
+        read-only and must not be modified in place. Where a hard link can't be
+        made, the file is copied instead, sharing its data with the original if
+        the filesystem supports reflinks.
+
+        Parameters
+        ----------
+        path
+            Path to the file
+        directory
+            Directory in which the file is placed with the same name
+        digest
+            Hexadecimal SHA-256 digest of the file contents, if already known
+
+        Returns
+        -------
+        Hexadecimal SHA-256 digest of the file contents
+        """
+        path = Path(path)
+        dst = Path(directory) / path.name
+        if digest is None:
+            digest = self.file_digest(path)
+        if not self.link_inputs:
+            clone_file(path, dst)
+            return digest
+
+        try:
+            os.link(self._store_blob(path, digest), dst)
+        except OSError:
+            # The filesystem doesn't support hard links, the stored file has
+            # reached its maximum number of links, or it was just pruned
+            clone_file(path, dst)
+        return digest
+
+    def _prune_blobs(self):
+        """Remove stored files that are no longer linked from any result"""
+        for blob in (self.path / _BLOB_DIRNAME).glob('*/*'):
+            if blob.name.startswith('.tmp'):
+                continue
+            try:
+                if blob.stat().st_nlink == 1:
+                    blob.unlink()
+            except OSError:
+                pass
+
+    def _discard(self, directory: PathLike) -> Path:
+        """Move a result directory out of the database to be deleted later"""
+        trash = make_staging_directory(self.path)
+        os.rename(directory, trash / 'discarded')
+        return trash
 
     def clear(self):
         """Remove all results from database"""
-        for dir in self.path.iterdir():
-            shutil.rmtree(dir)
-        self._results.clear()
+        with self._transaction():
+            trash = [
+                self._discard(entry.path) for entry in os.scandir(self.path)
+                if entry.is_dir() and not entry.name.startswith('.')
+            ]
+            self._index.execute("DELETE FROM results")
+            self._cache.clear()
+
+        # Deleting files can be slow, so do it after releasing the index
+        for path in trash:
+            shutil.rmtree(path)
+        self._prune_blobs()
 
     def remove(self, result: Results):
         """Remove a single result from the database
@@ -155,13 +820,26 @@ class Database(Sequence):
             Result to remove from the database
 
         """
-        self._results.remove(result)
-        shutil.rmtree(result.base_path)
+        path = self._relative_path(result)
+        with self._transaction():
+            cursor = self._index.execute("DELETE FROM results WHERE path = ?", (path,))
+            if cursor.rowcount == 0:
+                raise ValueError(f"{result} is not in the database")
+            self._cache.pop(path, None)
+            trash = self._discard(result.base_path)
+        shutil.rmtree(trash)
+        self._prune_blobs()
 
     def show_summary(self):
         """Show a summary of results in database"""
-        for result in self._results:
+        for result in self:
             rel_path = result.base_path.relative_to(self.path)
             print(result.time, result.plugin, str(rel_path),
                   f"({len(result.inputs)} inputs)",
                   f"({len(result.outputs)} outputs)")
+
+
+if hasattr(os, 'register_at_fork'):
+    # SQLite connections can't be used in a forked child process, so make sure
+    # that databases are opened anew there
+    os.register_at_fork(after_in_child=Database._instances.clear)
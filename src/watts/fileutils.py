@@ -1,44 +1,112 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+import codecs
+from collections import deque
 from contextlib import contextmanager
-import errno
+from contextvars import ContextVar
+import hashlib
+from itertools import islice
 import os
+from pathlib import Path
 import platform
-import select
+import selectors
 import shutil
 import subprocess
 import sys
 import tempfile
-from typing import Union
-
-if sys.platform != 'win32':
-    import fcntl
+import threading
+from typing import Dict, Iterator, List, Mapping, Optional, Union
 
 # Type for arguments that accept file paths
 PathLike = Union[str, bytes, os.PathLike]
 
+# Maximum number of bytes read from a subprocess pipe at once
+_PIPE_CHUNK_SIZE = 65536
+
+# Number of bytes read from a file at once when computing its hash
+_HASH_CHUNK_SIZE = 1 << 20
+
+# Number of bytes read at once when reading the end of a log file backwards
+_TAIL_BLOCK_SIZE = 1 << 16
+
+# File name suffixes of compressed log files
+_LOG_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# ioctl request that makes a file share the data blocks of another on Linux
+# filesystems supporting reflinks (Btrfs, XFS)
+_FICLONE = 0x40049409
+
 
 @contextmanager
-def cd_tmpdir(cleanup: bool = True):
-    """Context manager to change to/return from a tmpdir.
+def temporary_directory(cleanup: bool = True, dir: Optional[PathLike] = None):
+    """Context manager that creates a temporary directory
+
+    Unlike :func:`cd_tmpdir`, the working directory of the process is not
+    changed, so multiple temporary directories can be in use at once.
 
     Parameters
     ----------
     cleanup
         Whether to clean up the temporary directory
+    dir
+        Directory in which the temporary directory is created, which is
+        created if needed. Defaults to the system's temporary directory.
+
+    Yields
+    ------
+    pathlib.Path
+        Path to the temporary directory
     """
-    tmpdir = tempfile.mkdtemp()
-    cwd = os.getcwd()
+    if dir is not None:
+        Path(dir).mkdir(parents=True, exist_ok=True)
+    tmpdir = Path(tempfile.mkdtemp(dir=dir))
     try:
-        os.chdir(tmpdir)
-        yield
+        yield tmpdir
     finally:
-        os.chdir(cwd)
         if cleanup:
             shutil.rmtree(tmpdir)
 
 
+# Changing the working directory affects the entire process, so any code that
+# relies on it is serialized with this lock
+_cwd_lock = threading.RLock()
+
+
+@contextmanager
+def working_directory(path: PathLike):
+    """Context manager to change to/return from a directory.
+
+    The working directory is shared by every thread in the process, so only one
+    thread at a time may be inside this context manager.
+
+    Parameters
+    ----------
+    path
+        Directory to change to
+    """
+    with _cwd_lock:
+        cwd = os.getcwd()
+        try:
+            os.chdir(path)
+            yield
+        finally:
+            os.chdir(cwd)
+
+
+@contextmanager
+def cd_tmpdir(cleanup: bool = True):
+    """Context manager to change to/return from a tmpdir.
+
+    Parameters
+    ----------
+    cleanup
+        Whether to clean up the temporary directory
+    """
+    with temporary_directory(cleanup) as tmpdir, working_directory(tmpdir):
+        yield
+
+
 def open_file(path: PathLike):
     """Open a file in explorer/finder/nautilus
 
@@ -55,18 +123,396 @@ def open_file(path: PathLike):
         subprocess.Popen(["xdg-open", str(path)])
 
 
-class _TeeStream:
-    """This class acts as both a context manager (__enter__ and __exit__
-    methods) as well as a file stream (write, flush, and isatty methods).
+def file_hash(path: PathLike) -> str:
+    """Compute the SHA-256 digest of the contents of a file
 
-    Roughly based on code in https://github.com/algrebe/python-tee as well as
-    the Python standard library
+    Parameters
+    ----------
+    path
+        Path to file
+
+    Returns
+    -------
+    Hexadecimal digest of the file contents
     """
-    _stream = None
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
 
-    def __init__(self, new_target):
+
+def scan_directory(path: PathLike) -> Dict[str, os.stat_result]:
+    """Get the status of every file in a directory with a single scan
+
+    Parameters
+    ----------
+    path
+        Path to directory
+
+    Returns
+    -------
+    Status of each regular file in the directory, keyed by file name.
+    Subdirectories are not included.
+    """
+    files = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_file():
+                files[entry.name] = entry.stat()
+    return files
+
+
+def file_changed(before: Optional[os.stat_result], after: os.stat_result) -> bool:
+    """Determine whether a file was created or modified between two scans
+
+    Parameters
+    ----------
+    before
+        Status of the file from the earlier scan, or None if it didn't exist
+    after
+        Status of the file from the later scan
+
+    Returns
+    -------
+    Whether the file is new or has changed
+    """
+    if before is None:
+        return True
+    return (before.st_ino, before.st_size, before.st_mtime_ns) != \
+        (after.st_ino, after.st_size, after.st_mtime_ns)
+
+
+def clone_file(src: PathLike, dst: PathLike):
+    """Copy a file, sharing its data with the original where possible
+
+    On Linux filesystems that support reflinks, the copy shares the data blocks
+    of the original until either is modified. Otherwise, the data is copied.
+    The permission bits of the file are copied in either case.
+
+    Parameters
+    ----------
+    src
+        Path to the file to copy
+    dst
+        Path of the copy
+    """
+    if sys.platform.startswith('linux'):
+        import fcntl
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            pass
+        else:
+            shutil.copymode(src, dst)
+            return
+    shutil.copy(src, dst)
+
+
+def _open_text(path: PathLike, mode: str, compression: Optional[str]):
+    """Open a text file that is optionally compressed"""
+    if compression is None:
+        return open(path, mode, encoding='utf-8', errors='replace')
+    elif compression == 'gzip':
+        import gzip
+        # Favor speed over size since logs are compressed as they are written
+        return gzip.open(path, mode, compresslevel=1, encoding='utf-8',
+                         errors='replace')
+    elif compression == 'zstd':
+        try:
+            from compression import zstd
+        except ImportError:
+            import zstandard as zstd
+        return zstd.open(path, mode, encoding='utf-8', errors='replace')
+    raise ValueError(f"Unknown compression '{compression}'. Must be one of "
+                     "'gzip' or 'zstd'.")
+
+
+class LogFile:
+    """Text stream that writes to a log file with optional size limits
+
+    When `max_size` is given, the log is rotated once that many characters
+    have been written to it: the current file is renamed by appending ".1" to
+    its name (older files being renamed to ".2", ".3", etc.) and a new file is
+    started, with files beyond `backup_count` removed. The log can also be
+    compressed as it is written, in which case a ".gz" or ".zst" suffix is
+    added to the name of each file.
+
+    Parameters
+    ----------
+    path
+        Path to the log file without any compression suffix
+    max_size
+        Number of characters written to a file before the log is rotated. If
+        None, the log is never rotated.
+    backup_count
+        Number of rotated files that are kept
+    compression : {None, 'gzip', 'zstd'}
+        Compression applied to the log files. zstd compression requires Python
+        3.14+ or the zstandard package.
+
+    """
+
+    def __init__(self, path: PathLike, max_size: Optional[int] = None,
+                 backup_count: int = 1, compression: Optional[str] = None):
+        if compression not in _LOG_SUFFIXES:
+            raise ValueError(f"Unknown compression '{compression}'. Must be one "
+                             "of 'gzip' or 'zstd'.")
+        self.path = Path(path)
+        self.max_size = max_size
+        self.backup_count = backup_count
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._size = 0
+        self._file = _open_text(self._segment(0), 'wt', compression)
+
+    def _segment(self, index: int) -> Path:
+        """Path to the file that is `index` rotations old"""
+        name = self.path.name if index == 0 else f'{self.path.name}.{index}'
+        return self.path.with_name(name + _LOG_SUFFIXES[self.compression])
+
+    def _rotate(self):
+        """Start a new log file, renaming the existing ones"""
+        self._file.close()
+        oldest = self._segment(self.backup_count)
+        if oldest.exists():
+            oldest.unlink()
+        for i in range(self.backup_count, 0, -1):
+            src = self._segment(i - 1)
+            if src.exists():
+                os.replace(src, self._segment(i))
+        self._file = _open_text(self._segment(0), 'wt', self.compression)
+        self._size = 0
+
+    def write(self, message: str) -> int:
+        with self._lock:
+            if self.max_size is None:
+                return self._file.write(message)
+
+            # Messages are split so that no file exceeds the maximum size
+            written = 0
+            while message:
+                if self._size >= self.max_size:
+                    if self.backup_count > 0:
+                        self._rotate()
+                    else:
+                        # Without backups, output beyond the limit is dropped
+                        break
+                part = message[:self.max_size - self._size]
+                message = message[len(part):]
+                self._size += len(part)
+                written += self._file.write(part)
+            return written
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_inst, exc_tb):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def log_files(path: PathLike) -> List[Path]:
+    """Find the files of a log written by :class:`LogFile`
+
+    Parameters
+    ----------
+    path
+        Path to the log file without any compression suffix
+
+    Returns
+    -------
+    Paths of the files holding the log, from oldest to newest
+    """
+    path = Path(path)
+    segments = []
+    try:
+        with os.scandir(path.parent) as it:
+            names = [entry.name for entry in it]
+    except FileNotFoundError:
+        return []
+    for name in names:
+        if not name.startswith(path.name):
+            continue
+        rest = name[len(path.name):]
+        for suffix in ('.gz', '.zst'):
+            if rest.endswith(suffix):
+                rest = rest[:-len(suffix)]
+                break
+        if rest == '':
+            segments.append((0, name))
+        elif rest[:1] == '.' and rest[1:].isdigit():
+            segments.append((int(rest[1:]), name))
+    return [path.with_name(name) for _, name in sorted(segments, reverse=True)]
+
+
+def _compression(path: Path) -> Optional[str]:
+    """Determine the compression of a log file from its name"""
+    for compression, suffix in _LOG_SUFFIXES.items():
+        if suffix and path.name.endswith(suffix):
+            return compression
+    return None
+
+
+def iter_log(path: PathLike) -> Iterator[str]:
+    """Iterate over the lines of a log written by :class:`LogFile`
+
+    Lines are read one at a time, decompressing as needed, so the log is never
+    loaded into memory as a whole.
+
+    Parameters
+    ----------
+    path
+        Path to the log file without any compression suffix
+
+    Yields
+    ------
+    str
+        Each line of the log, including its line ending
+    """
+    files = log_files(path)
+    if not files:
+        raise FileNotFoundError(f"No log file found at {path}")
+    # A line may be split across files when the log is rotated
+    partial = ''
+    for file in files:
+        with _open_text(file, 'rt', _compression(file)) as fh:
+            for line in fh:
+                if partial:
+                    line = partial + line
+                    partial = ''
+                if line.endswith('\n'):
+                    yield line
+                else:
+                    partial = line
+    if partial:
+        yield partial
+
+
+def _tail_lines(path: Path, n: int) -> List[str]:
+    """Read the last lines of a single log file"""
+    compression = _compression(path)
+    if compression is not None:
+        # Compressed files can't be read backwards, so only the lines that may
+        # be returned are kept while reading through the file
+        with _open_text(path, 'rt', compression) as fh:
+            return list(deque(fh, maxlen=n))
+
+    # Read blocks from the end of the file until enough lines are found
+    with open(path, 'rb') as fh:
+        position = fh.seek(0, os.SEEK_END)
+        data = b''
+        while position > 0 and data.count(b'\n') <= n:
+            size = min(_TAIL_BLOCK_SIZE, position)
+            position -= size
+            fh.seek(position)
+            data = fh.read(size) + data
+    lines = data.decode('utf-8', errors='replace').splitlines(keepends=True)
+    return lines[-n:]
+
+
+def log_tail(path: PathLike, n: int = 10) -> List[str]:
+    """Get the last lines of a log written by :class:`LogFile`
+
+    Parameters
+    ----------
+    path
+        Path to the log file without any compression suffix
+    n
+        Number of lines
+
+    Returns
+    -------
+    Last `n` lines of the log, including their line endings
+    """
+    files = log_files(path)
+    if not files:
+        raise FileNotFoundError(f"No log file found at {path}")
+    # Files are read from newest to oldest until there is a line before the
+    # ones that are returned, since the first line of a file may continue a
+    # line that was split when the log was rotated
+    lines = []
+    for file in reversed(files):
+        if len(lines) > n:
+            break
+        older = _tail_lines(file, n + 1 - len(lines))
+        if lines and older and not older[-1].endswith('\n'):
+            lines[0] = older.pop() + lines[0]
+        lines = older + lines
+    return lines[-n:] if n > 0 else []
+
+
+def log_head(path: PathLike, n: int = 10) -> List[str]:
+    """Get the first lines of a log written by :class:`LogFile`
+
+    Parameters
+    ----------
+    path
+        Path to the log file without any compression suffix
+    n
+        Number of lines
+
+    Returns
+    -------
+    First `n` lines of the log, including their line endings
+    """
+    lines = iter_log(path)
+    try:
+        return list(islice(lines, n))
+    finally:
+        lines.close()
+
+
+class _ContextStream:
+    """Stream that stands in for sys.stdout/sys.stderr and forwards writes to a
+    target that is local to the current thread or asyncio task.
+
+    When no target has been set in the current context, writes go to the stream
+    that was in place when this object was installed.
+    """
+
+    def __init__(self, target: ContextVar, fallback):
+        self._target = target
+        self.fallback = fallback
+
+    @property
+    def current(self):
+        stream = self._target.get()
+        return self.fallback if stream is None else stream
+
+    def write(self, message):
+        return self.current.write(message)
+
+    def flush(self):
+        self.current.flush()
+
+    def isatty(self):
+        return self.current.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self.current, name)
+
+
+class _Tee:
+    """Stream that writes to two other streams"""
+
+    def __init__(self, new_target, old_target):
         self._new_target = new_target
-        self._old_target = None
+        self._old_target = old_target
 
     def write(self, message):
         self._new_target.write(message)
@@ -76,67 +522,172 @@ class _TeeStream:
         self._new_target.flush()
         self._old_target.flush()
 
+    def isatty(self):
+        return self._new_target.isatty()
+
+
+class _RedirectStream:
+    """Context manager that redirects sys.stdout or sys.stderr for the current
+    thread or asyncio task only.
+
+    While any redirection is active, the stream on the sys module is replaced
+    by a :class:`_ContextStream` so that other threads/tasks are unaffected.
+
+    Roughly based on code in https://github.com/algrebe/python-tee as well as
+    the Python standard library
+    """
+    _stream = None
+    _target = None
+    _lock = threading.Lock()
+    _active = {}
+
+    def __init__(self, new_target):
+        self._new_target = new_target
+        self._token = None
+
+    def _wrap(self, old_target):
+        return self._new_target
+
     def __enter__(self):
-        self._old_target = getattr(sys, self._stream)
-        setattr(sys, self._stream, self)
+        cls = _RedirectStream
+        with cls._lock:
+            proxy = getattr(sys, self._stream)
+            if not isinstance(proxy, _ContextStream):
+                proxy = _ContextStream(self._target, proxy)
+                setattr(sys, self._stream, proxy)
+                cls._active[self._stream] = 0
+            cls._active[self._stream] += 1
+        self._token = self._target.set(self._wrap(proxy.current))
+        return self._new_target
 
     def __exit__(self, exc_type, exc_inst, exc_tb):
-        setattr(sys, self._stream, self._old_target)
+        cls = _RedirectStream
+        self._target.reset(self._token)
+        with cls._lock:
+            cls._active[self._stream] -= 1
+            proxy = getattr(sys, self._stream)
+            if cls._active[self._stream] == 0 and isinstance(proxy, _ContextStream):
+                setattr(sys, self._stream, proxy.fallback)
 
-    def isatty(self):
-        return self._new_target.isatty()
 
+_stdout_target = ContextVar('watts_stdout_target', default=None)
+_stderr_target = ContextVar('watts_stderr_target', default=None)
 
-class tee_stdout(_TeeStream):
-    """Context manager for simulataneously writing to stdout and another stream"""
+
+class redirect_stdout(_RedirectStream):
+    """Context manager for redirecting stdout to another stream"""
     _stream = "stdout"
+    _target = _stdout_target
 
 
-class tee_stderr(_TeeStream):
-    """Context manager for simulataneously writing to stderr and another stream"""
+class redirect_stderr(_RedirectStream):
+    """Context manager for redirecting stderr to another stream"""
     _stream = "stderr"
+    _target = _stderr_target
+
 
+class tee_stdout(redirect_stdout):
+    """Context manager for simulataneously writing to stdout and another stream"""
+
+    def _wrap(self, old_target):
+        return _Tee(self._new_target, old_target)
+
+
+class tee_stderr(redirect_stderr):
+    """Context manager for simulataneously writing to stderr and another stream"""
+
+    def _wrap(self, old_target):
+        return _Tee(self._new_target, old_target)
 
-def run(args):
+
+def run(args: List[str], cwd: Optional[PathLike] = None,
+        env: Optional[Mapping[str, str]] = None) -> int:
     """Function that mimics subprocess.run but actually writes to sys.stdout and
     sys.stderr (not the same as the underlying file descriptors)
 
-    Based on https://stackoverflow.com/a/12272262 and
-    https://stackoverflow.com/a/7730201
+    Output from the subprocess is pumped in bounded chunks as soon as it becomes
+    available. The calling thread blocks in :func:`selectors.BaseSelector.select`
+    while waiting, so no CPU time is consumed while the subprocess is running.
+
+    Parameters
+    ----------
+    args
+        Command-line arguments of the process to run
+    cwd
+        Working directory of the process. Defaults to the current working
+        directory.
+    env
+        Environment variables of the process. Defaults to the environment of
+        the current process.
+
+    Returns
+    -------
+    Exit code of the process
     """
-    # Windows doesn't support select.select and fcntl module so just default to
-    # using subprocess.run. In this case, show_stdout/show_stderr won't work.
+    # Windows doesn't support selecting on pipes so just default to using
+    # subprocess.run. In this case, show_stdout/show_stderr won't work.
     if sys.platform == 'win32':
-        subprocess.run(args)
-        return
+        return subprocess.run(args, cwd=cwd, env=env).returncode
 
-    # Helper function to add the O_NONBLOCK flag to a file descriptor
-    def make_async(fd):
-        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+    p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         cwd=cwd, env=env)
 
-    # Helper function to read some data from a file descriptor, ignoring EAGAIN errors
-    def read_async(fd):
-        try:
-            return fd.read()
-        except IOError as e:
-            if e.errno != errno.EAGAIN:
-                raise e
-            else:
-                return ''
-
-    p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    make_async(p.stdout)
-    make_async(p.stderr)
-
-    while True:
-        select.select([p.stdout, p.stderr], [], [], 0)
-
-        stdout_data = read_async(p.stdout)
-        stderr_data = read_async(p.stderr)
-        if stdout_data:
-            sys.stdout.write(stdout_data.decode())
-        if stderr_data:
-            sys.stderr.write(stderr_data.decode())
-
-        if p.poll() is not None:
-            break
+    with selectors.DefaultSelector() as selector:
+        # Each pipe is associated with an incremental decoder (so that multibyte
+        # characters split across reads are handled correctly) and the name of
+        # the stream on the sys module that output should be written to
+        for pipe, stream in ((p.stdout, 'stdout'), (p.stderr, 'stderr')):
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            selector.register(pipe, selectors.EVENT_READ, (decoder, stream))
+
+        # Block until one of the pipes has data available and then write it out
+        # in the order it was received. A pipe is done once EOF is reached.
+        while selector.get_map():
+            for key, _ in selector.select():
+                decoder, stream = key.data
+                data = os.read(key.fd, _PIPE_CHUNK_SIZE)
+                text = decoder.decode(data, final=not data)
+                if text:
+                    getattr(sys, stream).write(text)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+
+    return p.wait()
+
+
+async def run_async(args: List[str], cwd: Optional[PathLike] = None,
+                    env: Optional[Mapping[str, str]] = None) -> int:
+    """Asynchronous version of :func:`run` based on :mod:`asyncio` subprocesses
+
+    Parameters
+    ----------
+    args
+        Command-line arguments of the process to run
+    cwd
+        Working directory of the process. Defaults to the current working
+        directory.
+    env
+        Environment variables of the process. Defaults to the environment of
+        the current process.
+
+    Returns
+    -------
+    Exit code of the process
+    """
+    import asyncio
+    p = await asyncio.create_subprocess_exec(
+        *args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env)
+
+    async def pump(reader: asyncio.StreamReader, stream: str):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            data = await reader.read(_PIPE_CHUNK_SIZE)
+            text = decoder.decode(data, final=not data)
+            if text:
+                getattr(sys, stream).write(text)
+            if not data:
+                break
+
+    await asyncio.gather(pump(p.stdout, 'stdout'), pump(p.stderr, 'stderr'))
+    return await p.wait()
@@ -26,10 +26,10 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+from functools import lru_cache
 import itertools
-import re
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import Dict, Iterable, List, Tuple
 
 
 ATOMIC_SYMBOL = {
@@ -165,6 +165,20 @@ NATURAL_ABUNDANCE = {
 }
 
 
+def _build_isotope_index() -> Dict[str, Tuple[Tuple[str, float], ...]]:
+    """Group the naturally occurring isotopes by element"""
+    index: Dict[str, List[Tuple[str, float]]] = {}
+    for isotope, abundance in NATURAL_ABUNDANCE.items():
+        element = isotope.rstrip('0123456789')
+        index.setdefault(element, []).append((isotope, abundance))
+    return {element: tuple(values) for element, values in index.items()}
+
+
+# Naturally occurring isotopes of each element, in the order they appear in
+# NATURAL_ABUNDANCE
+_ISOTOPES = _build_isotope_index()
+
+
 def isotopes(element: str) -> List[Tuple[str, float]]:
     """Return naturally occurring isotopes and their abundances
 
@@ -176,24 +190,45 @@ def isotopes(element: str) -> List[Tuple[str, float]]:
     Returns
     -------
     list
-        A list of tuples of (isotope, abundance)
+        A list of tuples of (isotope, abundance), which is empty if the element
+        has no naturally occurring isotopes or is not recognized
+
+    """
+    return list(_ISOTOPES.get(element, ()))
+
 
-    Raises
-    ------
-    ValueError
-        If the element name is not recognized
+def expand_elements(elements: Iterable[str]) -> Dict[str, List[Tuple[str, float]]]:
+    """Return naturally occurring isotopes and their abundances for several
+    elements at once
+
+    Parameters
+    ----------
+    elements
+        Element symbols (e.g., ['H', 'O'])
+
+    Returns
+    -------
+    dict
+        Dictionary mapping each element symbol to a list of tuples of (isotope,
+        abundance)
 
     """
-    # Get the nuclides present in nature
-    result = []
-    for kv in NATURAL_ABUNDANCE.items():
-        if re.match(r'{}\d+'.format(element), kv[0]):
-            result.append(kv)
-    return result
+    return {element: list(_ISOTOPES.get(element, ())) for element in elements}
 
 
-# Used in atomic_mass function as a cache
-_ATOMIC_MASS: Dict[str, float] = {}
+@lru_cache(maxsize=None)
+def _atomic_masses() -> Dict[str, float]:
+    """Load atomic masses (keyed by lowercase nuclide name) from AME2020 file"""
+    masses = {}
+    mass_file = Path(__file__).with_name('mass_1.mas20.txt')
+    with mass_file.open('r') as ame:
+        # Read lines in file starting at line 37
+        for line in itertools.islice(ame, 36, None):
+            name = f'{line[20:22].strip()}{int(line[16:19])}'
+            mass = float(line[106:109]) + 1e-6*float(
+                line[110:116] + '.' + line[117:123])
+            masses[name.lower()] = mass
+    return masses
 
 
 def atomic_mass(nuclide):
@@ -213,19 +248,26 @@ def atomic_mass(nuclide):
         Atomic mass of nuclide in [amu]
 
     """
-    if not _ATOMIC_MASS:
-        # Load data from AME2020 file
-        mass_file = Path(__file__).with_name('mass_1.mas20.txt')
-        with mass_file.open('r') as ame:
-            # Read lines in file starting at line 37
-            for line in itertools.islice(ame, 36, None):
-                name = f'{line[20:22].strip()}{int(line[16:19])}'
-                mass = float(line[106:109]) + 1e-6*float(
-                    line[110:116] + '.' + line[117:123])
-                _ATOMIC_MASS[name.lower()] = mass
-
     # Get rid of metastable information
     if '_' in nuclide:
         nuclide = nuclide[:nuclide.find('_')]
 
-    return _ATOMIC_MASS[nuclide.lower()]
+    return _atomic_masses()[nuclide.lower()]
+
+
+def atomic_masses(nuclides: Iterable[str]) -> List[float]:
+    """Return atomic masses of several isotopes in atomic mass units.
+
+    Parameters
+    ----------
+    nuclides
+        Names of nuclides, e.g., ['U235', 'U238']
+
+    Returns
+    -------
+    list
+        Atomic mass of each nuclide in [amu]
+
+    """
+    masses = _atomic_masses()
+    return [masses[nuclide.partition('_')[0].lower()] for nuclide in nuclides]
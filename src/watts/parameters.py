@@ -2,31 +2,117 @@
 # SPDX-License-Identifier: MIT
 
 from __future__ import annotations
-import copy
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from collections.abc import MutableMapping, Mapping, Iterable
+import copy
 from datetime import datetime
+from functools import lru_cache
 from getpass import getuser
+import importlib.abc
+import importlib.util
+import sys
 import textwrap
-from typing import Any, Union, BinaryIO
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Union
 from warnings import warn
 
-import astropy.units as u
 import dill
 from prettytable import PrettyTable
 
+if TYPE_CHECKING:
+    import astropy.units as u
+
+
+class _ImperialUnitsFinder(importlib.abc.MetaPathFinder):
+    """Import hook that enables imperial units when astropy.units is imported
+
+    Importing astropy is slow, so rather than importing it along with watts,
+    imperial units are enabled at the point where it does get imported.
+    """
+    def find_spec(self, fullname, path, target=None):
+        if fullname != 'astropy.units':
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(fullname)
+        if spec is None or spec.loader is None:
+            return spec
+        exec_module = spec.loader.exec_module
+
+        def exec_and_enable(module):
+            exec_module(module)
+            module.imperial.enable()
+
+        spec.loader.exec_module = exec_and_enable
+        return spec
+
+
 # Enable imperial units
-u.imperial.enable()
+if 'astropy.units' in sys.modules:
+    sys.modules['astropy.units'].imperial.enable()
+else:
+    sys.meta_path.insert(0, _ImperialUnitsFinder())
 
 ParametersMetadata = namedtuple('ParametersMetadata', ['user', 'time'])
 
 
+@lru_cache(maxsize=None)
+def _current_user() -> str:
+    """Return the name of the current user, which is only looked up once"""
+    return getuser()
+
+
+@lru_cache(maxsize=None)
+def _units():
+    """Return the astropy.units module with imperial units enabled
+
+    Importing astropy is slow, so it is only imported once units are first
+    needed. Imperial units are normally enabled by the import hook already;
+    they are enabled here too in case the hook didn't run, e.g. because
+    astropy.units was imported through another loader.
+    """
+    import astropy.units as u
+    u.imperial.enable()
+    return u
+
+
+@lru_cache(maxsize=None)
+def _unit_converter(unit: u.UnitBase, system: str, temperature: str) -> Callable:
+    """Return a function converting values in a unit to the desired system
+
+    The conversion is determined once for each combination of arguments since
+    finding it is far more expensive than applying it.
+    """
+    u = _units()
+
+    # Unit conversion for temperature needs to be done separately because
+    # astropy uses a different method to convert temperature.
+    if unit.physical_type == 'temperature':
+        target = u.Unit(temperature)
+        equivalencies = u.temperature()
+        if hasattr(unit, 'get_converter'):
+            return unit.get_converter(target, equivalencies)
+        return lambda value: unit.to(target, value, equivalencies=equivalencies)
+
+    # This matches the scaling done by Quantity.si/Quantity.cgs
+    scale = getattr(unit, system).scale
+    return lambda value: value * scale
+
+
+def _mapping_items(other: Union[Mapping, Iterable]) -> Iterable:
+    """Return (key, value) pairs from the argument of dict.update"""
+    if isinstance(other, Mapping):
+        return other.items()
+    elif hasattr(other, 'keys'):
+        return ((key, other[key]) for key in other.keys())
+    return other
+
+
 class Parameters(MutableMapping):
     """User parameters used to generate inputs that are created by plugins
 
     This class behaves like a normal Python dictionary except that it stores
     metadata on (key, value) pairs and provides the ability to save/load the
-    data to a pickle file.
+    data to a pickle file. Pairs added together, e.g. with :meth:`update`,
+    share a single metadata record.
 
     Attributes
     ----------
@@ -43,23 +129,20 @@ class Parameters(MutableMapping):
         if args:
             assert len(args) == 1
             args = args[0]
-            if isinstance(args, Mapping):
-                # dict(mapping)
-                if hasattr(args, 'get_metadata'):
-                    for key, value in args.items():
-                        metadata = args.get_metadata(key)
-                        self.set(key, value, **metadata._asdict())
-                else:
-                    for key, value in args.items():
-                        self[key] = value
-            elif isinstance(args, Iterable):
-                # dict(iterable)
-                for key, value in args:
-                    self[key] = value
+            if isinstance(args, Parameters):
+                # Metadata records are immutable, so they can be shared
+                self._dict.update(args._dict)
+                self._metadata.update(args._metadata)
+            elif isinstance(args, Mapping) and hasattr(args, 'get_metadata'):
+                for key, value in args.items():
+                    metadata = args.get_metadata(key)
+                    self.set(key, value, **metadata._asdict())
+            else:
+                # dict(mapping) or dict(iterable)
+                self.update(args)
         elif kwargs:
             # dict(**kwargs)
-            for key, value in kwargs.items():
-                self[key] = value
+            self.update(kwargs)
 
     def __getitem__(self, key):
         return self._dict[key]
@@ -69,6 +152,7 @@ class Parameters(MutableMapping):
 
     def __delitem__(self, key):
         del self._dict[key]
+        self._metadata.pop(key, None)
 
     def __iter__(self):
         return iter(self._dict)
@@ -104,7 +188,7 @@ class Parameters(MutableMapping):
             Time associated with key/value pair
         """
         if user is None:
-            user = getuser()
+            user = _current_user()
         if time is None:
             time = datetime.now()
         if self._warn_duplicates and key in self._dict:
@@ -112,6 +196,65 @@ class Parameters(MutableMapping):
         self._dict[key] = value
         self._metadata[key] = ParametersMetadata(user, time)
 
+    def update(self, *args, **kwargs):
+        """Set many key/value pairs at once with the same metadata
+
+        This behaves like :meth:`dict.update`. If a :class:`Parameters`
+        instance is given, its metadata is kept; otherwise, the pairs are
+        associated with the current user and time. Use :meth:`set_many` to
+        give other metadata.
+
+        Parameters
+        ----------
+        *args
+            Mapping or iterable of (key, value) pairs
+        **kwargs
+            Additional key/value pairs
+        """
+        if len(args) > 1:
+            raise TypeError(f"update expected at most 1 argument, got {len(args)}")
+        items = []
+        if args:
+            other = args[0]
+            if isinstance(other, Parameters):
+                if self._warn_duplicates:
+                    for key in other._dict.keys() & self._dict.keys():
+                        warn(f"Key {key} has already been added to parameters")
+                self._dict.update(other._dict)
+                self._metadata.update(other._metadata)
+            else:
+                items = other
+        self._set_items([*_mapping_items(items), *kwargs.items()], None, None)
+
+    def set_many(self, mapping: Union[Mapping, Iterable] = (), *,
+                 user: str = None, time: datetime = None):
+        """Explicitly set many key/value pairs with the same metadata
+
+        Parameters
+        ----------
+        mapping
+            Mapping or iterable of (key, value) pairs
+        user
+            Username associated with the key/value pairs
+        time
+            Time associated with the key/value pairs
+        """
+        self._set_items(list(_mapping_items(mapping)), user, time)
+
+    def _set_items(self, items: list, user: str = None, time: datetime = None):
+        """Set key/value pairs sharing a single metadata record"""
+        if not items:
+            return
+        metadata = ParametersMetadata(
+            _current_user() if user is None else user,
+            datetime.now() if time is None else time
+        )
+        for key, value in items:
+            if self._warn_duplicates and key in self._dict:
+                warn(f"Key {key} has already been added to parameters")
+            self._dict[key] = value
+            self._metadata[key] = metadata
+
     def get_metadata(self, key: Any) -> ParametersMetadata:
         """Get metadata associated with a key
 
@@ -205,8 +348,8 @@ class Parameters(MutableMapping):
         # Load parameters from pickle
         data = dill.loads(file_obj.read())
 
-        # Update current instance
-        self.update(data)
+        # Update current instance, keeping metadata from the file
+        self._dict.update(data._dict)
         self._metadata.update(data._metadata)
 
     def load(self, filename_or_obj: Union[str, BinaryIO]):
@@ -241,6 +384,11 @@ class Parameters(MutableMapping):
                       inplace: bool = False) -> Parameters:
         """Perform unit conversion
 
+        When a copy is returned, quantities are replaced by newly converted
+        values and all other values are deep-copied, so changing the values of
+        either set of parameters doesn't affect the other. Converted values
+        keep the metadata of the original values.
+
         Parameters
         ----------
         system
@@ -254,15 +402,50 @@ class Parameters(MutableMapping):
         -------
         A :class:`Parameters` instance with converted units
         """
-        params = self if inplace else copy.deepcopy(self)
+        # If astropy hasn't been imported, there can't be any quantities
+        u = _units() if 'astropy.units' in sys.modules else None
 
-        for key, value in params.items():
-            if isinstance(value, u.Quantity):
-                # Unit conversion for temperature needs to be done separately because
-                # astropy uses a different method to convert temperature.
+        if inplace:
+            params = self
+        else:
+            # Quantities are about to be replaced by converted values, so only
+            # the other values need to be copied. Metadata records are
+            # immutable and can be shared.
+            params = type(self)()
+            params._warn_duplicates = self._warn_duplicates
+            params._metadata.update(self._metadata)
+            memo = {}
+            for key, value in self._dict.items():
+                if u is None or not isinstance(value, u.Quantity):
+                    value = copy.deepcopy(value, memo)
+                params._dict[key] = value
+
+        if u is None:
+            return params
+        import numpy as np
+
+        # Group scalar quantities by unit and dtype so that each group can be
+        # converted at once
+        scalars = defaultdict(list)
+        for key, value in params._dict.items():
+            if not isinstance(value, u.Quantity):
+                continue
+            if type(value) is not u.Quantity or value.dtype.names:
+                # Defer to astropy for subclasses and structured quantities
                 if value.unit.physical_type == 'temperature':
-                    params[key] = value.to(temperature, equivalencies=u.temperature()).value
+                    params._dict[key] = value.to(temperature, equivalencies=u.temperature()).value
                 else:
-                    params[key] = getattr(value, system).value
+                    params._dict[key] = getattr(value, system).value
+            elif value.ndim == 0:
+                scalars[value.unit, value.dtype].append(key)
+            else:
+                convert = _unit_converter(value.unit, system, temperature)
+                params._dict[key] = convert(value.view(np.ndarray))
+
+        for (unit, dtype), keys in scalars.items():
+            convert = _unit_converter(unit, system, temperature)
+            values = np.array([params._dict[key].view(np.ndarray) for key in keys], dtype)
+            for key, converted in zip(keys, convert(values)):
+                params._dict[key] = converted
 
         return params
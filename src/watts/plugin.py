@@ -2,22 +2,57 @@
 # SPDX-License-Identifier: MIT
 
 from abc import ABC, abstractmethod
-from contextlib import redirect_stdout, redirect_stderr
+from concurrent.futures import Executor, Future, as_completed
+from contextlib import contextmanager
+import contextvars
+import functools
+import hashlib
+import inspect
 import os
 from pathlib import Path
 import shutil
 import time
-from typing import Optional, List, Union
+from typing import Dict, Iterable, Iterator, Optional, List, Tuple, Union
 import uuid
 
-from .database import Database
-from .fileutils import cd_tmpdir, PathLike, tee_stdout, tee_stderr, run as run_proc
+import dill
+
+from .database import Database, make_staging_directory, _STAGING_DIRNAME
+from .fileutils import (
+    LogFile, PathLike, clone_file, file_changed, file_hash, scan_directory,
+    temporary_directory, working_directory, redirect_stdout, redirect_stderr, tee_stdout, tee_stderr, run as run_proc,
+    run_async as run_proc_async)
 from .parameters import Parameters
 from .results import Results, ExecInfo
 from .template import TemplateRenderer
 import watts
 
 
+# Files in the execution directory just before the code is run, stored along
+# with the directory so that postrun methods can tell which files are new
+_run_snapshot = contextvars.ContextVar('_run_snapshot', default=None)
+
+
+def files_before_run(cwd: PathLike) -> Optional[Dict[str, os.stat_result]]:
+    """Get the files that were in an execution directory before the code ran
+
+    Parameters
+    ----------
+    cwd
+        Directory in which the code was run
+
+    Returns
+    -------
+    Status of each file in the directory keyed by name, as returned by
+    :func:`watts.fileutils.scan_directory`, or None if the run stage was not
+    performed by the plugin workflow in this directory
+    """
+    snapshot = _run_snapshot.get()
+    if snapshot is not None and snapshot[0] == Path(cwd):
+        return snapshot[1]
+    return None
+
+
 class Plugin(ABC):
     """Class defining the Plugin interface
 
@@ -34,13 +69,31 @@ class Plugin(ABC):
 
     Attributes
     ----------
+    log_backup_count : int
+        Number of rotated log files kept when :attr:`log_max_size` is set
+    log_compression : {None, 'gzip', 'zstd'}
+        Compression applied to the log file as it is written
+    log_max_size : int or None
+        Number of characters written to the log file before it is rotated. If
+        None, the size of the log is not limited.
     plugin_name : str
         Name of the plugin
+    stage_in_database : bool
+        Whether to run the code in a temporary directory within the hidden
+        ``.staging`` directory of the database rather than in the system's
+        temporary directory. This allows files to be moved into the database by
+        renaming them when the system's temporary directory is on a different
+        filesystem.
     unit_system : {'si', 'cgs'}
         Desired system of units for rendering templates
 
     """
 
+    log_max_size: Optional[int] = None
+    log_backup_count = 1
+    log_compression: Optional[str] = None
+    stage_in_database = False
+
     def __init__(
         self,
         extra_inputs: Optional[List[PathLike]] = None,
@@ -56,15 +109,16 @@ class Plugin(ABC):
         self.unit_system = unit_system
 
     @abstractmethod
-    def prerun(self, params: Parameters):
+    def prerun(self, params: Parameters, *, cwd: Optional[Path] = None):
         ...
 
     @abstractmethod
-    def run(self):
+    def run(self, *, cwd: Optional[Path] = None):
         ...
 
     @abstractmethod
-    def postrun(self, params: Parameters, exec_info: ExecInfo) -> Results:
+    def postrun(self, params: Parameters, exec_info: ExecInfo, *,
+                cwd: Optional[Path] = None) -> Results:
         ...
 
     def __call__(
@@ -74,12 +128,77 @@ class Plugin(ABC):
         output_dir: Optional[PathLike] = None,
         verbose: bool = True,
         cleanup: bool = True,
+        reuse: bool = False,
         **kwargs
     ) -> Results:
         """Run the complete workflow for the plugin
 
+        When `reuse` is True, a hash is computed from the plugin, its
+        executable, the parameters, the keyword arguments, and the contents of
+        the input files after the prerun stage. If the database holds a result
+        from an execution with the same hash, that result is returned without
+        running the code again.
+
+        Parameters
+        ----------
+        params
+            Parameters used in generating inputs
+        name
+            Name associated with execution of plugin
+        output_dir
+            Relative path of the directory created in the database. If None, a
+            unique directory name is created using the uuid module.
+        verbose
+            Whether to print execution information
+        cleanup
+            Determines whether the temporary directory will be cleaned up
+            immediately after execution. When :attr:`stage_in_database` is
+            set, a retained directory is left in the hidden ``.staging``
+            directory of the database and must be removed by hand.
+        reuse
+            Whether to return a stored result from an execution with identical
+            inputs instead of running the code
+        **kwargs
+            Keyword arguments passed to the `run` method
+
+        Returns
+        -------
+        Results from running plugin
+        """
+        db = Database()
+        result, staging_path, input_hash = self._execute(
+            params, name, db.path, db.job_id, output_dir, verbose, cleanup, reuse,
+            **kwargs)
+
+        # Add result to database
+        if staging_path is not None:
+            db.add_result(result, staging_path, input_hash)
+
+        return result
+
+    def submit(
+        self,
+        executor: Executor,
+        params: Parameters = None,
+        name: str = '',
+        output_dir: Optional[PathLike] = None,
+        verbose: bool = True,
+        cleanup: bool = True,
+        reuse: bool = False,
+        **kwargs
+    ) -> Future:
+        """Schedule execution of the complete workflow on an executor
+
+        The plugin, parameters, and keyword arguments are serialized with
+        :mod:`dill` so that any :class:`concurrent.futures.Executor` can be
+        used, including a :class:`~concurrent.futures.ProcessPoolExecutor`.
+        Once execution finishes, the result is added to the database in the
+        calling process.
+
         Parameters
         ----------
+        executor
+            Executor used to run the plugin
         params
             Parameters used in generating inputs
         name
@@ -91,15 +210,251 @@ class Plugin(ABC):
             Whether to print execution information
         cleanup
             Determines whether the temporary directory will be cleaned up
+            immediately after execution. When :attr:`stage_in_database` is
+            set, a retained directory is left in the hidden ``.staging``
+            directory of the database and must be removed by hand.
+        reuse
+            Whether to return a stored result from an execution with identical
+            inputs instead of running the code
+        **kwargs
+            Keyword arguments passed to the `run` method
+
+        Returns
+        -------
+        Future whose result is the :class:`Results` from running the plugin
+        """
+        db = Database()
+        payload = dill.dumps((self, params, name, db.path, db.job_id,
+                              output_dir, verbose, cleanup, reuse, kwargs))
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def add_result(worker_future):
+            try:
+                result, staging_path, input_hash = dill.loads(worker_future.result())
+                if staging_path is not None:
+                    db.add_result(result, staging_path, input_hash)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+        executor.submit(_execute_pickled, payload).add_done_callback(add_result)
+        return future
+
+    def map(
+        self,
+        params: Iterable[Parameters],
+        names: Optional[Iterable[str]] = None,
+        max_workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        ordered: bool = True,
+        verbose: bool = True,
+        cleanup: bool = True,
+        reuse: bool = False,
+        **kwargs
+    ) -> Iterator[Results]:
+        """Run the complete workflow for many sets of parameters concurrently
+
+        All executions are scheduled immediately; the returned iterator yields
+        results as they become available.
+
+        Parameters
+        ----------
+        params
+            Iterable of parameters, each used in generating inputs for one
+            execution of the plugin
+        names
+            Names associated with each execution of the plugin
+        max_workers
+            Maximum number of worker processes. Only used if `executor` is not
+            given.
+        executor
+            Executor used to run the plugin. If not given, a
+            :class:`~concurrent.futures.ProcessPoolExecutor` is created.
+        ordered
+            Whether to yield results in the same order as `params` (True) or in
+            the order they complete (False)
+        verbose
+            Whether to print execution information
+        cleanup
+            Determines whether the temporary directories will be cleaned up
             immediately after execution.
+        reuse
+            Whether to return stored results from executions with identical
+            inputs instead of running the code
         **kwargs
             Keyword arguments passed to the `run` method
 
+        Returns
+        -------
+        Iterator over results from running plugin
+        """
+        params = list(params)
+        names = [''] * len(params) if names is None else list(names)
+        if len(names) != len(params):
+            raise ValueError("Number of names must match number of parameters.")
+
+        own_executor = executor is None
+        if own_executor:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers)
+        futures = [
+            self.submit(executor, p, name, verbose=verbose, cleanup=cleanup,
+                        reuse=reuse, **kwargs)
+            for p, name in zip(params, names)
+        ]
+        if own_executor:
+            # Already submitted work continues to run after shutdown
+            executor.shutdown(wait=False)
+
+        iterator = iter(futures) if ordered else as_completed(futures)
+        return (future.result() for future in iterator)
+
+    async def acall(
+        self,
+        params: Parameters = None,
+        name: str = '',
+        output_dir: Optional[PathLike] = None,
+        verbose: bool = True,
+        cleanup: bool = True,
+        reuse: bool = False,
+        **kwargs
+    ) -> Results:
+        """Run the complete workflow for the plugin without blocking the event loop
+
+        This is the :mod:`asyncio` counterpart of calling the plugin. Input
+        generation, post-processing, and file handling are performed in worker
+        threads while the code itself is executed via :meth:`arun`, so many
+        executions can be awaited concurrently, e.g. with
+        :func:`asyncio.gather`.
+
+        Parameters
+        ----------
+        params
+            Parameters used in generating inputs
+        name
+            Name associated with execution of plugin
+        output_dir
+            Relative path of the directory created in the database. If None, a
+            unique directory name is created using the uuid module.
+        verbose
+            Whether to print execution information
+        cleanup
+            Determines whether the temporary directory will be cleaned up
+            immediately after execution. When :attr:`stage_in_database` is
+            set, a retained directory is left in the hidden ``.staging``
+            directory of the database and must be removed by hand.
+        reuse
+            Whether to return a stored result from an execution with identical
+            inputs instead of running the code
+        **kwargs
+            Keyword arguments passed to the `arun` method
+
         Returns
         -------
         Results from running plugin
         """
         db = Database()
+        self._check_output_dir(db.path, output_dir)
+        params, exec_info = self._start(params, name, db.job_id, verbose)
+
+        with temporary_directory(cleanup, self._work_root(db.path)) as cwd:
+            placed = await _to_thread(self._copy_extra_inputs, cwd, db.path)
+            await _to_thread(self._prerun, params, cwd)
+
+            input_hash = None
+            if reuse:
+                result, input_hash = await _to_thread(
+                    self._find_reusable, db.path, params, cwd, kwargs, verbose,
+                    _unchanged_digests(cwd, placed))
+                if result is not None:
+                    return result
+
+            if self._accepts_cwd():
+                with self._snapshot(cwd):
+                    with self._redirect_output(cwd):
+                        await self.arun(cwd=cwd, **kwargs)
+                    result = await _to_thread(self.postrun, params, exec_info, cwd=cwd)
+            else:
+                result = await _to_thread(
+                    self._run_postrun, params, exec_info, cwd, **kwargs)
+
+            staging_path = await _to_thread(
+                self._store, result, db.path, output_dir, placed)
+
+        # Add result to database
+        await _to_thread(db.add_result, result, staging_path, input_hash)
+
+        return result
+
+    async def arun(self, *, cwd: Optional[Path] = None, **kwargs):
+        """Run the code without blocking the event loop
+
+        By default, :meth:`run` is called in a worker thread. Subclasses that
+        launch an external executable should override this method to run it as
+        an :mod:`asyncio` subprocess.
+
+        Parameters
+        ----------
+        cwd
+            Directory in which the code is run
+        **kwargs
+            Keyword arguments passed to the `run` method
+        """
+        await _to_thread(self.run, cwd=cwd, **kwargs)
+
+    def _execute(
+        self,
+        params: Optional[Parameters],
+        name: str,
+        db_path: Path,
+        job_id: int,
+        output_dir: Optional[PathLike],
+        verbose: bool,
+        cleanup: bool,
+        reuse: bool,
+        **kwargs
+    ) -> Tuple[Results, Optional[Path], Optional[str]]:
+        """Run the workflow and move files into a staging directory
+
+        The result is not added to the database; that is left to the caller so
+        that this method can be executed in a separate process. The staging
+        directory holding the files and the hash of the inputs are returned
+        along with the result. If a stored result is reused, the staging
+        directory is None.
+        """
+        self._check_output_dir(db_path, output_dir)
+        params, exec_info = self._start(params, name, job_id, verbose)
+
+        with temporary_directory(cleanup, self._work_root(db_path)) as cwd:
+            placed = self._copy_extra_inputs(cwd, db_path)
+            self._prerun(params, cwd)
+
+            input_hash = None
+            if reuse:
+                result, input_hash = self._find_reusable(
+                    db_path, params, cwd, kwargs, verbose,
+                    _unchanged_digests(cwd, placed))
+                if result is not None:
+                    return result, None, input_hash
+
+            result = self._run_postrun(params, exec_info, cwd, **kwargs)
+            staging_path = self._store(result, db_path, output_dir, placed)
+
+        return result, staging_path, input_hash
+
+    def _work_root(self, db_path: Path) -> Optional[Path]:
+        """Directory in which temporary working directories are created"""
+        if self.stage_in_database:
+            # Files end up on the same filesystem as the database so they can
+            # be moved there by renaming rather than copying
+            return db_path / _STAGING_DIRNAME
+        return None
+
+    def _start(self, params: Optional[Parameters], name: str, job_id: int,
+               verbose: bool) -> Tuple[Parameters, ExecInfo]:
+        """Announce execution and create execution info"""
         plugin_name = self.plugin_name
         if verbose:
             if name:
@@ -113,44 +468,192 @@ class Plugin(ABC):
 
         # Create execution info
         timestamp = time.time_ns()
-        exec_info = ExecInfo(db.job_id, plugin_name, name, timestamp)
-
-        with cd_tmpdir(cleanup=cleanup):
-            # Copy extra inputs to execution directory
-            cwd = Path.cwd()
-            for path in self.extra_inputs:
-                shutil.copy(str(path), str(cwd))  # Remove str() for Python 3.8+
-
-            # Generate input files and perform any other prerun actions
-            self.prerun(params)
-
-            # Execute the code, redirecting stdout/stderr if requested
-            with open(f'{plugin_name}_log.txt', 'w') as outfile:
-                func_stdout = tee_stdout if self.show_stdout else redirect_stdout
-                func_stderr = tee_stderr if self.show_stderr else redirect_stderr
-                with func_stdout(outfile), func_stderr(outfile):
+        exec_info = ExecInfo(job_id, plugin_name, name, timestamp)
+        return params, exec_info
+
+    def _copy_extra_inputs(self, cwd: Path, db_path: Path
+                           ) -> Dict[str, Tuple[str, os.stat_result]]:
+        """Place extra inputs in execution directory
+
+        The code is given its own copy of each extra input, which it may modify.
+        The digest of each file and the status of its copy are returned, keyed
+        by the name of the file, so that unchanged copies can be recognized
+        when hashing the inputs and when storing the result.
+        """
+        db = Database(db_path)
+        placed = {}
+        for path in self.extra_inputs:
+            digest = db.file_digest(path)
+            clone_file(path, cwd / path.name)
+            placed[path.name] = (digest, os.stat(cwd / path.name))
+        return placed
+
+    @staticmethod
+    def _check_output_dir(db_path: Path, output_dir: Optional[PathLike]):
+        """Fail before running if the requested results directory exists"""
+        if output_dir is not None and (db_path / output_dir).exists():
+            raise FileExistsError(
+                f"Result directory {db_path / output_dir} already exists")
+
+    def _store(self, result: Results, db_path: Path,
+               output_dir: Optional[PathLike],
+               placed: Optional[Dict[str, Tuple[str, os.stat_result]]] = None
+               ) -> Path:
+        """Move files into a staging directory within the database
+
+        Extra inputs that the code didn't change are linked into the staging
+        directory from the copy stored in the database (see
+        :meth:`Database.link_file`) rather than moved. The paths of the result
+        are changed to refer to its final directory, which is created when the
+        staging directory is committed by :meth:`Database.add_result`.
+        """
+        if output_dir is None:
+            output_dir = uuid.uuid4().hex
+        db = Database(db_path)
+        staging_path = make_staging_directory(db_path)
+        try:
+            linked = set()
+            if db.link_inputs and placed:
+                cwd = result.base_path
+                for name, digest in _unchanged_digests(cwd, placed).items():
+                    db.link_file(cwd / name, staging_path, digest)
+                    os.remove(cwd / name)
+                    linked.add(name)
+            result._move_files(staging_path, linked)
+        except Exception:
+            # If error occurred, make sure we remove staging directory so it
+            # doesn't take up space in the database
+            shutil.rmtree(staging_path)
+            raise
+        result._rebase(db_path / output_dir)
+        return staging_path
+
+    @contextmanager
+    def _redirect_output(self, log_dir: Path):
+        """Redirect stdout/stderr to the log file, also displaying if requested"""
+        with LogFile(log_dir / f'{self.plugin_name}_log.txt', self.log_max_size,
+                     self.log_backup_count, self.log_compression) as outfile:
+            func_stdout = tee_stdout if self.show_stdout else redirect_stdout
+            func_stderr = tee_stderr if self.show_stderr else redirect_stderr
+            with func_stdout(outfile), func_stderr(outfile):
+                yield
+
+    def _prerun(self, params: Parameters, cwd: Path):
+        """Generate input files and perform any other prerun actions
+
+        For plugins whose methods don't accept an explicit working directory,
+        the working directory is changed instead.
+        """
+        if self._accepts_cwd():
+            self.prerun(params, cwd=cwd)
+        else:
+            with working_directory(cwd):
+                self.prerun(params)
+
+    @contextmanager
+    def _snapshot(self, cwd: Path):
+        """Record the files in a directory for :func:`files_before_run`"""
+        token = _run_snapshot.set((Path(cwd), scan_directory(cwd)))
+        try:
+            yield
+        finally:
+            _run_snapshot.reset(token)
+
+    def _run_postrun(self, params: Parameters, exec_info: ExecInfo,
+                     cwd: Path, **kwargs) -> Results:
+        """Perform the run and postrun stages in a directory"""
+        with self._snapshot(cwd):
+            if self._accepts_cwd():
+                # Execute the code, redirecting stdout/stderr if requested
+                with self._redirect_output(cwd):
+                    self.run(cwd=cwd, **kwargs)
+
+                # Collect results and perform any postrun actions
+                return self.postrun(params, exec_info, cwd=cwd)
+
+            with working_directory(cwd):
+                with self._redirect_output(cwd):
                     self.run(**kwargs)
+                return self.postrun(params, exec_info)
 
-            # Collect results and perform any postrun actions
-            result = self.postrun(params, exec_info)
+    def _identity(self) -> list:
+        """Items identifying the plugin when determining if results can be reused"""
+        cls = type(self)
+        return [cls.__module__, cls.__qualname__, self.plugin_name]
 
-            # Create new directory for results and move files there
-            if output_dir is None:
-                output_dir = uuid.uuid4().hex
-            workflow_path = db.path / output_dir
-            workflow_path.mkdir()
-            try:
-                result.move_files(workflow_path)
-            except Exception:
-                # If error occurred, make sure we remove results directory so it
-                # doesn't pollute database
-                shutil.rmtree(workflow_path)
-                raise
+    def _input_hash(self, params: Parameters, cwd: Path, kwargs: dict,
+                    digests: Optional[Dict[str, str]] = None) -> str:
+        """Hash the inputs of an execution after the prerun stage
 
-        # Add result to database
-        db.add_result(result)
+        Digests of files that are already known can be given by their path
+        relative to `cwd`.
+        """
+        if digests is None:
+            digests = {}
+        sha = hashlib.sha256()
+        sha.update(repr(self._identity()).encode())
+        sha.update(dill.dumps(dict(params)))
+        sha.update(dill.dumps(kwargs))
+        for path in sorted(cwd.rglob('*')):
+            if path.is_file():
+                name = path.relative_to(cwd).as_posix()
+                sha.update(name.encode())
+                digest = digests.get(name)
+                sha.update((file_hash(path) if digest is None else digest).encode())
+        return sha.hexdigest()
+
+    def _find_reusable(self, db_path: Path, params: Parameters, cwd: Path,
+                       kwargs: dict, verbose: bool,
+                       digests: Optional[Dict[str, str]] = None
+                       ) -> Tuple[Optional[Results], str]:
+        """Look up a stored result from an execution with identical inputs"""
+        input_hash = self._input_hash(params, cwd, kwargs, digests)
+        result = Database(db_path).find_reusable(input_hash)
+        if result is not None and verbose:
+            print(f'[watts] Reusing result from {result.base_path}')
+        return result, input_hash
+
+    def _accepts_cwd(self) -> bool:
+        """Determine whether prerun/run/postrun accept a `cwd` argument"""
+        return all(
+            'cwd' in inspect.signature(method).parameters
+            for method in (self.prerun, self.run, self.postrun)
+        )
+
+
+def _unchanged_digests(cwd: Path, placed: Dict[str, Tuple[str, os.stat_result]]
+                       ) -> Dict[str, str]:
+    """Digests of extra inputs whose copies in a directory haven't changed"""
+    digests = {}
+    for name, (digest, before) in placed.items():
+        try:
+            after = os.stat(cwd / name)
+        except OSError:
+            continue
+        if not file_changed(before, after):
+            digests[name] = digest
+    return digests
+
+
+async def _to_thread(func, *args, **kwargs):
+    """Run a function in a worker thread with the current context
+
+    Equivalent to :func:`asyncio.to_thread`, which requires Python 3.9+.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(None, call)
 
-        return result
+
+def _execute_pickled(payload: bytes) -> bytes:
+    """Execute a plugin from a serialized (plugin, arguments) payload
+
+    This is a module-level function so that it can be sent to worker processes.
+    """
+    plugin, *args, kwargs = dill.loads(payload)
+    return dill.dumps(plugin._execute(*args, **kwargs))
 
 
 class PluginGeneric(Plugin):
@@ -231,7 +734,22 @@ class PluginGeneric(Plugin):
     def execute_command(self) -> List[str]:
         return [item.format(self=self) for item in self._execute_command]
 
-    def prerun(self, params: Parameters, filename: Optional[str] = None):
+    def _identity(self) -> list:
+        """Items identifying the plugin when determining if results can be reused
+
+        Besides the plugin itself, the location, size, and modification time of
+        the executable are included so that results aren't reused after the
+        executable changes.
+        """
+        identity = super()._identity() + [self._execute_command]
+        exe = Path(shutil.which(self.executable) or self.executable).resolve()
+        if not exe.is_file():
+            return identity + [str(exe)]
+        stat = exe.stat()
+        return identity + [str(exe), stat.st_size, stat.st_mtime_ns]
+
+    def prerun(self, params: Parameters, filename: Optional[str] = None, *,
+               cwd: Optional[Path] = None):
         """Render the template based on model parameters
 
         Parameters
@@ -240,6 +758,9 @@ class PluginGeneric(Plugin):
             Parameters used to render template
         filename
             Filename for rendered template
+        cwd
+            Directory in which templates are rendered. Defaults to the current
+            working directory.
         """
         # If the 'input_name' attribute is set, use that as default when
         # filename is not explicitly passed
@@ -251,11 +772,12 @@ class PluginGeneric(Plugin):
         params_copy = params.convert_units(system=self.unit_system)
 
         # Render the template
-        self.render_template(params_copy, filename=filename)
+        self.render_template(params_copy, filename=filename, cwd=cwd)
         for render_template in self.extra_render_templates:
-            render_template(params_copy)
+            render_template(params_copy, cwd=cwd)
 
-    def postrun(self, params: Parameters, exec_info: ExecInfo, **kwargs) -> Results:
+    def postrun(self, params: Parameters, exec_info: ExecInfo, *,
+                cwd: Optional[Path] = None, **kwargs) -> Results:
         """Read simulation results and create results object
 
         Parameters
@@ -264,6 +786,9 @@ class PluginGeneric(Plugin):
             Parameters used to generate input files
         exec_info
             Execution information
+        cwd
+            Directory in which the plugin was executed. Defaults to the current
+            working directory.
         **kwargs
             Keyword arguments for Results subclasses
 
@@ -272,18 +797,24 @@ class PluginGeneric(Plugin):
         Results object
         """
 
+        cwd = Path.cwd() if cwd is None else Path(cwd)
+
         # Determine inputs and outputs
         inputs = [self.input_name] + [p.name for p in self.extra_inputs]
         for renderer in self.extra_render_templates:
             inputs.append(renderer.template_file.name)
-        outputs = [p for p in Path.cwd().iterdir() if p.name not in inputs]
+        input_names = set(inputs)
+        with os.scandir(cwd) as it:
+            outputs = [cwd / entry.name for entry in it
+                       if entry.name not in input_names]
 
         # Get correct Results subclass and return instance
         results_cls = getattr(watts, f'Results{self.plugin_name}', Results)
-        return results_cls(params, exec_info, inputs, outputs, **kwargs)
+        return results_cls(params, exec_info, inputs, outputs, base_path=cwd, **kwargs)
 
     def run(self, mpi_args: Optional[List[str]] = None,
-            extra_args: Optional[List[str]] = None):
+            extra_args: Optional[List[str]] = None, *,
+            cwd: Optional[Path] = None):
         """Run plugin
 
         Parameters
@@ -293,13 +824,39 @@ class PluginGeneric(Plugin):
             e.g. ['mpiexec', '-n', '8'].
         extra_args
             Additional command-line arguments to append after the main command
+        cwd
+            Directory in which the executable is run. Defaults to the current
+            working directory.
+
+        """
+        if mpi_args is None:
+            mpi_args = []
+        if extra_args is None:
+            extra_args = []
+        run_proc(mpi_args + self.execute_command + extra_args, cwd=cwd)
+
+    async def arun(self, mpi_args: Optional[List[str]] = None,
+                   extra_args: Optional[List[str]] = None, *,
+                   cwd: Optional[Path] = None):
+        """Run plugin as an :mod:`asyncio` subprocess
+
+        Parameters
+        ----------
+        mpi_args
+            MPI execute command and any additional MPI arguments to pass,
+            e.g. ['mpiexec', '-n', '8'].
+        extra_args
+            Additional command-line arguments to append after the main command
+        cwd
+            Directory in which the executable is run. Defaults to the current
+            working directory.
 
         """
         if mpi_args is None:
             mpi_args = []
         if extra_args is None:
             extra_args = []
-        run_proc(mpi_args + self.execute_command + extra_args)
+        await run_proc_async(mpi_args + self.execute_command + extra_args, cwd=cwd)
 
 
 def _find_executable(path: PathLike, environment_variable: str) -> Path:
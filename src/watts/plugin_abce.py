@@ -79,6 +79,8 @@ class ResultsABCE(Results):
         List of input files
     outputs
         List of output files
+    base_path
+        Path to directory storing results
 
     Attributes
     ----------
@@ -86,5 +88,6 @@ class ResultsABCE(Results):
         Standard output from ABCE run
     """
     def __init__(self, params: Parameters, exec_info: ExecInfo,
-                 inputs: List[PathLike], outputs: List[PathLike]):
-        super().__init__(params, exec_info, inputs, outputs)
+                 inputs: List[PathLike], outputs: List[PathLike],
+                 base_path: Optional[PathLike] = None):
+        super().__init__(params, exec_info, inputs, outputs, base_path)
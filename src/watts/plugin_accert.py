@@ -1,16 +1,18 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+from __future__ import annotations
 from pathlib import Path
 import sys
-from typing import List, Optional
-
-import pandas as pd
+from typing import TYPE_CHECKING, List, Optional
 
 from .fileutils import PathLike
 from .plugin import PluginGeneric, _find_executable
 from .results import Results
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class PluginACCERT(PluginGeneric):
     """Plugin for running ACCERT
@@ -87,6 +89,7 @@ class ResultsACCERT(Results):
 
     @property
     def account_table(self) -> pd.DataFrame:
+        import pandas as pd
         account_file = self.base_path / 'ACCERT_updated_account.xlsx'
         if Path(account_file).exists():
             return pd.read_excel(account_file)
@@ -3,22 +3,29 @@
 
 import csv
 import json
+from multiprocessing.connection import Client, Listener
 import sys
 import os
 from pathlib import Path
 import pickle
+import re
 import subprocess
-from typing import List, Optional
+import threading
+import traceback
+from typing import Any, Callable, List, Mapping, Optional, Union
 
-import numpy as np
-import pandas as pd
-
-from .fileutils import PathLike
+from .fileutils import PathLike, run as run_proc, run_async as run_proc_async
 from .parameters import Parameters
 from .plugin import PluginGeneric, _find_executable
 from .results import Results, ExecInfo
 
 
+# Environment variables through which the Dakota driver finds the evaluation
+# server started by PluginDakota
+_SERVER_ADDRESS_VARIABLE = 'WATTS_DAKOTA_SERVER'
+_SERVER_AUTHKEY_VARIABLE = 'WATTS_DAKOTA_AUTHKEY'
+
+
 class ResultsDakota(Results):
     """Dakota simulation results
 
@@ -32,6 +39,8 @@ class ResultsDakota(Results):
         List of input files
     outputs
         List of output files
+    base_path
+        Path to directory storing results
 
     Attributes
     ----------
@@ -41,8 +50,9 @@ class ResultsDakota(Results):
         Dictionary with data from .dat files
     """
     def __init__(self, params: Parameters, exec_info: ExecInfo,
-                 inputs: List[PathLike], outputs: List[PathLike]):
-        super().__init__(params, exec_info, inputs, outputs)
+                 inputs: List[PathLike], outputs: List[PathLike],
+                 base_path: Optional[PathLike] = None):
+        super().__init__(params, exec_info, inputs, outputs, base_path)
         self.output_data = self._get_Dakota_output(params)
 
     def _get_Dakota_output(self, params: Parameters) -> dict:
@@ -53,13 +63,15 @@ class ResultsDakota(Results):
         Results from Dakota .dat files
 
         """
+        import numpy as np
+        import pandas as pd
 
-        dakota_out_file_name = params.get('dakota_out_file', 'dakota_opt.dat')
+        dakota_out_file_name = self.base_path / params.get('dakota_out_file', 'dakota_opt.dat')
 
         # Save Dakota's main output '.dat' files
         output_data = {}
 
-        if Path(dakota_out_file_name).exists():
+        if dakota_out_file_name.exists():
             with open(dakota_out_file_name) as f:
                 col_names = f.readline().split()
             df = pd.read_csv(dakota_out_file_name, sep=r"\s+", skiprows=1, names=col_names)
@@ -68,8 +80,9 @@ class ResultsDakota(Results):
                 output_data[name] = np.array(df[name])
 
         # Save Dakota's final output '.dat' files
-        if Path('finaldata1.dat').exists():
-            with open('finaldata1.dat') as fd:
+        finaldata_file = self.base_path / 'finaldata1.dat'
+        if finaldata_file.exists():
+            with open(finaldata_file) as fd:
                 reader = csv.reader(fd)
                 rows = [row for idx, row in enumerate(reader) if idx == 0]
 
@@ -92,10 +105,18 @@ class PluginDakota(PluginGeneric):
         List of extra (non-templated) input files that are needed
     extra_template_inputs
         Extra templated input files
+    auto_link_files
+        Name of the parameter that the names of all extra input files are
+        assigned to so that they can be used for Dakota's ``link_files`` option
     show_stdout
         Whether to display output from stdout when Dakota is run
     show_stderr
         Whether to display output from stderr when Dakota is run
+    evaluate
+        Function that evaluates the coupled code. If given, a
+        :class:`DakotaEvaluationServer` running this function is started for
+        the duration of the Dakota run and :func:`run_dakota_driver` sends each
+        evaluation to it instead of launching the coupled-code script.
 
     Attributes
     ----------
@@ -103,6 +124,8 @@ class PluginDakota(PluginGeneric):
         Path to DAKOTA script
     execute_command
         List of command-line arguments used to call the executable
+    evaluate
+        Function that evaluates the coupled code
 
     """
     def __init__(
@@ -113,7 +136,8 @@ class PluginDakota(PluginGeneric):
         extra_template_inputs: Optional[List[PathLike]] = None,
         auto_link_files: Optional[str] = None,
         show_stdout: bool = False,
-        show_stderr: bool = False
+        show_stderr: bool = False,
+        evaluate: Optional[Callable[[dict], Any]] = None
     ):
         executable = _find_executable(executable, 'DAKOTA_DIR')
         execute_command = ['{self.executable}', '-i', '{self.input_name}']
@@ -123,6 +147,7 @@ class PluginDakota(PluginGeneric):
 
         self.input_name = template_file
         self._auto_link_files = auto_link_files
+        self.evaluate = evaluate
 
         # Setup to automatically include all 'extra_inputs' and 'extra_template_inputs'
         # to Dakota's "link files" option. Create a string of the file names in
@@ -137,44 +162,282 @@ class PluginDakota(PluginGeneric):
 
             self.dakota_link_files_string = " ".join(f"'{item}'" for item in dakota_link_files)
 
-    def prerun(self, params: Parameters, filename: Optional[str] = None):
+    def prerun(self, params: Parameters, filename: Optional[str] = None, *,
+               cwd: Optional[Path] = None):
         """ Change the permisison of the Dakota driver file
 
         Parameters
         ----------
         params
             Parameters used to render template
+        cwd
+            Directory in which templates are rendered. Defaults to the current
+            working directory.
         """
+        cwd = Path.cwd() if cwd is None else Path(cwd)
 
         # Store the string for the "link_files" in params.
         if self._auto_link_files is not None:
             params[self._auto_link_files] = self.dakota_link_files_string
 
-        super().prerun(params)
+        super().prerun(params, cwd=cwd)
         if 'dakota_driver_name' in params.keys():
-            os.chmod(params['dakota_driver_name'], 0o755)
+            os.chmod(cwd / params['dakota_driver_name'], 0o755)
 
     @property
     def execute_command(self):
         return [str(self.executable), "-i", self.input_name]
 
+    def _identity(self) -> list:
+        identity = super()._identity()
+        if self.evaluate is not None:
+            evaluate = self.evaluate
+            identity += [getattr(evaluate, '__module__', None),
+                         getattr(evaluate, '__qualname__', repr(evaluate))]
+        return identity
+
+    def run(self, mpi_args: Optional[List[str]] = None,
+            extra_args: Optional[List[str]] = None, *,
+            cwd: Optional[Path] = None):
+        """Run Dakota, serving evaluations of the coupled code if needed
+
+        Parameters
+        ----------
+        mpi_args
+            MPI execute command and any additional MPI arguments to pass,
+            e.g. ['mpiexec', '-n', '8'].
+        extra_args
+            Additional command-line arguments to append after the main command
+        cwd
+            Directory in which the executable is run. Defaults to the current
+            working directory.
+
+        """
+        if self.evaluate is None:
+            return super().run(mpi_args, extra_args, cwd=cwd)
+
+        args = (mpi_args or []) + self.execute_command + (extra_args or [])
+        with DakotaEvaluationServer(self.evaluate) as server:
+            run_proc(args, cwd=cwd, env={**os.environ, **server.environment})
+
+    async def arun(self, mpi_args: Optional[List[str]] = None,
+                   extra_args: Optional[List[str]] = None, *,
+                   cwd: Optional[Path] = None):
+        """Run Dakota as an :mod:`asyncio` subprocess, serving evaluations of
+        the coupled code if needed
+
+        Parameters
+        ----------
+        mpi_args
+            MPI execute command and any additional MPI arguments to pass,
+            e.g. ['mpiexec', '-n', '8'].
+        extra_args
+            Additional command-line arguments to append after the main command
+        cwd
+            Directory in which the executable is run. Defaults to the current
+            working directory.
+
+        """
+        if self.evaluate is None:
+            return await super().arun(mpi_args, extra_args, cwd=cwd)
+
+        args = (mpi_args or []) + self.execute_command + (extra_args or [])
+        with DakotaEvaluationServer(self.evaluate) as server:
+            await run_proc_async(args, cwd=cwd, env={**os.environ, **server.environment})
+
+
+class DakotaEvaluationServer:
+    """Server that evaluates the coupled code for the Dakota driver
+
+    Rather than starting a new Python interpreter for each function evaluation,
+    :func:`run_dakota_driver` can send the variables chosen by Dakota to a
+    long-lived server in the WATTS process. The server calls a user-supplied
+    function with the variables and returns its responses, so that imported
+    modules, compiled templates, and plugin objects stay warm across
+    evaluations. Each connection is served on its own thread so that Dakota's
+    asynchronous evaluations run concurrently.
+
+    The server is normally started by :class:`PluginDakota` when its
+    ``evaluate`` argument is given, but it can also be used as a context manager
+    directly, in which case the environment variables in :attr:`environment`
+    need to be passed to Dakota.
+
+    Parameters
+    ----------
+    evaluate
+        Function that is called with a dictionary mapping Dakota's variable
+        descriptors to their values. It must return either a sequence of
+        responses in the order of Dakota's response descriptors or a
+        :class:`~watts.Parameters` (or dictionary) with a
+        ``'dakota_descriptors'`` entry as in coupled-code scripts.
+    address
+        Address to listen on. Defaults to a Unix domain socket (or a named pipe
+        on Windows).
+    authkey
+        Key used to authenticate connections. Defaults to a random key.
+
+    Attributes
+    ----------
+    address
+        Address the server is listening on
+    environment
+        Environment variables that allow :func:`run_dakota_driver` to connect
+        to the server
+
+    """
+    def __init__(self, evaluate: Callable[[dict], Any],
+                 address: Optional[Union[str, tuple]] = None,
+                 authkey: Optional[bytes] = None):
+        self.evaluate = evaluate
+        self._authkey = os.urandom(32) if authkey is None else authkey
+        self._listener = Listener(address, authkey=self._authkey)
+        self._closed = False
+        self._thread = None
+
+    @property
+    def address(self) -> Union[str, tuple]:
+        return self._listener.address
+
+    @property
+    def environment(self) -> dict:
+        return {
+            _SERVER_ADDRESS_VARIABLE: _format_address(self.address),
+            _SERVER_AUTHKEY_VARIABLE: self._authkey.hex()
+        }
+
+    def start(self):
+        """Start accepting evaluations on a background thread"""
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop accepting evaluations"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            # Unblock the pending accept() with a connection of our own
+            try:
+                Client(self.address, authkey=self._authkey).close()
+            except OSError:
+                pass
+            self._thread.join()
+        self._listener.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                # Failed authentication or listener closed
+                if self._closed:
+                    return
+                continue
+            if self._closed:
+                conn.close()
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                variables = conn.recv()
+            except EOFError:
+                return
+            try:
+                reply = ('ok', _dakota_responses(self.evaluate(variables)))
+            except Exception:
+                reply = ('error', traceback.format_exc())
+            conn.send(reply)
+
+
+def _format_address(address: Union[str, tuple]) -> str:
+    if isinstance(address, tuple):
+        host, port = address
+        return f'{host}:{port}'
+    return address
+
+
+def _parse_address(address: str) -> Union[str, tuple]:
+    match = re.fullmatch(r'([^/\\]*):(\d+)', address)
+    if match is not None:
+        return (match.group(1), int(match.group(2)))
+    return address
+
+
+def _dakota_responses(output: Any) -> list:
+    """Convert the output of the coupled code to a list of responses
+
+    Parameters
+    ----------
+    output
+        Either a sequence of responses or a mapping with a
+        ``'dakota_descriptors'`` entry naming the entries that hold the
+        responses, in order
+
+    Returns
+    -------
+    List of response values in the order expected by Dakota
+    """
+    if isinstance(output, Mapping):
+        if 'dakota_descriptors' not in output:
+            raise KeyError("Output of the coupled code has no 'dakota_descriptors' entry.")
+        return [output[name] for name in output['dakota_descriptors'].values()]
+    return list(output)
 
-def run_dakota_driver(coupled_code_exec: str):
+
+def run_dakota_driver(coupled_code_exec: Optional[str] = None):
     """ Function to execute the workflow for data
     exchange between Dakota and the coupled code
     in the Dakota driver script.
 
+    If Dakota was launched by a :class:`PluginDakota` with an ``evaluate``
+    function, the evaluation is sent to its :class:`DakotaEvaluationServer`.
+    Otherwise, the coupled-code script is run in a new Python interpreter.
+
     Parameters
     ----------
     coupled_code_exec
         The name of the WATTS python script of the
         coupled code.
     """
-    results = _parse_dakota_input()
-    retval = _run_coupled_code(coupled_code_exec)
+    address = os.environ.get(_SERVER_ADDRESS_VARIABLE)
+    if address is not None:
+        variables, results = _read_dakota_parameters()
+        retval = _evaluate_on_server(variables, address)
+    else:
+        if coupled_code_exec is None:
+            raise ValueError("No coupled-code script was given and no WATTS "
+                             "evaluation server is running.")
+        results = _parse_dakota_input()
+        retval = _run_coupled_code(coupled_code_exec)
     _return_dakota_input(results, retval)
 
 
+def _read_dakota_parameters():
+    """Read the parameters file written by Dakota
+
+    Returns
+    -------
+    variables
+        Dictionary mapping variable descriptors to their values
+    results
+        Results from Dakota's output file
+    """
+
+    from interfacing import interfacing as di # Dakota's interface module
+
+    params, results = di.read_parameters_file()
+    return dict(params._variables), results
+
+
 def _parse_dakota_input() -> Results:
     """Parse Dakota input
 
@@ -186,18 +449,39 @@ def _parse_dakota_input() -> Results:
     results
         Results from Dakota's output file
     """
-
-    from interfacing import interfacing as di # Dakota's interface module
-
-    params, results = di.read_parameters_file()
+    variables, results = _read_dakota_parameters()
 
     # Dump params to external params.json file for future use by the template engine
     params_for_template_engine_file_path = "params.json"
     with open(params_for_template_engine_file_path, 'w') as outfile:
-        f = json.dump(params._variables,  outfile, default=lambda o: o.__dict__)
+        f = json.dump(variables,  outfile, default=lambda o: o.__dict__)
     return(results)
 
 
+def _evaluate_on_server(variables: dict, address: str) -> dict:
+    """Send an evaluation to a running :class:`DakotaEvaluationServer`
+
+    Parameters
+    ----------
+    variables
+        Dictionary mapping variable descriptors to their values
+    address
+        Address of the server as stored in the environment
+
+    Returns
+    -------
+    retval
+        Processed output from the coupled code.
+    """
+    authkey = bytes.fromhex(os.environ[_SERVER_AUTHKEY_VARIABLE])
+    with Client(_parse_address(address), authkey=authkey) as conn:
+        conn.send(variables)
+        status, value = conn.recv()
+    if status != 'ok':
+        raise RuntimeError(f"Evaluation of the coupled code failed:\n{value}")
+    return {'fns': value}
+
+
 def _run_coupled_code(coupled_code_exec: str) -> dict:
     """ Run the coupled code
 
@@ -224,9 +508,7 @@ def _run_coupled_code(coupled_code_exec: str) -> dict:
     if os.path.exists('opt_res.out'):
         db = pickle.load(open('opt_res.out', 'rb'))
         if 'dakota_descriptors' in db.keys():
-            res_output = []
-            for key in db['dakota_descriptors']:
-                res_output.append(db[db['dakota_descriptors'][key]])
+            res_output = _dakota_responses(db)
     else:
         raise RuntimeError("'opt_res.out' file is missing.")
 
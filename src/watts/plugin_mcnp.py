@@ -1,20 +1,26 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+from __future__ import annotations
+from collections import OrderedDict
+import json
 import os
 import re
 from pathlib import Path
-from typing import List, Optional, Dict, Tuple
-
-from uncertainties import ufloat
+import threading
+from typing import TYPE_CHECKING, List, Optional, Dict, Tuple
 
 from .fileutils import PathLike
-from .fundamental_data import ATOMIC_SYMBOL, ATOMIC_NUMBER, isotopes, atomic_mass
+from .fundamental_data import ATOMIC_SYMBOL, ATOMIC_NUMBER, isotopes, atomic_masses
 from .plugin import PluginGeneric, _find_executable
 from .results import Results
 
+if TYPE_CHECKING:
+    from uncertainties import ufloat
+
 
-def expand_element(xsdir: Optional[PathLike] = None):
+def expand_element(xsdir: Optional[PathLike] = None,
+                   xsdir_index: Optional[PathLike] = None):
     def expand_element_inner(material: str, default_suffix: str = None) -> str:
         """Expand elements in an MCNP material definition
 
@@ -36,7 +42,7 @@ def expand_element(xsdir: Optional[PathLike] = None):
         # Note that the 'xsdir' variable is in an enclosing scope -- it gets
         # passed in by PluginMCNP so that each instance of the plugin can
         # uniquely set its own xsdir
-        available_nuclides = _get_nuclides_from_xsdir(xsdir)
+        available_nuclides = _get_nuclides_from_xsdir(xsdir, xsdir_index)
 
         lines_out = []
         for line in lines_in:
@@ -135,15 +141,16 @@ def expand_element(xsdir: Optional[PathLike] = None):
 
                     if weight_percent:
                         # Convert molar fractions to mass fractions
-                        total = sum([fraction*atomic_mass(isotope)
-                                     for isotope, fraction in isotope_fractions])
+                        masses = atomic_masses(isotope for isotope, _ in isotope_fractions)
+                        total = sum([fraction*mass for (_, fraction), mass
+                                     in zip(isotope_fractions, masses)])
                         isotope_fractions = [
-                            (isotope, fraction/total*atomic_mass(isotope))
-                            for isotope, fraction in isotope_fractions
+                            (isotope, fraction/total*mass)
+                            for (isotope, fraction), mass in zip(isotope_fractions, masses)
                         ]
 
                     for isotope, fraction in isotope_fractions:
-                        iso_A = int(*re.match(rf'{symbol}(\d+)', isotope).groups())
+                        iso_A = int(isotope[len(symbol):])
                         lines_out.append(f"{start}{Z}{iso_A:03}.{suffix} {conc * fraction}")
 
                         # Prevent 'm#' from being written multiple times
@@ -156,13 +163,64 @@ def expand_element(xsdir: Optional[PathLike] = None):
     return expand_element_inner
 
 
-def _get_nuclides_from_xsdir(path: Optional[PathLike] = None) -> Dict[Tuple[int, str], List[str]]:
+# Maximum number of xsdir indices kept in memory
+_XSDIR_CACHE_SIZE = 8
+
+
+class _XsdirCache:
+    """Least-recently-used cache of indices of xsdir files
+
+    Entries are keyed by the path, size, and modification time of an xsdir file
+    so that each file is only parsed once per process, and the least recently
+    used entries are evicted once the number of entries exceeds a limit.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            tables = self._entries.get(key)
+            if tables is not None:
+                self._entries.move_to_end(key)
+            return tables
+
+    def put(self, key: tuple, tables: dict):
+        with self._lock:
+            self._entries[key] = tables
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_xsdir_indices = _XsdirCache(_XSDIR_CACHE_SIZE)
+
+
+def _get_nuclides_from_xsdir(
+    path: Optional[PathLike] = None,
+    index_file: Optional[PathLike] = None
+) -> Dict[Tuple[int, str], List[str]]:
     """Determine available nuclides from an MCNP xsdir file.
 
+    The xsdir file is only parsed the first time it is used (or when it has
+    changed since); afterwards, the index of available nuclides is taken from
+    an in-memory cache shared by all callers in the process.
+
     Parameters
     ----------
     path
         Path to xsdir file
+    index_file
+        Path to a file where the index of available nuclides is stored so that
+        other processes don't need to parse the xsdir file again
 
     Returns
     -------
@@ -177,42 +235,99 @@ def _get_nuclides_from_xsdir(path: Optional[PathLike] = None) -> Dict[Tuple[int,
                 "MCNP cross section libraries are available.")
         path = Path(datapath) / 'xsdir'
 
-    # Find 'directory' section
-    with open(path, 'r') as fh:
-        lines = fh.readlines()
-    for index, line in enumerate(lines):
-        if line.strip().lower() == 'directory':
-            break
-    else:
-        raise RuntimeError("Could not find 'directory' section in MCNP xsdir file")
-
-    # Handle continuation lines indicated by '+' at end of line
-    lines = lines[index + 1:]
-    continue_lines = [i for i, line in enumerate(lines)
-                      if line.strip().endswith('+')]
-    for i in reversed(continue_lines):
-        lines[i] = lines[i].strip()[:-1] + lines.pop(i + 1)
-
-    # Create list of ACE libraries
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    tables = _xsdir_indices.get(key)
+    if tables is not None:
+        return tables
+
+    if index_file is not None:
+        tables = _load_xsdir_index(index_file, key)
+    if tables is None:
+        tables = _parse_xsdir(path)
+        if index_file is not None:
+            _save_xsdir_index(index_file, key, tables)
+
+    _xsdir_indices.put(key, tables)
+    return tables
+
+
+def _parse_xsdir(path: PathLike) -> Dict[Tuple[int, str], List[str]]:
+    """Parse the 'directory' section of an MCNP xsdir file.
+
+    Parameters
+    ----------
+    path
+        Path to xsdir file
+
+    Returns
+    -------
+    dict
+        Dictionary mapping (Z, suffix) to a list of available nuclides
+    """
     tables = {}
-    for line in lines:
-        words = line.split()
-        if len(words) < 3:
-            continue
+    with open(path, 'r') as fh:
+        # Find 'directory' section
+        for line in fh:
+            if line.strip().lower() == 'directory':
+                break
+        else:
+            raise RuntimeError("Could not find 'directory' section in MCNP xsdir file")
+
+        # Create list of ACE libraries, joining continuation lines indicated by
+        # '+' at end of line as they are read
+        entry = ''
+        for line in fh:
+            stripped = line.strip()
+            if stripped.endswith('+'):
+                entry += stripped[:-1]
+                continue
+            words = (entry + line).split()
+            entry = ''
+            if len(words) < 3:
+                continue
 
-        if not words[0].endswith('c'):
-            continue
+            if not words[0].endswith('c'):
+                continue
 
-        zaid, suffix = words[0].split('.')
-        Z, A = divmod(int(zaid), 1000)
-        symbol = ATOMIC_SYMBOL[Z]
-        if (Z, suffix) not in tables:
-            tables[Z, suffix] = []
-        tables[Z, suffix].append(f'{symbol}{A}')
+            zaid, suffix = words[0].split('.')
+            Z, A = divmod(int(zaid), 1000)
+            symbol = ATOMIC_SYMBOL[Z]
+            tables.setdefault((Z, suffix), []).append(f'{symbol}{A}')
 
     return tables
 
 
+def _load_xsdir_index(index_file: PathLike, key: tuple) -> Optional[dict]:
+    """Load an index of available nuclides if it matches the xsdir file"""
+    try:
+        with open(index_file, 'r', encoding='utf-8') as fh:
+            stored = json.load(fh)
+        if tuple(stored['key']) != key:
+            return None
+        return {(Z, suffix): nuclides for Z, suffix, nuclides in stored['tables']}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_xsdir_index(index_file: PathLike, key: tuple, tables: dict):
+    """Store an index of available nuclides, replacing the file atomically"""
+    index_file = Path(index_file)
+    tmp_file = index_file.with_name(f'{index_file.name}.{os.getpid()}.tmp')
+    stored = {
+        'key': list(key),
+        'tables': [[Z, suffix, nuclides] for (Z, suffix), nuclides in tables.items()]
+    }
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as fh:
+            json.dump(stored, fh)
+        os.replace(tmp_file, index_file)
+    except OSError:
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+
 class ResultsMCNP(Results):
     """MCNP simulation results
 
@@ -243,6 +358,7 @@ class ResultsMCNP(Results):
 
     @property
     def keff(self) -> ufloat:
+        from uncertainties import ufloat
         with open(self.base_path / 'outp', 'r') as f:
             for line in f:
                 if line.strip().startswith('col/abs/trk len'):
@@ -282,6 +398,10 @@ class PluginMCNP(PluginGeneric):
         Whether to display output from stdout when MCNP is run
     show_stderr
         Whether to display output from stderr when MCNP is run
+    xsdir_index
+        Path to a file where the index of nuclides available in the xsdir file
+        is stored so that the xsdir file isn't parsed again by other processes.
+        The index is always cached in memory within a process.
 
     Attributes
     ----------
@@ -300,7 +420,8 @@ class PluginMCNP(PluginGeneric):
         extra_inputs: Optional[List[str]] = None,
         extra_template_inputs: Optional[List[PathLike]] = None,
         show_stdout: bool = False,
-        show_stderr: bool = False
+        show_stderr: bool = False,
+        xsdir_index: Optional[PathLike] = None
     ):
         executable = _find_executable(executable, 'MCNP_DIR')
         super().__init__(
@@ -310,6 +431,7 @@ class PluginMCNP(PluginGeneric):
         self.input_name = "mcnp_input"
 
         # Add custom 'expand_element' Jinja filter
-        self.render_template.environment.filters['expand_element'] = expand_element(xsdir)
+        expand = expand_element(xsdir, xsdir_index)
+        self.render_template.environment.filters['expand_element'] = expand
         for renderer in self.extra_render_templates:
-            renderer.environment.filters['expand_element'] = expand_element(xsdir)
+            renderer.environment.filters['expand_element'] = expand
@@ -1,10 +1,12 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
-from typing import List, Optional
-
-import numpy as np
-import pandas as pd
+from collections.abc import Mapping
+import json
+import os
+from pathlib import Path
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from .fileutils import PathLike
 from .parameters import Parameters
@@ -12,6 +14,175 @@ from .plugin import PluginGeneric, _find_executable
 from .results import Results, ExecInfo
 
 
+# Name of the directory within a result directory where columns read from CSV
+# files are cached
+_CSV_CACHE_DIRNAME = '.csv_cache'
+
+
+class MOOSECSVData(Mapping):
+    """Data from MOOSE CSV files that is loaded on first access
+
+    Only the headers of the CSV files are read to determine the available keys.
+    When a value is accessed, all columns of the CSV file that contains it are
+    read. If caching is enabled, the columns are also stored as ``.npy`` files
+    in a hidden directory within the result directory so that they can be
+    memory-mapped rather than parsed when the result is accessed again.
+
+    Parameters
+    ----------
+    base_path
+        Path to directory storing results
+    input_file
+        Name of the MOOSE input file
+    outputs
+        List of output files
+    cache
+        Whether to cache columns in binary files
+
+    """
+    def __init__(self, base_path: Path, input_file: PathLike,
+                 outputs: List[Path], cache: bool = True):
+        self.base_path = base_path
+        self._input_file = Path(input_file)
+        self._outputs = outputs
+        self._cache = cache
+        self._sources = None
+        self._columns = {}
+
+    def __getitem__(self, key: str):
+        filename, column, as_float = self.sources[key]
+        value = self._load(filename)[column]
+        return value.astype(float, copy=False) if as_float else value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.sources)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def __repr__(self):
+        return f"<MOOSECSVData: {list(self.sources)}>"
+
+    @property
+    def sources(self) -> Dict[str, Tuple[str, str, bool]]:
+        """Mapping of keys to the CSV file, column, and whether the column is
+        converted to floating point"""
+        if self._sources is None:
+            self._sources = self._find_sources()
+        return self._sources
+
+    def _find_sources(self) -> Dict[str, Tuple[str, str, bool]]:
+        stem = self._input_file.stem
+
+        # MOOSE's main output '.csv' file
+        sources = {}
+        csv_file = self._input_file.with_name(f"{stem}_csv.csv")
+        if (self.base_path / csv_file).exists():
+            for column_name in self._header(str(csv_file)):
+                sources[column_name] = (str(csv_file), column_name, False)
+
+        # MOOSE's vector postprocesssor '.csv' files, with each parameter
+        # saved as an individual array
+        for output in self._outputs:
+            if (output.name.startswith(f"{stem}_csv_") and
+                not output.name.endswith("_0000.csv")):
+                header = self._header(str(output))
+                coordinates = ("id", "x", "y", "z")
+                csv_param = [name for name in header if name not in coordinates]
+                sources[output.stem] = (str(output), csv_param[0], True)
+
+                for name in coordinates:
+                    new_name = output.name[:-8] + name
+                    if new_name not in sources:
+                        sources[new_name] = (str(output), name, True)
+
+        return sources
+
+    def _header(self, filename: str) -> List[str]:
+        """Column names of a CSV file, preferably from the cache"""
+        index = self._read_cache_index(filename)
+        if index is not None:
+            return index['columns']
+
+        import pandas as pd
+        return list(pd.read_csv(self.base_path / filename, nrows=0).columns)
+
+    def _cache_dir(self, filename: str) -> Path:
+        return self.base_path / _CSV_CACHE_DIRNAME / Path(filename).name
+
+    def _read_cache_index(self, filename: str) -> Optional[dict]:
+        """Read the index of cached columns if it is up to date"""
+        if not self._cache:
+            return None
+        try:
+            with open(self._cache_dir(filename) / 'index.json') as fh:
+                index = json.load(fh)
+            stat = (self.base_path / filename).stat()
+        except (OSError, ValueError):
+            return None
+        if [index['size'], index['mtime_ns']] != [stat.st_size, stat.st_mtime_ns]:
+            return None
+        return index
+
+    def _load(self, filename: str) -> Dict[str, Any]:
+        """Return all columns of a CSV file"""
+        if filename in self._columns:
+            return self._columns[filename]
+
+        import numpy as np
+
+        cache_dir = self._cache_dir(filename)
+        index = self._read_cache_index(filename)
+        if index is not None:
+            # Columns are mapped copy-on-write so that they can be modified
+            # without affecting the cache. Mapped files can't be moved or
+            # removed on Windows, so columns are read immediately there.
+            mmap_mode = None if sys.platform == 'win32' else 'c'
+            columns = {
+                name: np.load(cache_dir / f'{i}.npy', mmap_mode=mmap_mode)
+                for i, name in enumerate(index['columns'])
+            }
+        else:
+            import pandas as pd
+            csv_file = self.base_path / filename
+            stat = csv_file.stat()
+            df = pd.read_csv(csv_file)
+            columns = {name: np.array(df[name]) for name in df.columns}
+            if self._cache:
+                self._write_cache(cache_dir, columns, stat)
+
+        self._columns[filename] = columns
+        return columns
+
+    @staticmethod
+    def _write_cache(cache_dir: Path, columns: Dict[str, Any], stat: os.stat_result):
+        """Store columns of a CSV file as .npy files"""
+        import numpy as np
+
+        # Columns holding arbitrary objects can't be stored without pickling
+        if any(value.dtype.hasobject for value in columns.values()):
+            return
+        try:
+            # Files are written under a temporary name and renamed so that
+            # other processes never see partially written files. The index is
+            # written last so that the cache is only used once it is complete.
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            suffix = f'.{os.getpid()}.tmp'
+            for i, value in enumerate(columns.values()):
+                with open(cache_dir / f'{i}.npy{suffix}', 'wb') as fh:
+                    np.save(fh, value)
+                os.replace(cache_dir / f'{i}.npy{suffix}', cache_dir / f'{i}.npy')
+
+            index = {'columns': list(columns), 'size': stat.st_size,
+                     'mtime_ns': stat.st_mtime_ns}
+            with open(cache_dir / f'index.json{suffix}', 'w') as fh:
+                json.dump(index, fh)
+            os.replace(cache_dir / f'index.json{suffix}', cache_dir / 'index.json')
+        except OSError:
+            # Result directories that can't be written to are simply not cached
+            pass
+
+
 class ResultsMOOSE(Results):
     """MOOSE simulation results
 
@@ -25,52 +196,48 @@ class ResultsMOOSE(Results):
         List of input files
     outputs
         List of output files
+    base_path
+        Path to directory storing results
 
     Attributes
     ----------
     stdout
         Standard output from MOOSE run
     csv_data
-        Dictionary with data from .csv files
+        Mapping with data from .csv files, which is read when first accessed
+    cache_csv_data
+        Whether data read from .csv files is cached in binary files within the
+        result directory
+
     """
+
+    cache_csv_data = True
+
     def __init__(self, params: Parameters, exec_info: ExecInfo,
-                 inputs: List[PathLike], outputs: List[PathLike]):
-        super().__init__(params, exec_info, inputs, outputs)
-        self.csv_data = self._save_MOOSE_csv()
-
-    def _save_MOOSE_csv(self) -> dict:
-        """Read all MOOSE '.csv' files and return results in a dictionary
-
-        Returns
-        -------
-        Results from MOOSE .csv files
-
-        """
-        input_file = self.inputs[0]
-        csv_file = input_file.with_name(f"{input_file.stem}_csv.csv")
-
-        # Save MOOSE's main output '.csv' files
-        csv_data = {}
-        if csv_file.exists():
-            csv_file_df = pd.read_csv(csv_file)
-            for column_name in csv_file_df.columns:
-                csv_data[column_name] = np.array(csv_file_df[column_name])
-
-        # Read MOOSE's vector postprocesssor '.csv' files and save the
-        # parameters as individual array
-        for output in self.outputs:
-            if (output.name.startswith(f"{input_file.stem}_csv_") and
-                not output.name.endswith("_0000.csv")):
-                vector_csv_df = pd.read_csv(output)
-                csv_param = list(set(vector_csv_df.columns) - {"id", "x", "y", "z"})
-                csv_data[output.stem] = np.array(vector_csv_df[csv_param[0]], dtype=float)
+                 inputs: List[PathLike], outputs: List[PathLike],
+                 base_path: Optional[PathLike] = None):
+        super().__init__(params, exec_info, inputs, outputs, base_path)
+        self._csv_data = None
 
-                for name in ("id", "x", "y", "z"):
-                    new_name = output.name[:-8] + name
-                    if new_name not in csv_data:
-                        csv_data[new_name] = np.array(vector_csv_df[name], dtype=float)
+    @property
+    def csv_data(self) -> MOOSECSVData:
+        # The mapping is recreated if files have been moved
+        if self._csv_data is None or self._csv_data.base_path != self.base_path:
+            self._csv_data = MOOSECSVData(
+                self.base_path, self.inputs[0], self.outputs, self.cache_csv_data)
+        return self._csv_data
+
+    def __getstate__(self):
+        # Data is read from the CSV files again when needed rather than pickled
+        state = self.__dict__.copy()
+        state['_csv_data'] = None
+        return state
 
-        return csv_data
+    def __setstate__(self, state):
+        # Results pickled by older versions contain all CSV data
+        state.pop('csv_data', None)
+        state['_csv_data'] = None
+        self.__dict__.update(state)
 
 
 class PluginMOOSE(PluginGeneric):
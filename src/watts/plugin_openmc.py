@@ -1,17 +1,165 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
-from functools import lru_cache
+from __future__ import annotations
+from collections import OrderedDict
+from fnmatch import fnmatch
+import inspect
+import json
+import os
 from pathlib import Path
-from typing import Callable, Mapping, List, Optional
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Mapping, List, Optional
 
-from uncertainties import ufloat
-
-from .fileutils import PathLike
+from .fileutils import (
+    PathLike, file_changed, log_files, scan_directory, working_directory)
 from .parameters import Parameters
-from .plugin import Plugin
+from .plugin import Plugin, files_before_run
 from .results import Results, ExecInfo
 
+if TYPE_CHECKING:
+    from uncertainties import ufloat
+
+
+# Name of the directory next to statepoint files where extracted data is stored
+_STATEPOINT_CACHE_DIRNAME = '.statepoint_cache'
+
+# Patterns of file names produced by OpenMC that are included in results
+_OUTPUT_PATTERNS = (
+    'tallies.out', 'source.*.h5', 'particle*.h5', 'statepoint.*.h5',
+    'volume*.h5', '*.png', '*.ppm'
+)
+
+
+class _StatepointCache:
+    """Least-recently-used cache of data extracted from statepoint files
+
+    Entries are keyed by the path, size, and modification time of a statepoint
+    file, and the least recently used entries are evicted once the total size
+    of their arrays exceeds a limit.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: tuple, data: dict, max_bytes: int):
+        nbytes = _statepoint_data_nbytes(data)
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = data
+            self._nbytes += nbytes
+            while self._nbytes > max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= _statepoint_data_nbytes(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+_statepoint_cache = _StatepointCache()
+
+
+def _statepoint_data_nbytes(data: dict) -> int:
+    return sum(t['mean'].nbytes + t['std_dev'].nbytes for t in data['tallies'].values())
+
+
+def _read_statepoint(path: Path) -> dict:
+    """Extract k-effective and tally results from a statepoint file
+
+    Parameters
+    ----------
+    path
+        Path to the statepoint file
+
+    Returns
+    -------
+    Dictionary with the nominal value and standard deviation of k-effective
+    (or None for fixed-source simulations) and, for each tally ID, a
+    dictionary with the name, scores, nuclides, and mean and standard deviation
+    arrays of the tally
+    """
+    import numpy as np
+    import openmc
+
+    with openmc.StatePoint(path) as sp:
+        keff = sp.keff if hasattr(sp, 'keff') else sp.k_combined
+        tallies = {}
+        for tally_id, tally in sp.tallies.items():
+            tallies[tally_id] = {
+                'name': tally.name,
+                'scores': list(tally.scores),
+                'nuclides': [str(nuc) for nuc in tally.nuclides],
+                'mean': np.asarray(tally.mean),
+                'std_dev': np.asarray(tally.std_dev),
+            }
+
+    if keff is not None:
+        keff = (keff.nominal_value, keff.std_dev)
+    return {'keff': keff, 'tallies': tallies}
+
+
+def _save_statepoint_data(filename: Path, data: dict, stat: os.stat_result):
+    """Store data extracted from a statepoint in a .npz file"""
+    import numpy as np
+
+    metadata = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'keff': data['keff'],
+        'tallies': {
+            str(tally_id): {key: tally[key] for key in ('name', 'scores', 'nuclides')}
+            for tally_id, tally in data['tallies'].items()
+        }
+    }
+    arrays = {}
+    for tally_id, tally in data['tallies'].items():
+        arrays[f'mean_{tally_id}'] = tally['mean']
+        arrays[f'std_dev_{tally_id}'] = tally['std_dev']
+
+    # Write under a temporary name so that a partially written file is never
+    # read by another process
+    tmp_file = filename.with_name(f'{filename.name}.{os.getpid()}.tmp')
+    try:
+        filename.parent.mkdir(exist_ok=True)
+        with open(tmp_file, 'wb') as fh:
+            np.savez(fh, metadata=np.array(json.dumps(metadata)), **arrays)
+        os.replace(tmp_file, filename)
+    except OSError:
+        # Data simply isn't persisted if the result directory is read-only
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+
+def _load_statepoint_data(filename: Path, stat: os.stat_result) -> Optional[dict]:
+    """Load data extracted from a statepoint if it is up to date"""
+    import numpy as np
+
+    try:
+        with np.load(filename) as npz:
+            metadata = json.loads(str(npz['metadata']))
+            if [metadata['size'], metadata['mtime_ns']] != [stat.st_size, stat.st_mtime_ns]:
+                return None
+            tallies = {}
+            for tally_id, tally in metadata['tallies'].items():
+                tally['mean'] = npz[f'mean_{tally_id}']
+                tally['std_dev'] = npz[f'std_dev_{tally_id}']
+                tallies[int(tally_id)] = tally
+    except (OSError, ValueError, KeyError):
+        return None
+    keff = metadata['keff']
+    return {'keff': None if keff is None else tuple(keff), 'tallies': tallies}
+
 
 class ResultsOpenMC(Results):
     """OpenMC simulation results
@@ -26,6 +174,8 @@ class ResultsOpenMC(Results):
         List of input files
     outputs
         List of output files
+    base_path
+        Path to directory storing results
 
     Attributes
     ----------
@@ -37,37 +187,77 @@ class ResultsOpenMC(Results):
         Standard output from OpenMC run
     tallies
         List of OpenMC tally objects
+    tally_data
+        Dictionary mapping tally IDs to the name, scores, nuclides, and arrays
+        of the mean and standard deviation of each tally in the final
+        statepoint
+    statepoint_cache_bytes
+        Maximum total size in bytes of tally arrays kept in memory across all
+        results. Data extracted from statepoints is also stored in a hidden
+        directory next to the statepoint files so that it can be loaded
+        without opening the statepoint again.
+
     """
 
+    statepoint_cache_bytes = 1 << 28
+
     def __init__(self, params: Parameters, exec_info: ExecInfo,
-                 inputs: List[Path], outputs: List[Path]):
-        super().__init__(params, exec_info, inputs, outputs)
+                 inputs: List[Path], outputs: List[Path],
+                 base_path: Optional[PathLike] = None):
+        super().__init__(params, exec_info, inputs, outputs, base_path)
 
     @property
     def statepoints(self) -> List[Path]:
         return [p for p in self.outputs if p.name.startswith('statepoint')]
 
     @property
-    @lru_cache()
     def keff(self) -> ufloat:
-        import openmc
-        # Get k-effective from last statepoint
-        last_statepoint = self.statepoints[-1]
-        with openmc.StatePoint(last_statepoint) as sp:
-            if hasattr(sp, 'keff'):
-                return sp.keff
-            else:
-                return sp.k_combined
+        from uncertainties import ufloat
+        keff = self._statepoint_data()['keff']
+        return None if keff is None else ufloat(*keff)
 
     @property
-    @lru_cache()
     def tallies(self) -> List:
         import openmc
-        # Get k-effective from last statepoint
-        last_statepoint = self.statepoints[-1]
+        # Get tallies from last statepoint. For repeated access to tally
+        # results, tally_data avoids reading the statepoint each time.
+        last_statepoint = self.base_path / self.statepoints[-1]
         with openmc.StatePoint(last_statepoint) as sp:
             return list(sp.tallies.values())
 
+    @property
+    def tally_data(self) -> Dict[int, Dict[str, Any]]:
+        return self._statepoint_data()['tallies']
+
+    def _statepoint_data(self) -> dict:
+        """Get data extracted from the last statepoint
+
+        Data is taken from the in-memory cache, then from the file stored next
+        to the statepoint, and is otherwise read from the statepoint itself.
+        """
+        last_statepoint = self.base_path / self.statepoints[-1]
+        stat = last_statepoint.stat()
+        key = (str(last_statepoint.resolve()), stat.st_size, stat.st_mtime_ns)
+        data = _statepoint_cache.get(key)
+        if data is None:
+            filename = (last_statepoint.parent / _STATEPOINT_CACHE_DIRNAME /
+                        f'{last_statepoint.name}.npz')
+            data = _load_statepoint_data(filename, stat)
+            if data is None:
+                data = _read_statepoint(last_statepoint)
+                _save_statepoint_data(filename, data, stat)
+            _statepoint_cache.put(key, data, self.statepoint_cache_bytes)
+        return data
+
+
+def _accepts_cwd(function: Callable) -> bool:
+    """Determine whether a function accepts a `cwd` argument"""
+    try:
+        return 'cwd' in inspect.signature(function).parameters
+    except (ValueError, TypeError):
+        # Signatures of some builtins and C functions can't be determined
+        return False
+
 
 class PluginOpenMC(Plugin):
     """Plugin for running OpenMC
@@ -75,7 +265,9 @@ class PluginOpenMC(Plugin):
     Parameters
     ----------
     model_builder
-        Function that generates an OpenMC model
+        Function that generates an OpenMC model. The function is called with
+        the working directory changed to the execution directory so that it can
+        export XML files.
     extra_inputs
         Extra (non-templated) input files
     show_stdout
@@ -93,21 +285,28 @@ class PluginOpenMC(Plugin):
         self.unit_system = 'cgs'
         self.plugin_name = 'OpenMC'
 
-    def prerun(self, params: Parameters) -> None:
+    def prerun(self, params: Parameters, *, cwd: Optional[Path] = None) -> None:
         """Generate OpenMC input files
 
         Parameters
         ----------
         params
             Parameters used by the OpenMC template
+        cwd
+            Directory in which input files are generated. Defaults to the
+            current working directory.
         """
+        cwd = Path.cwd() if cwd is None else Path(cwd)
+
         # Convert quantities in parameters to CGS system
         params_copy = params.convert_units(system=self.unit_system)
 
         if self.model_builder is not None:
-            self.model_builder(params_copy)
+            with working_directory(cwd):
+                self.model_builder(params_copy)
 
-    def run(self, function: Optional[Callable] = None, **kwargs: Mapping):
+    def run(self, function: Optional[Callable] = None, *,
+            cwd: Optional[Path] = None, **kwargs: Mapping):
         """Run OpenMC
 
         Parameters
@@ -115,6 +314,9 @@ class PluginOpenMC(Plugin):
         function
             Function to execute. If not passed, defaults to only calling
             :func:`openmc.run`.
+        cwd
+            Directory in which OpenMC is run. Defaults to the current working
+            directory.
         **kwargs
             Keyword arguments passed on to ``function``
 
@@ -124,12 +326,19 @@ class PluginOpenMC(Plugin):
 
         """
         import openmc
-        if function:
+        if function is None:
+            function = openmc.run
+
+        if cwd is None:
             function(**kwargs)
+        elif _accepts_cwd(function):
+            function(cwd=str(cwd), **kwargs)
         else:
-            openmc.run(**kwargs)
+            with working_directory(cwd):
+                function(**kwargs)
 
-    def postrun(self, params: Parameters, exec_info: ExecInfo) -> ResultsOpenMC:
+    def postrun(self, params: Parameters, exec_info: ExecInfo, *,
+                cwd: Optional[Path] = None) -> ResultsOpenMC:
         """Collect information from OpenMC simulation and create results object
 
         Parameters
@@ -138,39 +347,48 @@ class PluginOpenMC(Plugin):
             Parameters used to create OpenMC model
         exec_info
             Execution information
+        cwd
+            Directory in which OpenMC was run. Defaults to the current working
+            directory.
 
         Returns
         -------
         OpenMC results object
         """
+        cwd = Path.cwd() if cwd is None else Path(cwd)
 
-        def files_since(pattern, timestamp):
-            matches = []
-            for p in Path.cwd().glob(pattern):
-                # Because of limited time resolution, we rely on access time to
-                # determine input files
-                mtime = p.stat().st_atime_ns
-                if mtime >= timestamp:
-                    matches.append(p)
-            matches.sort(key=lambda x: x.stat().st_mtime_ns)
-            return matches
+        # Scan the directory once and determine which files are new. If the
+        # files in the directory before OpenMC ran are not known, files modified
+        # since the start of the execution are considered new, with the start
+        # time truncated to whole seconds to allow for filesystems with a coarse
+        # time resolution.
+        files = scan_directory(cwd)
+        before = files_before_run(cwd)
+        if before is None:
+            since = exec_info.timestamp - exec_info.timestamp % 1_000_000_000
+            new_files = {name: st for name, st in files.items()
+                         if st.st_mtime_ns >= since}
+        else:
+            new_files = {name: st for name, st in files.items()
+                         if file_changed(before.get(name), st)}
+
+        def matching(pattern, candidates):
+            matches = [(st.st_mtime_ns, name) for name, st in candidates.items()
+                       if not name.startswith('.') and fnmatch(name, pattern)]
+            return [cwd / name for _, name in sorted(matches)]
 
         # Start with non-templated input files
-        inputs = [Path.cwd() / p.name for p in self.extra_inputs]
+        inputs = [cwd / p.name for p in self.extra_inputs]
 
-        # Get generated input files
-        for path in files_since('*.xml', exec_info.timestamp):
+        # Get generated input files, which were all written before OpenMC ran
+        xml_files = files if before is not None else new_files
+        for path in matching('*.xml', xml_files):
             if path not in inputs:
                 inputs.append(path)
 
         # Get list of all output files
-        outputs = ['OpenMC_log.txt']
-        outputs.extend(files_since('tallies.out', exec_info.timestamp))
-        outputs.extend(files_since('source.*.h5', exec_info.timestamp))
-        outputs.extend(files_since('particle*.h5', exec_info.timestamp))
-        outputs.extend(files_since('statepoint.*.h5', exec_info.timestamp))
-        outputs.extend(files_since('volume*.h5', exec_info.timestamp))
-        outputs.extend(files_since('*.png', exec_info.timestamp))
-        outputs.extend(files_since('*.ppm', exec_info.timestamp))
-
-        return ResultsOpenMC(params, exec_info, inputs, outputs)
+        outputs = log_files(cwd / 'OpenMC_log.txt')
+        for pattern in _OUTPUT_PATTERNS:
+            outputs.extend(matching(pattern, new_files))
+
+        return ResultsOpenMC(params, exec_info, inputs, outputs, cwd)
@@ -2,14 +2,13 @@
 # SPDX-License-Identifier: MIT
 
 from pathlib import Path
-import os
 import sys
 import tempfile
 from typing import Mapping, List, Optional
 
-from .fileutils import PathLike
+from .fileutils import PathLike, working_directory
 from .parameters import Parameters
-from .plugin import PluginGeneric, _find_executable
+from .plugin import Plugin, PluginGeneric, _find_executable
 from .results import Results, ExecInfo
 
 
@@ -28,12 +27,15 @@ class ResultsPyARC(Results):
         List of output files
     results_data
         PyARC results
+    base_path
+        Path to directory storing results
 
     """
 
     def __init__(self, params: Parameters, exec_info: ExecInfo,
-                 inputs: List[Path], outputs: List[Path], results_data: dict):
-        super().__init__(params, exec_info, inputs, outputs)
+                 inputs: List[Path], outputs: List[Path], results_data: dict,
+                 base_path: Optional[PathLike] = None):
+        super().__init__(params, exec_info, inputs, outputs, base_path)
         self.results_data = results_data
 
 
@@ -86,27 +88,48 @@ class PluginPyARC(PluginGeneric):
             )
         self._executable = Path(exe)
 
-    def run(self, **kwargs: Mapping):
+    def run(self, *, cwd: Optional[Path] = None, **kwargs: Mapping):
         """Run PyARC
 
+        PyARC changes the working directory of the process while it runs, so
+        only one execution of PyARC can be in progress at a time.
+
         Parameters
         ----------
+        cwd
+            Directory in which PyARC is run. Defaults to the current working
+            directory.
         **kwargs
             Keyword arguments passed on to :func:`pyarc.execute`
         """
+        cwd = Path.cwd() if cwd is None else Path(cwd)
         sys.path.insert(0, f'{self.executable.parent}')
         import PyARC
         self.pyarc = PyARC.PyARC()
         self.pyarc.user_object.do_run = True
         self.pyarc.user_object.do_postrun = True
-        od = Path.cwd()
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            self.pyarc.execute(["-i", self.input_name, "-w", tmpdir, "-o", str(od)], **kwargs)
+        # PyARC leaves the process in a different directory after execution, so
+        # the working directory is restored afterward
+        with working_directory(cwd), tempfile.TemporaryDirectory() as tmpdir:
+            self.pyarc.execute(["-i", self.input_name, "-w", tmpdir, "-o", str(cwd)], **kwargs)
         sys.path.pop(0)  # Restore sys.path to original state
-        os.chdir(od)  # TODO: I don't know why but I keep going to self.executable after execution - this is very wierd!
 
-    def postrun(self, params: Parameters, exec_info: ExecInfo) -> ResultsPyARC:
+    async def arun(self, *, cwd: Optional[Path] = None, **kwargs: Mapping):
+        """Run PyARC in a worker thread
+
+        Parameters
+        ----------
+        cwd
+            Directory in which PyARC is run. Defaults to the current working
+            directory.
+        **kwargs
+            Keyword arguments passed on to :func:`pyarc.execute`
+        """
+        await Plugin.arun(self, cwd=cwd, **kwargs)
+
+    def postrun(self, params: Parameters, exec_info: ExecInfo, *,
+                cwd: Optional[Path] = None) -> ResultsPyARC:
         """Collect information from PyARC and create results object
 
         Parameters
@@ -115,9 +138,13 @@ class PluginPyARC(PluginGeneric):
             Parameters used to create PyARC model
         exec_info
             Execution information
+        cwd
+            Directory in which PyARC was run. Defaults to the current working
+            directory.
 
         Returns
         -------
         PyARC results object
         """
-        return super().postrun(params, exec_info, results_data=self.pyarc.user_object.results)
+        return super().postrun(params, exec_info, cwd=cwd,
+                               results_data=self.pyarc.user_object.results)
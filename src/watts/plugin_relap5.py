@@ -1,20 +1,24 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+from contextlib import contextmanager
+import csv
+import os
 from pathlib import Path
 import shutil
 import subprocess
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-import numpy as np
-import pandas as pd
-
-from .fileutils import PathLike
+from .fileutils import PathLike, clone_file
 from .parameters import Parameters
 from .plugin import PluginGeneric, _find_executable
 from .results import Results, ExecInfo
 
 
+# Approximate number of characters of the plot file that are parsed at once
+_PLOTFL_BLOCK_SIZE = 1 << 22
+
+
 class ResultsRELAP5(Results):
     """RELAP5 simulation results
 
@@ -28,6 +32,8 @@ class ResultsRELAP5(Results):
         List of input files
     outputs
         List of output files
+    base_path
+        Path to directory storing results
 
     Attributes
     ----------
@@ -37,21 +43,44 @@ class ResultsRELAP5(Results):
         Dictionary with data from .csv files
     """
     def __init__(self, params: Parameters, exec_info: ExecInfo,
-                 inputs: List[PathLike], outputs: List[PathLike]):
-        super().__init__(params, exec_info, inputs, outputs)
+                 inputs: List[PathLike], outputs: List[PathLike],
+                 base_path: Optional[PathLike] = None):
+        super().__init__(params, exec_info, inputs, outputs, base_path)
         self.csv_data = self._get_relap5_csv_data()
 
     def _get_relap5_csv_data(self) -> dict:
         """Read relap5 '.csv' file and return results in a dictionary
 
+        If the binary 'R5-out.npy' file written alongside the CSV file when
+        converting the plot file exists, the data is read from it directly.
+
         Returns
         -------
         Results from relap5 .csv files
 
         """
+        import numpy as np
+        import pandas as pd
+
         csv_data = {}
-        if Path('R5-out.csv').exists():
-            csv_file_df = pd.read_csv('R5-out.csv')
+        csv_file = self.base_path / 'R5-out.csv'
+        npy_file = self.base_path / 'R5-out.npy'
+        if csv_file.exists() and npy_file.exists():
+            with open(csv_file, newline='') as f:
+                header = next(csv.reader(f))
+            data = np.load(npy_file)
+
+            # Use the same keys as when reading the CSV file with pandas
+            csv_data['Unnamed: 0'] = np.array(
+                [f'value_t_{i}' for i in range(data.shape[0])], dtype=object)
+            seen = {}
+            for j, name in enumerate(header[1:]):
+                count = seen.get(name, 0)
+                seen[name] = count + 1
+                key = f'{name}.{count}' if count else name
+                csv_data[key] = data[:, j]
+        elif csv_file.exists():
+            csv_file_df = pd.read_csv(csv_file)
             for column_name in csv_file_df.columns:
                 csv_data[column_name] =  np.array(csv_file_df[column_name])
         return csv_data
@@ -75,6 +104,17 @@ class PluginRELAP5(PluginGeneric):
         Whether to display output from stdout when RELAP5 is run
     show_stderr
         Whether to display output from stderr when RELAP5 is run
+    runtime_files
+        How the files in the directory of the executable (license key, fluid
+        property files, etc.) are placed in the directory where RELAP5 is run.
+        With 'symlink', they are symbolically linked; with 'link', they are
+        hard-linked, or symbolically linked if a hard link can't be made. In
+        either case, the links are removed once RELAP5 has run, even if it
+        fails, so that the files are not stored with the results. Since linked
+        files are the installed files themselves, any of them that RELAP5
+        modifies in place is modified in the installation as well; a hard link
+        additionally can't be told apart from a file RELAP5 wrote. With 'copy',
+        the files are copied and stored as outputs.
 
     """
 
@@ -86,8 +126,12 @@ class PluginRELAP5(PluginGeneric):
         extra_inputs: Optional[List[str]] = None,
         extra_template_inputs: Optional[List[PathLike]] = None,
         show_stdout: bool = False,
-        show_stderr: bool = False
+        show_stderr: bool = False,
+        runtime_files: str = 'symlink'
     ):
+        if runtime_files not in ('link', 'symlink', 'copy'):
+            raise ValueError(
+                "runtime_files must be one of 'link', 'symlink', or 'copy'")
         executable = _find_executable(executable, 'RELAP5_DIR')
         execute_command = ['{self.executable}', '-i', '{self.input_name}']
         super().__init__(
@@ -95,37 +139,95 @@ class PluginRELAP5(PluginGeneric):
             extra_template_inputs, "RELAP5", show_stdout, show_stderr)
         self.input_name = "RELAP5.i"
         self.plotfl_to_csv = plotfl_to_csv
+        self.runtime_files = runtime_files
 
-    def run(self, extra_args: Optional[List[str]] = None):
+    def run(self, extra_args: Optional[List[str]] = None, *,
+            cwd: Optional[Path] = None):
         """Run RELAP5
 
         Parameters
         ----------
         extra_args
             Extra arguments to be appended when running the RELAP5 executable
+        cwd
+            Directory in which RELAP5 is run. Defaults to the current working
+            directory.
         """
+        cwd = Path.cwd() if cwd is None else Path(cwd)
+        with self._runtime_files(cwd):
+            # run_proc() does not work with RELAP5-3D.
+            # The extra argument of 'stdout' to subprocess.Popen() in run_proc() somehow prevents RELAP5 from running.
+            # As a work-around, we explicitly use subprocess.Popen() here without specifying 'stdout=subprocess.PIPE')
+            p = subprocess.Popen(self._command(extra_args), cwd=cwd)
+            stdout, stderr = p.communicate()
+
+    async def arun(self, extra_args: Optional[List[str]] = None, *,
+                   cwd: Optional[Path] = None):
+        """Run RELAP5 as an :mod:`asyncio` subprocess
 
-        # Copy all necessary files to the temporary directory. RELAP5 requires
-        # the executable file and the license key to be in the same directory as
-        # the input file to run. Users can also add all fluid property files
-        # here.
-        cwd = Path.cwd()
-        for fname in self.executable.parent.iterdir():
-            shutil.copy2(str(fname), str(cwd))
+        Parameters
+        ----------
+        extra_args
+            Extra arguments to be appended when running the RELAP5 executable
+        cwd
+            Directory in which RELAP5 is run. Defaults to the current working
+            directory.
+        """
+        import asyncio
+        cwd = Path.cwd() if cwd is None else Path(cwd)
+        with self._runtime_files(cwd):
+            # As in run(), RELAP5's output is not piped
+            p = await asyncio.create_subprocess_exec(
+                *self._command(extra_args), cwd=cwd)
+            await p.wait()
 
+    def _command(self, extra_args: Optional[List[str]]) -> List[str]:
+        """Build the command used to run RELAP5
+
+        Parameters
+        ----------
+        extra_args
+            Extra arguments to be appended when running the RELAP5 executable
+
+        Returns
+        -------
+        Command used to run RELAP5
+        """
         # Create a list for RELAP5 input command and append any extra
         # options to it.
         if extra_args is None:
             extra_args = []
-        command = self.execute_command + extra_args
+        return self.execute_command + extra_args
+
+    @contextmanager
+    def _runtime_files(self, cwd: Path):
+        """Place runtime files in the working directory while RELAP5 runs
 
-        # run_proc() does not work with RELAP5-3D.
-        # The extra argument of 'stdout' to subprocess.Popen() in run_proc() somehow prevents RELAP5 from running.
-        # As a work-around, we explicitly use subprocess.Popen() here without specifying 'stdout=subprocess.PIPE')
-        p = subprocess.Popen(command)
-        stdout, stderr = p.communicate()
+        Unless the files are copied, the links are removed on exit, even if
+        RELAP5 fails, so that they are not stored as outputs.
 
-    def postrun(self, params: Parameters, exec_info: ExecInfo) -> ResultsRELAP5:
+        Parameters
+        ----------
+        cwd
+            Directory in which RELAP5 is run
+        """
+        # Place all necessary files in the temporary directory. RELAP5 requires
+        # the executable file and the license key to be in the same directory as
+        # the input file to run. Users can also add all fluid property files
+        # here.
+        try:
+            for fname in self.executable.parent.iterdir():
+                if self.runtime_files == 'copy':
+                    shutil.copy2(str(fname), str(cwd))
+                else:
+                    _link_runtime_file(fname, cwd / fname.name, self.runtime_files)
+            yield
+        finally:
+            if self.runtime_files != 'copy':
+                self._remove_runtime_files(cwd)
+
+    def postrun(self, params: Parameters, exec_info: ExecInfo, *,
+                cwd: Optional[Path] = None) -> ResultsRELAP5:
         """Read RELAP5 results and create results object
 
         Parameters
@@ -134,16 +236,20 @@ class PluginRELAP5(PluginGeneric):
             Parameters used to create RELAP5 model
         exec_info
             Execution information
+        cwd
+            Directory in which RELAP5 was run. Defaults to the current working
+            directory.
 
         Returns
         -------
         RELAP5 results object
         """
+        cwd = Path.cwd() if cwd is None else Path(cwd)
 
         # Convert RELAP5's plotfl file to CSV file for processing
         if self.plotfl_to_csv:
-            if Path('plotfl').exists():
-                self._plotfl_to_csv()
+            if (cwd / 'plotfl').exists():
+                self._plotfl_to_csv(cwd)
             else:
                 raise RuntimeError(
                     "Output plot file 'plotfl' is missing. Please make sure you "
@@ -151,106 +257,138 @@ class PluginRELAP5(PluginGeneric):
                     "file is named correctly."
                 )
 
-        return super().postrun(params, exec_info)
+        return super().postrun(params, exec_info, cwd=cwd)
+
+    def _remove_runtime_files(self, cwd: Path):
+        """Remove files in a directory that link to the RELAP5 runtime files"""
+        for fname in self.executable.parent.iterdir():
+            path = cwd / fname.name
+            # Files that had to be copied, or that RELAP5 replaced, are kept
+            try:
+                if path.is_symlink() or os.path.samefile(path, fname):
+                    path.unlink()
+            except OSError:
+                pass
 
     # The RELAP5-3D version used here does not generate csv output files.
     # It generates a text file with a particular format that needs to
     # be converted to a csv file before the results can be extracted.
 
-    def _plotfl_to_csv(self):
+    def _plotfl_to_csv(self, cwd: Path):
         """Converts RELAP5's plotfl file to csv.
 
-        """
-
-        with open('plotfl') as f:
-            contents = f.readlines()
-
-        # Get markers for 'contents'
-        n_plotinf = self._check_string(contents, 'plotinf')
-        n_plotalf = self._check_string(contents, 'plotalf')
-        n_plotnum = self._check_string(contents, 'plotnum')
-        n_plotrec = self._check_string(contents, 'plotrec')
-
-        # Break 'contents' into 3 sections: channel, ID, values
-        channels = contents[n_plotalf[0] : n_plotnum[0]]
-        ids = contents[n_plotnum[0] : n_plotrec[0]]
-        values = contents[n_plotrec[0] : ]
-
-        # Extract values
-        channel_list = self._extract_value(channels)
-        id_list = self._extract_value(ids)
-
-        # Create a dictionary to store data
-        data_dict = {'channel': channel_list, 'id': id_list}
-
-        for i in range(len(n_plotrec)):
-            i_start = n_plotrec[i] - n_plotrec[0] # Subtract n_plotrec[0] to offset the the 'content' above 'values'
-            i_end = n_plotrec[i] - n_plotrec[0] + (n_plotrec[1] - n_plotrec[0]) # Add "n_plotrec[1] - n_plotrec[0]" to reach the last line of 'values'
-            value_list = np.double(self._extract_value(values[i_start : i_end]))
-            data_dict[f"value_t_{i}"] = value_list
-
-        # Convert the dictionary into DataFrame
-        df = pd.DataFrame(data_dict)
-        df.set_index('channel', inplace=True)
-        df = df.T
-
-        # Create new column for DataFrame
-        new_col = []
-        for i in range(len(df.columns)):
-            new_col.append(f"{df.columns[i]}-{df.iloc[0][i]}")
-
-        df.columns = new_col
-        df = df[1:] # Remove the volume ID row
-
-        # Save DataFrame as csv
-        df.to_csv('R5-out.csv')
-
-    def _check_string(self, file, keyword: str) -> list:
-        """Looks for certain keyword markers in the plotfl file.
+        The plot file is streamed: the channel names and IDs are read from the
+        header, after which the plot records are read in large blocks of lines
+        that are tokenized and converted by numpy at once. Each block is
+        appended to 'R5-out.csv' and to a binary file that is finally stored
+        column by column in 'R5-out.npy' so that :class:`ResultsRELAP5` can read
+        the data without parsing the CSV file.
 
         Parameters
         ----------
-        file
-            RELAP5 output file
-        keyword
-            Keyword whose location to look for
-        Returns
-        -------
-        A list of line number of the keyword markers in the plotfl file
+        cwd
+            Directory containing the plotfl file
 
         """
-        return [i for i, file_i in enumerate(file) if keyword in file_i]
-
-    def _extract_value(self, contents):
-        """Extracts values from the plotfl file according to the keyword markers.
+        import numpy as np
+
+        raw_file = cwd / 'R5-out.raw'
+        n_records = 0
+        with open(cwd / 'plotfl') as f, open(cwd / 'R5-out.csv', 'w', newline='') as csv_fh, \
+                open(raw_file, 'wb') as raw_fh:
+            channels, ids, first_line = self._read_plotfl_header(f)
+            n_columns = len(channels)
+            if n_columns == 0 or len(ids) != n_columns:
+                raise RuntimeError("Malformed plot file 'plotfl': channel names "
+                                   "and IDs don't match.")
+
+            writer = csv.writer(csv_fh)
+            writer.writerow([''] + [f'{c}-{i}' for c, i in zip(channels, ids)])
+
+            leftover = np.empty(0)
+            lines = [first_line]
+            while lines:
+                text = ''.join(lines)
+                end = text.find('plotend')
+                if end >= 0:
+                    text = text[:end]
+                values = np.array(text.replace('plotrec', ' ').split(), dtype=np.float64)
+                if leftover.size:
+                    values = np.concatenate((leftover, values))
+
+                # Only complete records are written; the rest is carried over to
+                # the next block of lines
+                n = values.size // n_columns
+                records = values[:n*n_columns].reshape(n, n_columns)
+                leftover = values[n*n_columns:]
+                records.tofile(raw_fh)
+                for i, row in enumerate(records.tolist(), start=n_records):
+                    writer.writerow([f'value_t_{i}'] + row)
+                n_records += n
+
+                lines = f.readlines(_PLOTFL_BLOCK_SIZE) if end < 0 else []
+
+        if leftover.size:
+            raw_file.unlink()
+            raise RuntimeError("Plot file 'plotfl' ends with an incomplete record.")
+
+        # Store the records column by column so that each channel is contiguous
+        if n_records:
+            raw = np.memmap(raw_file, dtype=np.float64, mode='r', shape=(n_records, n_columns))
+            data = np.lib.format.open_memmap(
+                cwd / 'R5-out.npy', mode='w+', dtype=np.float64,
+                shape=(n_records, n_columns), fortran_order=True)
+            data[:] = raw
+            data.flush()
+            del raw, data
+        else:
+            np.save(cwd / 'R5-out.npy', np.empty((0, n_columns)))
+        raw_file.unlink()
+
+    @staticmethod
+    def _read_plotfl_header(f) -> Tuple[List[str], List[str], str]:
+        """Read channel names and IDs from the header of a plotfl file.
 
         Parameters
         ----------
-        contents
-            RELAP5 output file broken up according to the keyword markers
+        f
+            Open plotfl file, which is left positioned after the first line of
+            the plot records
+
         Returns
         -------
-        List of extracted values.
+        Channel names, channel IDs, and the first line of the plot records
 
         """
-        value_list = []
-        s = ''
-        for line in contents:
-            value_list.append(s.strip())
-            s = ''
-            for char_val in line:
-                if char_val != ' ':
-                    s += str(char_val)
-                else:
-                    value_list.append(s.strip())
-                    s = ''
-        value_list.append(s.strip())
-
-        # Remove all spaces
-        while '' in value_list:
-            value_list.remove('')
-
-        # Remove first element, i.e. markers
-        del value_list[0]
-
-        return value_list
+        sections = {'plotinf': [], 'plotalf': [], 'plotnum': []}
+        tokens = []
+        for line in f:
+            words = line.split()
+            if words and words[0] in sections:
+                tokens = sections[words[0]]
+                words = words[1:]
+            elif words and words[0] == 'plotrec':
+                return sections['plotalf'], sections['plotnum'], line
+            tokens.extend(words)
+        raise RuntimeError("Plot file 'plotfl' doesn't contain any plot records.")
+
+
+def _link_runtime_file(src: Path, dst: Path, mode: str):
+    """Link a runtime file into a directory
+
+    A hard link is tried first when `mode` is 'link'. If no link can be made,
+    the file is copied.
+    """
+    if mode == 'link':
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    try:
+        os.symlink(src.resolve(), dst, target_is_directory=src.is_dir())
+    except OSError:
+        if src.is_dir():
+            shutil.copytree(src, dst)
+        else:
+            clone_file(src, dst)
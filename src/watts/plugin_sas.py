@@ -1,16 +1,11 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
-import glob
-import os
 from pathlib import Path
 import shutil
 import subprocess
 from typing import List, Optional
 
-import numpy as np
-import pandas as pd
-
 from .fileutils import PathLike
 from .parameters import Parameters
 from .plugin import PluginGeneric, _find_executable
@@ -30,6 +25,8 @@ class ResultsSAS(Results):
         List of input files
     outputs
         List of output files
+    base_path
+        Path to directory storing results
 
     Attributes
     ----------
@@ -39,8 +36,9 @@ class ResultsSAS(Results):
         Dictionary with data from .csv files
     """
     def __init__(self, params: Parameters, exec_info: ExecInfo,
-                 inputs: List[PathLike], outputs: List[PathLike]):
-        super().__init__(params, exec_info, inputs, outputs)
+                 inputs: List[PathLike], outputs: List[PathLike],
+                 base_path: Optional[PathLike] = None):
+        super().__init__(params, exec_info, inputs, outputs, base_path)
         self.csv_data = self._get_sas_csv_data()
 
     def _get_sas_csv_data(self) -> dict:
@@ -51,18 +49,21 @@ class ResultsSAS(Results):
         Results from sas .csv files
 
         """
-        csv_files = glob.glob("*.csv") # List all csv files
+        import numpy as np
+        import pandas as pd
+
+        csv_files = self.base_path.glob("*.csv") # List all csv files
 
         csv_data = {}
         for file in csv_files:
-            if os.path.getsize(file) > 0: # Check if file is empty
+            if file.stat().st_size > 0: # Check if file is empty
                 csv_data_sub = {}
                 csv_file_df = pd.read_csv(file)
 
                 for column_name in csv_file_df.columns:
                     csv_data_sub[column_name] =  np.array(csv_file_df[column_name])
 
-                csv_data[file[:-4]] = csv_data_sub # Save sub dictionary as csv file name
+                csv_data[file.stem] = csv_data_sub # Save sub dictionary as csv file name
                                                    # Removed .csv extension from file name
 
         return csv_data
@@ -144,30 +145,35 @@ class PluginSAS(PluginGeneric):
     def execute_command(self):
         return [str(self.executable), "-i", self.input_name, "-o", "out.txt"]
 
-    def postrun(self, params: Parameters, exec_info: ExecInfo) -> ResultsSAS:
+    def postrun(self, params: Parameters, exec_info: ExecInfo, *,
+                cwd: Optional[Path] = None) -> ResultsSAS:
         """Read SAS results and create results object
 
         Parameters
         ----------
         params
             Parameters used to create SAS model
-        name
-            Name of the workflow
+        exec_info
+            Execution information
+        cwd
+            Directory in which SAS was run. Defaults to the current working
+            directory.
 
-        Returnss
+        Returns
         -------
         SAS results object
         """
+        cwd = Path.cwd() if cwd is None else Path(cwd)
 
         # Convert CHANNEl.dat and PRIMER4.dat to csv files
         # using SAS utilities. Check if files exist because
         # they may not be outputted per user's choice.
-        if Path("CHANNEL.dat").is_file():
-            with open("CHANNEL.dat", "r") as file_in, open("CHANNEL.csv", "w") as file_out:
-                subprocess.run(str(self.conv_channel), stdin=file_in, stdout=file_out)
+        if (cwd / "CHANNEL.dat").is_file():
+            with open(cwd / "CHANNEL.dat", "r") as file_in, open(cwd / "CHANNEL.csv", "w") as file_out:
+                subprocess.run(str(self.conv_channel), stdin=file_in, stdout=file_out, cwd=cwd)
 
-        if Path("PRIMAR4.dat").is_file():
-            with open("PRIMAR4.dat", "r") as file_in, open("PRIMAR4.csv", "w") as file_out:
-                subprocess.run(str(self.conv_primar4), stdin=file_in, stdout=file_out)
+        if (cwd / "PRIMAR4.dat").is_file():
+            with open(cwd / "PRIMAR4.dat", "r") as file_in, open(cwd / "PRIMAR4.csv", "w") as file_out:
+                subprocess.run(str(self.conv_primar4), stdin=file_in, stdout=file_out, cwd=cwd)
 
-        return super().postrun(params, exec_info)
+        return super().postrun(params, exec_info, cwd=cwd)
@@ -3,18 +3,126 @@
 
 from collections import namedtuple
 from datetime import datetime
+import hashlib
+import os
 from pathlib import Path
+import re
 import shutil
-from typing import List
+import sys
+import tempfile
+from typing import Iterator, List, Optional, Set
 
 import dill
 
-from .fileutils import PathLike, open_file
+from .fileutils import PathLike, iter_log, log_head, log_tail, open_file
 from .parameters import Parameters
 
 
 ExecInfo = namedtuple('ExecInfo', ['job_id', 'plugin', 'name', 'timestamp'])
 
+# Name of the directory next to a pickled result that holds arrays stored
+# separately from the pickle
+_ARRAY_DIRNAME = '.result_arrays'
+
+# Arrays smaller than this (in bytes) are always stored in the pickle itself
+_ARRAY_MIN_BYTES = 1 << 12
+
+
+def _array_digest(array) -> str:
+    """Compute a digest of the type, shape, and contents of a numpy array"""
+    import numpy as np
+    sha = hashlib.sha256()
+    order = 'F' if array.flags.f_contiguous and not array.flags.c_contiguous else 'C'
+    sha.update(repr((array.dtype.str, array.shape, order)).encode())
+    data = np.require(array, requirements=order).reshape(-1, order=order)
+    sha.update(data.view(np.uint8))
+    return sha.hexdigest()
+
+
+class _ArrayPickler(dill.Pickler):
+    """Pickler that stores large numpy arrays in separate .npy files
+
+    Files are named by the digest of the array, so an array referenced several
+    times, or unchanged since the pickle was last saved, is only written once.
+    The names of the files that are referenced are collected in
+    :attr:`referenced`.
+    """
+
+    def __init__(self, file, array_root: Path, subdir: str):
+        super().__init__(file)
+        self._array_dir = array_root / subdir
+        self._subdir = subdir
+        self._names = {}
+        self.referenced = set()
+        # numpy only needs to be considered if it has been imported
+        self._np = sys.modules.get('numpy')
+
+    def persistent_id(self, obj):
+        np = self._np
+        if np is None or type(obj) not in (np.ndarray, np.memmap):
+            return None
+        if obj.dtype.hasobject or obj.nbytes < _ARRAY_MIN_BYTES:
+            return None
+
+        # Objects are kept alongside their names so that their IDs can't be
+        # reused by other arrays during the dump
+        name = self._names.get(id(obj), (None,))[0]
+        if name is None:
+            name = f'{_array_digest(obj)}.npy'
+            self._names[id(obj)] = (name, obj)
+            path = self._array_dir / name
+            if not path.exists():
+                # Write to a temporary file first so that a pickle never refers
+                # to a partially written file
+                self._array_dir.mkdir(parents=True, exist_ok=True)
+                fd, tmp_name = tempfile.mkstemp(dir=self._array_dir, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as fh:
+                        np.save(fh, obj, allow_pickle=False)
+                    os.replace(tmp_name, path)
+                except BaseException:
+                    if os.path.exists(tmp_name):
+                        os.unlink(tmp_name)
+                    raise
+        self.referenced.add(name)
+        return ('ndarray', f'{self._subdir}/{name}')
+
+
+def _prune_arrays(array_dir: Path, referenced: Set[str]):
+    """Remove array files of a pickle that it no longer references"""
+    if not array_dir.is_dir():
+        return
+    for path in array_dir.iterdir():
+        if path.suffix == '.npy' and path.name not in referenced:
+            try:
+                path.unlink()
+            except OSError:
+                # Files that are memory-mapped can't be removed on Windows
+                pass
+    try:
+        array_dir.rmdir()
+    except OSError:
+        pass
+
+
+class _ArrayUnpickler(dill.Unpickler):
+    """Unpickler that memory-maps arrays stored by :class:`_ArrayPickler`"""
+
+    def __init__(self, file, array_dir: Path):
+        super().__init__(file)
+        self._array_dir = array_dir
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind != 'ndarray':
+            raise dill.UnpicklingError(f"Unknown persistent ID: {pid}")
+        import numpy as np
+
+        # Data is only read from disk when it is accessed. Mapped files can't be
+        # moved or removed on Windows, so arrays are read immediately there.
+        mmap_mode = None if sys.platform == 'win32' else 'c'
+        return np.load(self._array_dir / name, mmap_mode=mmap_mode, allow_pickle=False)
+
 
 class Results:
     """Results from running a workflow
@@ -29,6 +137,10 @@ class Results:
         List of input files
     outputs
         List of output files
+    base_path
+        Path to directory storing results. Relative paths in `inputs` and
+        `outputs` are interpreted relative to this directory. Defaults to the
+        current working directory.
 
     Attributes
     ----------
@@ -45,15 +157,18 @@ class Results:
     plugin
         Name of plugin
     stdout
-        Standard output from execution
+        Standard output from execution. For large logs, consider
+        :meth:`iter_stdout`, :meth:`stdout_head`, :meth:`stdout_tail`, or
+        :meth:`grep_stdout`, which don't read the whole log into memory.
     time
         Time at which plugin was executed
 
     """
 
     def __init__(self, params: Parameters, exec_info: ExecInfo,
-                 inputs: List[PathLike], outputs: List[PathLike]):
-        self.base_path = Path.cwd()
+                 inputs: List[PathLike], outputs: List[PathLike],
+                 base_path: Optional[PathLike] = None):
+        self.base_path = Path.cwd() if base_path is None else Path(base_path)
         self.exec_info = exec_info
         self.parameters = Parameters(params)
         self.inputs = [Path(p) for p in inputs]
@@ -77,7 +192,71 @@ class Results:
 
     @property
     def stdout(self) -> str:
-        return (self.base_path / f"{self.plugin}_log.txt").read_text()
+        return ''.join(self.iter_stdout())
+
+    @property
+    def _log_path(self) -> Path:
+        return self.base_path / f"{self.plugin}_log.txt"
+
+    def iter_stdout(self) -> Iterator[str]:
+        """Iterate over the lines of standard output from execution
+
+        Lines are read as they are needed, so the log is never loaded into
+        memory as a whole. Rotated and compressed logs are handled
+        transparently.
+
+        Yields
+        ------
+        str
+            Each line of output, including its line ending
+        """
+        return iter_log(self._log_path)
+
+    def stdout_head(self, n: int = 10) -> List[str]:
+        """Get the first lines of standard output from execution
+
+        Parameters
+        ----------
+        n
+            Number of lines
+
+        Returns
+        -------
+        First `n` lines of output, including their line endings
+        """
+        return log_head(self._log_path, n)
+
+    def stdout_tail(self, n: int = 10) -> List[str]:
+        """Get the last lines of standard output from execution
+
+        Uncompressed logs are read backwards from their end.
+
+        Parameters
+        ----------
+        n
+            Number of lines
+
+        Returns
+        -------
+        Last `n` lines of output, including their line endings
+        """
+        return log_tail(self._log_path, n)
+
+    def grep_stdout(self, pattern: str) -> Iterator[str]:
+        """Iterate over lines of standard output matching a regular expression
+
+        Parameters
+        ----------
+        pattern
+            Regular expression searched for in each line
+
+        Yields
+        ------
+        str
+            Each matching line, including its line ending
+        """
+        regex = re.compile(pattern)
+        return (line for line in self.iter_stdout() if regex.search(line))
 
     def move_files(self, dst: PathLike):
         """Move input/output files to different directory
@@ -89,28 +268,96 @@ class Results:
 
         """
 
+        self._move_files(dst, set())
+
+    def _move_files(self, dst: PathLike, placed: Set[str]):
+        """Move input/output files except inputs already placed in `dst`
+
+        Parameters
+        ----------
+        dst
+            Destination path where files should be moved
+        placed
+            Names of inputs that are already in `dst` and only need their paths
+            changed
+
+        """
         dst_path = Path(dst)
         # Move input/output files and change base -- note that trying to use the
         # Path.replace method doesn't work across filesystems, so instead we use
-        # shutil.move
+        # shutil.move, which renames files where possible and copies them
+        # otherwise
         for i, input in enumerate(self.inputs):
-            shutil.move(str(input), str(dst_path / input.name))
+            if input.name not in placed:
+                shutil.move(str(self.base_path / input), str(dst_path / input.name))
             self.inputs[i] = dst_path / input.name
         for i, output in enumerate(self.outputs):
-            shutil.move(str(output), str(dst_path / output.name))
+            shutil.move(str(self.base_path / output), str(dst_path / output.name))
             self.outputs[i] = dst_path / output.name
         self.base_path = dst_path
 
-    def save(self, filename: PathLike):
+    def _rebase(self, dst: PathLike):
+        """Change the base path without moving any files
+
+        Input/output paths within the current base path are changed to refer to
+        the same relative location within `dst`.
+
+        Parameters
+        ----------
+        dst
+            New base path
+
+        """
+        dst_path = Path(dst)
+
+        def rebase(path):
+            try:
+                return dst_path / path.relative_to(self.base_path)
+            except ValueError:
+                return path
+
+        self.inputs = [rebase(p) for p in self.inputs]
+        self.outputs = [rebase(p) for p in self.outputs]
+        self.base_path = dst_path
+
+    def save(self, filename: PathLike, separate_arrays: bool = False):
         """Save results to a pickle file
 
         Parameters
         ----------
         filename
             File to save results to
+        separate_arrays
+            Whether to store large numpy arrays in ``.npy`` files within a
+            hidden directory next to the pickle file rather than in the pickle
+            itself. When the results are loaded, these arrays are memory-mapped
+            so that their data is only read when accessed. Arrays that an
+            earlier save of the same file stored and that are no longer
+            referenced are removed.
         """
-        with open(filename, 'wb') as fh:
-            fh.write(dill.dumps(self))
+        # The pickle is written to a temporary file that replaces the original
+        # once complete. Arrays are stored in a directory specific to the
+        # pickle, from which arrays of a previous save that are no longer
+        # referenced are then removed.
+        path = Path(filename)
+        array_root = path.parent / _ARRAY_DIRNAME
+        referenced = set()
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.',
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                if separate_arrays:
+                    pickler = _ArrayPickler(fh, array_root, path.name)
+                    pickler.dump(self)
+                    referenced = pickler.referenced
+                else:
+                    fh.write(dill.dumps(self))
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        _prune_arrays(array_root / path.name, referenced)
 
     @classmethod
     def from_pickle(cls, filename: PathLike):
@@ -121,8 +368,9 @@ class Results:
         filename
             Path to load results from
         """
+        array_dir = Path(filename).parent / _ARRAY_DIRNAME
         with open(filename, 'rb') as fh:
-            result =  dill.loads(fh.read())
+            result = _ArrayUnpickler(fh, array_dir).load()
 
         # For older results objects, add in execution info tuple
         if not hasattr(result, 'exec_info'):
@@ -1,22 +1,49 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+from __future__ import annotations
 from pathlib import Path
-from typing import Optional
-
-import jinja2
+from typing import TYPE_CHECKING, Callable, Optional, Tuple, Union
 
 from .fileutils import PathLike
 from .parameters import Parameters
 
+if TYPE_CHECKING:
+    import jinja2
+
+
+def _load_template(name: str) -> Tuple[str, str, Callable[[], bool]]:
+    """Load a template from a file, allowing it to be cached until it changes"""
+    path = Path(name)
+    stat = path.stat()
+    source = path.read_text()
+
+    def uptodate() -> bool:
+        try:
+            current = path.stat()
+        except OSError:
+            return False
+        return (current.st_mtime_ns, current.st_size) == (stat.st_mtime_ns, stat.st_size)
+
+    return source, name, uptodate
+
 
 class TemplateRenderer:
     """Helper class for rendering a Jinja template
 
+    The compiled template is kept in memory and reused for subsequent renders
+    until the modification time or size of the template file changes.
+
     Parameters
     ----------
     template_file
         Path to template file
+    suffix
+        Suffix added to filename when rendering a template
+    bytecode_cache
+        Directory in which compiled templates are cached on disk so that they
+        can be reused by other processes, or an instance of
+        :class:`jinja2.BytecodeCache`
     **environment_kwargs
         Keywork arguments passed to :class:`jinja2.Environment`
 
@@ -30,15 +57,41 @@ class TemplateRenderer:
         Suffix added to filename when rendering a template
 
     """
-    def __init__(self, template_file: PathLike, suffix: str = '.rendered', **environment_kwargs):
+    def __init__(self, template_file: PathLike, suffix: str = '.rendered',
+                 bytecode_cache: Optional[Union[PathLike, jinja2.BytecodeCache]] = None,
+                 **environment_kwargs):
+        import jinja2
+        if bytecode_cache is not None and not isinstance(bytecode_cache, jinja2.BytecodeCache):
+            Path(bytecode_cache).mkdir(parents=True, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(str(bytecode_cache))
         self.environment = jinja2.Environment(
+            loader=jinja2.FunctionLoader(_load_template),
             undefined=jinja2.StrictUndefined,
+            bytecode_cache=bytecode_cache,
+            cache_size=0,
             **environment_kwargs
         )
         self.template_file = Path(template_file).resolve()
         self.suffix = suffix
+        self._template = None
+
+    def __getstate__(self):
+        # Compiled templates can't be pickled
+        state = self.__dict__.copy()
+        state['_template'] = None
+        return state
+
+    def _get_template(self) -> jinja2.Template:
+        """Return the compiled template, compiling it if the file changed"""
+        template = self._template
+        if (template is None or template.filename != str(self.template_file)
+                or not template.is_up_to_date):
+            template = self.environment.get_template(str(self.template_file))
+            self._template = template
+        return template
 
-    def __call__(self, params: Parameters, filename: Optional[PathLike] = None):
+    def __call__(self, params: Parameters, filename: Optional[PathLike] = None, *,
+                 cwd: Optional[PathLike] = None):
         """Render the template
 
         Parameters
@@ -49,6 +102,9 @@ class TemplateRenderer:
             Filename for rendered template (If none is provided, by default the
             filename of the template is changed so that the new extension is
             .rendered)
+        cwd
+            Directory that a relative `filename` is interpreted against.
+            Defaults to the current working directory.
         """
         # Default rendered template filename
         if filename is None:
@@ -56,7 +112,9 @@ class TemplateRenderer:
             out_path = Path(f'{name}{self.suffix}')
         else:
             out_path = Path(filename)
+        if cwd is not None:
+            out_path = Path(cwd) / out_path
 
         # Render template and write to file
-        template = self.environment.from_string(self.template_file.read_text())
+        template = self._get_template()
         out_path.write_text(template.render(**params))
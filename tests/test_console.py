@@ -62,6 +62,13 @@ def test_console_results(setup_results):
     result = runner.invoke(main, 'results --name var=20')
     assert len(result.stdout.split('\n')) == 6
 
+    result = runner.invoke(main, 'results --param variable=20')
+    assert len(result.stdout.split('\n')) == 6
+    assert 'var=20' in result.stdout
+
+    result = runner.invoke(main, 'results --param variable=20 --name var=30')
+    assert len(result.stdout.split('\n')) == 5
+
     result = runner.invoke(main, 'results --job-id 0')
     assert result.stdout == full_output
 
@@ -96,6 +103,20 @@ def test_console_stdout(setup_results):
     assert result.exit_code == 1
 
 
+def test_console_stdout_lines(setup_results):
+    db = watts.Database()
+    lines = db[1].stdout_head(1000)
+    runner = CliRunner()
+    assert runner.invoke(main, 'stdout --tail 1 1').stdout == lines[-1]
+    assert runner.invoke(main, 'stdout --head 1 1').stdout == lines[0]
+    assert runner.invoke(main, 'stdout --grep var=20 1').stdout == \
+        ''.join(line for line in lines if 'var=20' in line)
+
+    # Only one way of selecting lines can be given
+    result = runner.invoke(main, 'stdout --head 1 --tail 1 1')
+    assert result.exit_code != 0
+
+
 def test_console_rm(setup_results):
     db = watts.Database()
     assert len(db) == 3
@@ -1,7 +1,13 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import multiprocessing
+import os
 from pathlib import Path
+import shutil
+import sqlite3
 import time
 from uuid import uuid4
 
@@ -89,3 +95,189 @@ def test_add_results(run_in_tmpdir):
     # Ensure database can be cleared
     db.clear()
     assert len(db) == 0
+
+
+def test_index(run_in_tmpdir):
+    db = watts.Database('indexed_db')
+    res = get_result()
+    res.base_path = db.path / 'result'
+    res.base_path.mkdir()
+    db.add_result(res)
+
+    # Records are available without loading results
+    record, = db.records()
+    assert record.index == 0
+    assert record.job_id == 1
+    assert record.plugin == 'OpenMC'
+    assert record.name == 'Workflow'
+    assert record.path == db.path / 'result'
+    assert record.parameters == {'value': 1, 'lab': 'Argonne'}
+    assert record.time == res.time
+
+    # Directories without an index entry (e.g., from older versions) are
+    # picked up when the database is opened and stale entries are dropped
+    other = get_result()
+    other.base_path = db.path / 'unindexed'
+    other.base_path.mkdir()
+    other.save(other.base_path / '.result_info.pkl')
+    shutil.rmtree(db.path / 'result')
+    del watts.Database._instances[db.path.resolve()]
+    db = watts.Database('indexed_db')
+    assert [r.path.name for r in db.records()] == ['unindexed']
+    assert db[0].base_path == other.base_path
+    assert db.job_id == 2
+
+
+def test_lazy_loading(run_in_tmpdir, monkeypatch):
+    db = watts.Database('lazy_db')
+    monkeypatch.setattr(db, 'cache_size', 2)
+    results = []
+    for _ in range(4):
+        res = get_result()
+        res.base_path = db.path / uuid4().hex
+        res.base_path.mkdir()
+        db.add_result(res)
+        results.append(res)
+
+    # Only the most recently used results are kept in memory
+    assert db[3] is results[3]
+    assert db[2] is results[2]
+    first = db[0]
+    assert first is not results[0]
+    assert first.base_path == results[0].base_path
+    assert results[1] in db
+
+    # Iteration streams results in order
+    assert [r.base_path for r in db] == [r.base_path for r in results]
+    assert [r.base_path for r in reversed(db)] == [r.base_path for r in results[::-1]]
+
+    # Job IDs are handed out from a persisted counter
+    assert db.job_id == 2
+    del watts.Database._instances[db.path.resolve()]
+    assert watts.Database('lazy_db').job_id == 3
+
+
+def test_query(run_in_tmpdir, monkeypatch):
+    db = watts.Database('query_db')
+    timestamps = []
+    for i, (plugin, name) in enumerate([('A', 'x'), ('B', 'y'), ('A', 'y')]):
+        timestamps.append(time.time_ns() + i * 10**9)
+        exec_info = watts.ExecInfo(i // 2, plugin, name, timestamps[-1])
+        params = watts.Parameters(radius=float(i), fuel='UO2', flag=bool(i % 2),
+                                  widths=[1.0, 2.0])
+        res = watts.Results(params, exec_info, [], [], base_path=db.path / str(i))
+        res.base_path.mkdir()
+        db.add_result(res)
+
+    def indices(**kwargs):
+        return [r.index for r in db.query(**kwargs)]
+
+    assert indices() == [0, 1, 2]
+    assert indices(plugin='A') == [0, 2]
+    assert indices(plugin='A', name='y') == [2]
+    assert indices(job_id=0) == [0, 1]
+    assert indices(params={'radius': 1}) == [1]
+    assert indices(params={'fuel': 'UO2', 'flag': False}) == [0, 2]
+    assert indices(params={'fuel': 'MOX'}) == []
+    assert indices(plugin='B', params={'radius': 2.0}) == []
+    start = datetime.fromtimestamp((timestamps[1] - 5*10**8) * 1e-9)
+    assert indices(time_range=(start, None)) == [1, 2]
+    assert indices(time_range=(None, start)) == [0]
+    with pytest.raises(TypeError):
+        db.query(params={'widths': [1.0, 2.0]})
+
+    # Positions are the same when determined from a scan of the index
+    monkeypatch.setattr(watts.database, '_POSITION_SCAN_THRESHOLD', 0)
+    db.remove(db[0])
+    record, = db.query(name='y', plugin='A')
+    assert record.index == 1
+    assert record.path == db.path / '2'
+    assert record.parameters['radius'] == 2.0
+    assert db.last_job_id == 1
+
+
+def add_result_in_process(db_path, output_dir):
+    db = watts.Database(db_path)
+    exec_info = watts.ExecInfo(db.job_id, 'Generic', output_dir, time.time_ns())
+    staging_path = watts.database.make_staging_directory(db.path)
+    (staging_path / 'output.txt').write_text(output_dir)
+    res = watts.Results(watts.Parameters(), exec_info, [], ['output.txt'],
+                        base_path=staging_path)
+    res._rebase(db.path / output_dir)
+    db.add_result(res, staging_path)
+    return os.getpid(), db.job_id
+
+
+def test_concurrent_processes(run_in_tmpdir):
+    db_path = Path('db').resolve()
+    ctx = multiprocessing.get_context('spawn')
+    names = [f'result{i}' for i in range(8)]
+    with ProcessPoolExecutor(4, mp_context=ctx) as executor:
+        pid_job_ids = set(executor.map(add_result_in_process, [db_path]*8, names))
+
+    # Each process should have been given a distinct job ID
+    pids, job_ids = zip(*pid_job_ids)
+    assert len(set(pids)) == len(set(job_ids)) == len(pid_job_ids)
+
+    # All results should be committed with their files in place
+    db = watts.Database(db_path)
+    assert len(db) == 8
+    assert sorted(r.name for r in db) == names
+    for res in db:
+        assert res.base_path == db_path / res.name
+        assert (res.base_path / res.outputs[0]).read_text() == res.name
+    assert list((db_path / '.staging').iterdir()) == []
+
+    # Committing onto an existing directory fails and discards the staging
+    # directory without touching the existing result
+    with ProcessPoolExecutor(1, mp_context=ctx) as executor:
+        with pytest.raises(FileExistsError):
+            executor.submit(add_result_in_process, db_path, 'result0').result()
+    assert len(db) == 8
+    assert list((db_path / '.staging').iterdir()) == []
+
+
+def test_link_file(run_in_tmpdir, monkeypatch):
+    db = watts.Database('db')
+    Path('mesh.e').write_bytes(b'mesh' * 1000)
+    first, second = Path('first'), Path('second')
+    first.mkdir()
+    second.mkdir()
+
+    # The contents of the file are only stored once
+    digest = db.link_file('mesh.e', first)
+    assert db.link_file('mesh.e', second) == digest
+    assert (first / 'mesh.e').read_bytes() == b'mesh' * 1000
+    assert (first / 'mesh.e').stat().st_ino == (second / 'mesh.e').stat().st_ino
+    assert (first / 'mesh.e').stat().st_nlink == 3
+
+    # Digests are cached until the file changes
+    monkeypatch.setattr(watts.database, 'file_hash', None)
+    assert db.file_digest('mesh.e') == digest
+    monkeypatch.undo()
+    Path('mesh.e').write_bytes(b'other mesh')
+    assert db.file_digest('mesh.e') != digest
+
+    # Stored files without any links are removed along with results
+    shutil.rmtree(first)
+    shutil.rmtree(second)
+    db.clear()
+    assert not list(Path('db', '.blobs').glob('*/*'))
+
+
+def test_open_while_locked(run_in_tmpdir, monkeypatch):
+    db = watts.Database('db')
+    del watts.Database._instances[db.path.resolve()]
+
+    # Opening an up-to-date database doesn't need the write lock, so it isn't
+    # blocked by another process that is writing to the index
+    monkeypatch.setattr(watts.database, '_INDEX_TIMEOUT', 0.1)
+    writer = sqlite3.connect(str(db.path / '.index.sqlite3'), isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        reader = watts.Database('db')
+        assert reader is not db
+        assert reader.records() == []
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
@@ -1,3 +1,7 @@
+import json
+import os
+from pathlib import Path
+
 import pytest
 
 from watts.plugin_mcnp import expand_element
@@ -178,3 +182,64 @@ def test_comment(expand_func):
     assert mat[0] == '6000.70c'
     assert mat[2] == '7014.70c'
     assert mat[4] == '7015.70c'
+
+
+def test_xsdir_index(run_in_tmpdir, monkeypatch):
+    from watts import plugin_mcnp
+
+    # Count how many times xsdir files are parsed
+    calls = []
+    parse_xsdir = plugin_mcnp._parse_xsdir
+    def counting_parse(path):
+        calls.append(path)
+        return parse_xsdir(path)
+    monkeypatch.setattr(plugin_mcnp, '_parse_xsdir', counting_parse)
+
+    # Continuation lines are joined with the preceding line
+    with open('xsdir', 'w') as fh:
+        fh.write(xsdir['70c'] + "8018.70c 17.844 +\n  endf70a 0 1 1\n")
+
+    # The xsdir file is only parsed once across expansions and filters
+    expand = expand_element('xsdir', 'xsdir.index')
+    assert '8018.70c' in expand('8000.70c 1.0')
+    expand('7000.70c 1.0')
+    expand_element('xsdir')('6000.70c 1.0')
+    assert len(calls) == 1
+
+    # Other processes can use the stored index instead of parsing again
+    plugin_mcnp._xsdir_indices.clear()
+    assert '8018.70c' in expand('8000.70c 1.0')
+    assert len(calls) == 1
+
+    # The stored index is plain JSON
+    with open('xsdir.index') as fh:
+        stored = json.load(fh)
+    assert [8, '70c', ['O16', 'O17', 'O18']] in stored['tables']
+
+    # Changing the xsdir file causes it to be parsed again
+    with open('xsdir', 'w') as fh:
+        fh.write(xsdir['70c'])
+    assert '8018.70c' not in expand('8000.70c 1.0')
+    assert len(calls) == 2
+
+    # A corrupt index file is ignored
+    Path('xsdir.index').write_text('not json')
+    plugin_mcnp._xsdir_indices.clear()
+    assert '8018.70c' not in expand('8000.70c 1.0')
+    assert len(calls) == 3
+
+
+def test_xsdir_cache_size(run_in_tmpdir, monkeypatch):
+    from watts import plugin_mcnp
+    monkeypatch.setattr(plugin_mcnp, '_xsdir_indices', plugin_mcnp._XsdirCache(2))
+
+    # Only the most recently used indices are kept in memory
+    for name in ('xsdir1', 'xsdir2', 'xsdir3'):
+        with open(name, 'w') as fh:
+            fh.write(xsdir['70c'])
+        expand_element(name)('8000.70c 1.0')
+    assert len(plugin_mcnp._xsdir_indices) == 2
+    key = lambda name: (str(Path(name).resolve()), os.stat(name).st_size,
+                        os.stat(name).st_mtime_ns)
+    assert plugin_mcnp._xsdir_indices.get(key('xsdir1')) is None
+    assert plugin_mcnp._xsdir_indices.get(key('xsdir3')) is not None
@@ -1,13 +1,17 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
-from contextlib import redirect_stdout
+import asyncio
+from contextlib import redirect_stdout, redirect_stderr
 import io
 from pathlib import Path
 import subprocess
 import sys
 
-from watts.fileutils import tee_stdout, tee_stderr, run
+import pytest
+from watts.fileutils import (
+    LogFile, iter_log, log_files, log_head, log_tail, tee_stdout, tee_stderr,
+    run, run_async)
 
 
 def test_tee_stdout(run_in_tmpdir, capsys):
@@ -55,3 +59,76 @@ def test_run(run_in_tmpdir):
         run(['env'])
     assert f.getvalue() == file_output
 
+
+
+def test_run_stderr_and_exit_code(run_in_tmpdir):
+    # Create a script that writes to both streams and exits with nonzero code
+    script = Path('script.py')
+    script.write_text(
+        "import sys\n"
+        "sys.stdout.write('out' * 50000)\n"
+        "sys.stderr.write('err\\u00e9')\n"
+        "sys.exit(3)\n"
+    )
+
+    with redirect_stdout(io.StringIO()) as out, redirect_stderr(io.StringIO()) as err:
+        exit_code = run([sys.executable, str(script)])
+    assert exit_code == 3
+    assert out.getvalue() == 'out' * 50000
+    assert err.getvalue() == 'erré'
+
+
+def test_run_async(run_in_tmpdir):
+    script = Path('script.py')
+    script.write_text(
+        "import sys\n"
+        "sys.stdout.write('hello')\n"
+        "sys.stderr.write('world')\n"
+        "sys.exit(2)\n"
+    )
+
+    with redirect_stdout(io.StringIO()) as out, redirect_stderr(io.StringIO()) as err:
+        exit_code = asyncio.run(run_async([sys.executable, str(script)]))
+    assert exit_code == 2
+    assert out.getvalue() == 'hello'
+    assert err.getvalue() == 'world'
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_log_file(run_in_tmpdir, compression):
+    lines = [f'line {i}\n' for i in range(100)]
+    with LogFile('log.txt', compression=compression) as log:
+        for line in lines:
+            log.write(line)
+    assert ''.join(iter_log('log.txt')) == ''.join(lines)
+    assert log_head('log.txt', 3) == lines[:3]
+    assert log_tail('log.txt', 3) == lines[-3:]
+    assert log_tail('log.txt', 1000) == lines
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_log_file_rotation(run_in_tmpdir, compression):
+    # Each line has 8 characters, so each file holds 10 lines
+    lines = [f'line {i:02}\n' for i in range(100)]
+    with LogFile('log.txt', max_size=80, backup_count=2,
+                 compression=compression) as log:
+        for line in lines:
+            log.write(line)
+
+    # Only the most recent files are kept
+    suffix = '.gz' if compression else ''
+    assert [p.name for p in log_files('log.txt')] == [
+        f'log.txt.2{suffix}', f'log.txt.1{suffix}', f'log.txt{suffix}']
+    assert list(iter_log('log.txt')) == lines[-30:]
+    assert log_tail('log.txt', 15) == lines[-15:]
+    assert log_head('log.txt', 2) == lines[-30:-28]
+
+
+def test_log_file_tail_large(run_in_tmpdir):
+    # Lines spanning several blocks read from the end of the file
+    lines = [f'{i}' * 10000 + '\n' for i in range(20)]
+    with LogFile('log.txt') as log:
+        log.write(''.join(lines))
+    assert log_tail('log.txt', 12) == lines[-12:]
+    with pytest.raises(FileNotFoundError):
+        log_tail('missing.txt')
@@ -0,0 +1,37 @@
+# SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+from watts.fundamental_data import (
+    NATURAL_ABUNDANCE, isotopes, expand_elements, atomic_mass, atomic_masses)
+
+
+def test_isotopes():
+    assert isotopes('O') == [('O16', 0.9976206), ('O17', 0.000379), ('O18', 0.0020004)]
+    assert sum(fraction for _, fraction in isotopes('W')) == pytest.approx(1.0)
+
+    # Symbols that are prefixes of other symbols only match their own isotopes
+    assert [iso for iso, _ in isotopes('H')] == ['H1', 'H2']
+    assert [iso for iso, _ in isotopes('N')] == ['N14', 'N15']
+
+    # Elements without natural isotopes give an empty list
+    assert isotopes('Tc') == []
+    assert isotopes('Xx') == []
+
+    # Modifying the returned list doesn't affect later calls
+    isotopes('Li').pop()
+    assert len(isotopes('Li')) == 2
+
+    # Expanding several elements at once gives the same isotopes
+    expanded = expand_elements(['H', 'U', 'Tc'])
+    assert expanded == {'H': isotopes('H'), 'U': isotopes('U'), 'Tc': []}
+    assert sum(len(v) for v in expand_elements(
+        {iso.rstrip('0123456789') for iso in NATURAL_ABUNDANCE}).values()) == len(NATURAL_ABUNDANCE)
+
+
+def test_atomic_mass():
+    assert atomic_mass('U235') == pytest.approx(235.0439281)
+    assert atomic_mass('am242_m1') == atomic_mass('Am242')
+    assert atomic_masses(['H1', 'u238', 'Am242_m1']) == [
+        atomic_mass('H1'), atomic_mass('U238'), atomic_mass('Am242')]
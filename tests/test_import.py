@@ -0,0 +1,102 @@
+# SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
+# SPDX-License-Identifier: MIT
+
+import json
+import subprocess
+import sys
+
+import pytest
+import watts
+
+# Modules that are slow to import and are only needed by particular plugins or
+# when unit conversion is used
+HEAVY_MODULES = ['astropy', 'jinja2', 'numpy', 'pandas', 'uncertainties']
+
+# Public names that were available from watts before plugins were imported
+# lazily, all of which must remain available
+BASELINE_EXPORTS = [
+    'ABC', 'ATOMIC_NUMBER', 'ATOMIC_SYMBOL', 'Any', 'BinaryIO', 'Callable',
+    'Database', 'Dict', 'ExecInfo', 'Iterable', 'List', 'Mapping',
+    'MutableMapping', 'Optional', 'Parameters', 'ParametersMetadata', 'Path',
+    'PathLike', 'Plugin', 'PluginABCE', 'PluginACCERT', 'PluginDakota',
+    'PluginGeneric', 'PluginMCNP', 'PluginMOOSE', 'PluginOpenMC',
+    'PluginPyARC', 'PluginRELAP5', 'PluginSAS', 'PluginSerpent', 'PrettyTable',
+    'Quantity', 'Results', 'ResultsABCE', 'ResultsACCERT', 'ResultsDakota',
+    'ResultsMCNP', 'ResultsMOOSE', 'ResultsOpenMC', 'ResultsPyARC',
+    'ResultsRELAP5', 'ResultsSAS', 'ResultsSerpent', 'Sequence',
+    'TemplateRenderer', 'Tuple', 'Union', 'abstractmethod', 'annotations',
+    'atomic_mass', 'cd_tmpdir', 'copy', 'csv', 'database', 'datetime', 'dill',
+    'expand_element', 'fileutils', 'fundamental_data', 'getuser', 'glob',
+    'isotopes', 'jinja2', 'json', 'lru_cache', 'namedtuple', 'np', 'open_file',
+    'os', 'parameters', 'pd', 'pickle', 'platformdirs', 'plugin',
+    'plugin_abce', 'plugin_accert', 'plugin_dakota', 'plugin_mcnp',
+    'plugin_moose', 'plugin_openmc', 'plugin_pyarc', 'plugin_relap5',
+    'plugin_sas', 'plugin_serpent', 'pprint', 're', 'redirect_stderr',
+    'redirect_stdout', 'results', 'run_dakota_driver', 'run_proc', 'shutil',
+    'subprocess', 'sys', 'tee_stderr', 'tee_stdout', 'tempfile', 'template',
+    'textwrap', 'time', 'u', 'ufloat', 'uuid', 'warn', 'watts',
+]
+
+
+def run_python(code):
+    output = subprocess.run(
+        [sys.executable, '-c', code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def test_import_is_lazy():
+    # Importing watts or the Dakota driver shouldn't import heavy dependencies
+    for statement in ['import watts', 'from watts.plugin_dakota import run_dakota_driver']:
+        loaded = run_python(
+            f"import json, sys\n{statement}\n"
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+        )
+        assert loaded == []
+
+
+def test_lazy_attributes():
+    for name in watts._LAZY_ATTRIBUTES:
+        assert getattr(watts, name) is not None
+        assert name in dir(watts)
+    assert watts.PluginMOOSE.__module__ == 'watts.plugin_moose'
+
+
+def test_baseline_exports():
+    names = dir(watts)
+    missing = [name for name in BASELINE_EXPORTS if name not in names]
+    assert missing == []
+    for name in BASELINE_EXPORTS:
+        assert getattr(watts, name) is not None
+    assert watts.atomic_mass('U235') == pytest.approx(235.0439, rel=1e-6)
+    assert watts.plugin_moose.PluginMOOSE is watts.PluginMOOSE
+
+
+def test_imperial_units():
+    # Imperial units are enabled when units are used through watts, whether
+    # astropy is imported before or after
+    for code in ['import watts\nimport astropy.units as u',
+                 'import astropy.units as u\nimport watts']:
+        value = run_python(
+            f"import json\n{code}\n"
+            "print(watts.Quantity(1, 'inch').si.value)")
+        assert value == pytest.approx(0.0254)
+
+    # Imperial units are enabled globally, so astropy can be used directly
+    # after importing watts
+    for code in ['import watts\nfrom astropy.units import Quantity',
+                 'from astropy.units import Quantity\nimport watts']:
+        value = run_python(
+            f"import json\n{code}\n"
+            "psi = Quantity(1015.264164, 'psi').si.value\n"
+            "c_p = Quantity(4.9184126, 'BTU/(kg*K)').si.value\n"
+            "print(json.dumps([psi, c_p]))")
+        assert value == pytest.approx([7.0e6, 5189.2], rel=1e-4)
+
+    # Converting parameters enables imperial units on first use
+    value = run_python(
+        "import json\nimport astropy.units as u\nimport watts\n"
+        "p = watts.Parameters(x=u.Quantity(2, u.imperial.inch))\n"
+        "p = p.convert_units()\n"
+        "print(json.dumps([float(p['x']), float(u.Quantity(1, 'inch').si.value)]))")
+    assert value == pytest.approx([0.0508, 0.0254])
@@ -73,6 +73,38 @@ def test_parameters_set():
     assert params.get_metadata('key') == (user, time)
 
 
+def test_parameters_update():
+    time = datetime.now()
+    params = watts.Parameters(a=1)
+    params.set_many({'b': 2, 'c': 3}, user='test_user', time=time)
+    params.set_many([('d', 4)], user='test_user', time=time)
+    assert dict(params) == {'a': 1, 'b': 2, 'c': 3, 'd': 4}
+    for key in 'bcd':
+        assert params.get_metadata(key) == ('test_user', time)
+
+    # Like dict.update, keyword arguments are all parameters
+    params.update({'e': 5}, time=10.0, user='x')
+    assert params['e'] == 5
+    assert params['time'] == 10.0
+    assert params['user'] == 'x'
+    assert params.get_metadata('time').user != 'x'
+
+    # Metadata from other parameters is kept
+    other = watts.Parameters()
+    other.update(params)
+    for key in 'abcd':
+        assert other.get_metadata(key) == params.get_metadata(key)
+
+    # Removing a key removes its metadata
+    del other['a']
+    with pytest.raises(KeyError):
+        other.get_metadata('a')
+
+    params.warn_duplicates = True
+    with pytest.warns(UserWarning):
+        params.update(a=5)
+
+
 def test_parameters_show_summary(capsys):
     params = watts.Parameters()
     params['colors'] = ('teal', 'grey', 'blue')
@@ -136,3 +168,55 @@ def test_unit_conversion(run_in_tmpdir):
     assert round(params_cgs["He_cp"], -3) == 51892000.0  # J/g-K
     assert params_cgs["He_Pressure"] == 70_000_000.0     # P/s
     assert params_cgs["Height_FC"] == 200.0              # cm
+
+
+def test_unit_conversion_copies_values():
+    array = np.zeros(10)
+    params = watts.Parameters(array=array, length=Quantity(1.0, 'km'),
+                              nested={'values': [1, 2]}, name='core')
+    converted = params.convert_units()
+
+    # Mutable values are copied so that changing them leaves the original alone
+    converted['array'][0] = 1.0
+    converted['nested']['values'].append(3)
+    assert array[0] == 0.0
+    assert params['nested'] == {'values': [1, 2]}
+    assert converted['name'] is params['name']
+    assert converted['length'] == 1000.0
+    assert params['length'] == Quantity(1.0, 'km')
+    assert converted.get_metadata('length') == params.get_metadata('length')
+    assert converted.get_metadata('array') == params.get_metadata('array')
+
+
+def test_unit_conversion_matches_astropy():
+    import astropy.units as u
+    values = {
+        'length': Quantity(3.0, 'mm'),
+        'length2': Quantity(4.5, 'mm'),
+        'length32': Quantity(np.float32(4.5), 'mm', dtype=np.float32),
+        'inches': Quantity(np.arange(5.0), u.imperial.inch),
+        'celsius': Quantity(600.0, 'Celsius'),
+        'celsius2': Quantity(25.0, 'Celsius'),
+        'fahrenheit': Quantity([32.0, 212.0], u.imperial.deg_F),
+        'kelvin': Quantity(300.0, 'K'),
+        'cp': Quantity(4.9184126, 'BTU/(kg*K)'),
+        'pressure': Quantity(7, 'MPa'),
+        'ratio': Quantity(0.5, u.dimensionless_unscaled),
+        'angle': u.Quantity(90.0, 'deg').to(u.deg),
+        'plain': 1.5,
+    }
+    params = watts.Parameters(values)
+    for system in ('si', 'cgs'):
+        for temperature in ('K', 'Celsius'):
+            converted = params.convert_units(system=system, temperature=temperature)
+            for key, value in values.items():
+                if not isinstance(value, Quantity):
+                    assert converted[key] is value
+                    continue
+                if value.unit.physical_type == 'temperature':
+                    expected = value.to(temperature, equivalencies=u.temperature()).value
+                else:
+                    expected = getattr(value, system).value
+                assert type(converted[key]) is type(expected)
+                np.testing.assert_array_equal(converted[key], expected)
+                assert np.asarray(converted[key]).dtype == np.asarray(expected).dtype
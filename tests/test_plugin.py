@@ -1,8 +1,16 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
-import watts
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+from pathlib import Path
+import sys
+import time
+
+import jinja2
 import pytest
+import watts
 
 
 def test_plugin_output_dir(run_in_tmpdir):
@@ -24,3 +32,282 @@ def test_plugin_output_dir(run_in_tmpdir):
     # Trying the same output directory again should fail
     with pytest.raises(FileExistsError):
         plugin(params, output_dir='funky')
+
+
+def test_plugin_map(run_in_tmpdir):
+    with open('main_template', 'w') as fh:
+        fh.write("{{ x }}")
+    plugin = watts.PluginGeneric(
+        'cat', ['{self.executable}', '{self.input_name}'], 'main_template')
+
+    # Run several sets of parameters concurrently
+    db = watts.Database()
+    n_results = len(db)
+    params = [watts.Parameters(x=x) for x in range(4)]
+    names = [f'x={x}' for x in range(4)]
+    results = list(plugin.map(params, names, max_workers=2))
+
+    # Results should come back in order and be added to the database
+    assert [r.name for r in results] == names
+    for x, result in enumerate(results):
+        assert result.parameters['x'] == x
+        assert result.stdout == str(x)
+        assert result.job_id == db.job_id
+    assert len(db) == n_results + 4
+
+    # Results in completion order should contain the same set
+    results = plugin.map(params, names, max_workers=2, ordered=False)
+    assert sorted(r.name for r in results) == names
+
+
+def test_plugin_submit(run_in_tmpdir):
+    with open('main_template', 'w') as fh:
+        fh.write("{{ x }}")
+    plugin = watts.PluginGeneric(
+        'cat', ['{self.executable}', '{self.input_name}'], 'main_template')
+
+    with ProcessPoolExecutor(1) as executor:
+        future = plugin.submit(executor, watts.Parameters(x=5), output_dir='five')
+        result = future.result()
+    assert result.base_path.name == 'five'
+    assert result.stdout == '5'
+    assert watts.Database()[-1] is result
+
+    # Errors from the worker are propagated through the future
+    with ProcessPoolExecutor(1) as executor:
+        future = plugin.submit(executor, watts.Parameters())
+        with pytest.raises(jinja2.UndefinedError):
+            future.result()
+
+
+def test_plugin_threads(run_in_tmpdir):
+    with open('main_template', 'w') as fh:
+        fh.write("{{ x }}")
+    plugin = watts.PluginGeneric(
+        'cat', ['{self.executable}', '{self.input_name}'], 'main_template')
+
+    # Executions within a single process shouldn't change the working
+    # directory or mix up their output
+    cwd = os.getcwd()
+    params = [watts.Parameters(x=x) for x in range(8)]
+    with ThreadPoolExecutor(4) as executor:
+        results = list(plugin.map(params, executor=executor, verbose=False))
+    assert os.getcwd() == cwd
+    assert [r.stdout for r in results] == [str(x) for x in range(8)]
+    assert len({r.base_path for r in results}) == 8
+
+
+def test_plugin_acall(run_in_tmpdir):
+    with open('main_template', 'w') as fh:
+        fh.write("{{ x }}")
+    plugin = watts.PluginGeneric(
+        'cat', ['{self.executable}', '{self.input_name}'], 'main_template')
+
+    async def main():
+        coros = [plugin.acall(watts.Parameters(x=x), name=f'x={x}')
+                 for x in range(4)]
+        return await asyncio.gather(*coros)
+
+    db = watts.Database()
+    n_results = len(db)
+    results = asyncio.run(main())
+    assert [r.name for r in results] == [f'x={x}' for x in range(4)]
+    assert [r.stdout for r in results] == [str(x) for x in range(4)]
+    assert len(db) == n_results + 4
+
+
+def test_plugin_reuse(run_in_tmpdir, monkeypatch):
+    with open('main_template', 'w') as fh:
+        fh.write("{{ x }}")
+    plugin = watts.PluginGeneric(
+        'cat', ['{self.executable}', '{self.input_name}'], 'main_template')
+    db = watts.Database()
+    n_results = len(db)
+
+    # Identical inputs give back the stored result without running again
+    first = plugin(watts.Parameters(x=1), reuse=True)
+    again = plugin(watts.Parameters(x=1), reuse=True)
+    assert again.base_path == first.base_path
+    assert len(db) == n_results + 1
+
+    # Different parameters, templates, or run arguments are executed
+    assert plugin(watts.Parameters(x=2), reuse=True).base_path != first.base_path
+    with open('main_template', 'w') as fh:
+        fh.write("x = {{ x }}")
+    changed = plugin(watts.Parameters(x=1), reuse=True)
+    assert changed.stdout == 'x = 1'
+    assert plugin(watts.Parameters(x=1), extra_args=['-'], reuse=True).base_path \
+        != changed.base_path
+    assert len(db) == n_results + 4
+
+    # Results are only reused when asked for
+    assert plugin(watts.Parameters(x=1)).base_path != changed.base_path
+    assert len(db) == n_results + 5
+
+    # Reuse works from other executors and for coroutines
+    with ThreadPoolExecutor() as executor:
+        future = plugin.submit(executor, watts.Parameters(x=1), reuse=True)
+        assert future.result().base_path == changed.base_path
+    result = asyncio.run(plugin.acall(watts.Parameters(x=1), reuse=True))
+    assert result.base_path == changed.base_path
+
+    # Input hashes can be forgotten, either explicitly or by limiting them
+    db.clear_input_hashes(plugin='Generic')
+    rerun = plugin(watts.Parameters(x=1), reuse=True)
+    assert rerun.base_path != changed.base_path
+    monkeypatch.setattr(db, 'reuse_max_entries', 1)
+    plugin(watts.Parameters(x=3), reuse=True)
+    assert plugin(watts.Parameters(x=1), reuse=True).base_path != rerun.base_path
+    assert len(db) == n_results + 8
+
+
+def test_plugin_files_renamed(run_in_tmpdir):
+    # Script that writes an output file and records where and how it was written
+    with open('script_template', 'w') as fh:
+        fh.write(
+            "import os\n"
+            "with open('output.dat', 'w') as fh:\n"
+            "    fh.write('{{ x }}')\n"
+            "with open('info.txt', 'w') as fh:\n"
+            "    fh.write(f\"{os.getcwd()}\\n{os.stat('output.dat').st_ino}\")\n"
+        )
+    plugin = watts.PluginGeneric(
+        sys.executable, ['{self.executable}', '{self.input_name}'], 'script_template')
+    db_path = watts.Database().path
+
+    # By default, the code runs in the system's temporary directory
+    result = plugin(watts.Parameters(x=1))
+    cwd, _ = (result.base_path / 'info.txt').read_text().split('\n')
+    assert Path(cwd).parent != db_path / '.staging'
+    assert (result.base_path / 'output.dat').read_text() == '1'
+
+    # When staging in the database, files are moved into the result directory
+    # without being copied
+    plugin.stage_in_database = True
+    result = plugin(watts.Parameters(x=2))
+    cwd, inode = (result.base_path / 'info.txt').read_text().split('\n')
+    assert Path(cwd).parent == db_path / '.staging'
+    assert not Path(cwd).exists()
+    assert (result.base_path / 'output.dat').stat().st_ino == int(inode)
+
+    # Retained working directories are left in the staging area
+    result = plugin(watts.Parameters(x=3), cleanup=False)
+    cwd, _ = (result.base_path / 'info.txt').read_text().split('\n')
+    assert Path(cwd).parent == db_path / '.staging'
+    assert Path(cwd).is_dir()
+
+
+def test_plugin_extra_inputs_linked(run_in_tmpdir):
+    with open('main_template', 'w') as fh:
+        fh.write("{{ x }}")
+    with open('mesh.dat', 'w') as fh:
+        fh.write('mesh')
+    plugin = watts.PluginGeneric(
+        'cat', ['{self.executable}', '{self.input_name}', 'mesh.dat'],
+        'main_template', extra_inputs=['mesh.dat'])
+
+    # Each result has the extra input, but its contents are only stored once
+    first = plugin(watts.Parameters(x=1))
+    second = plugin(watts.Parameters(x=2), reuse=True)
+    assert second.stdout == '2mesh'
+    first_mesh = first.base_path / 'mesh.dat'
+    second_mesh = second.base_path / 'mesh.dat'
+    assert first_mesh in first.inputs
+    assert first_mesh.stat().st_ino == second_mesh.stat().st_ino
+
+    # Digests of extra inputs give the same input hash as hashing the files
+    assert plugin(watts.Parameters(x=2), reuse=True).base_path == second.base_path
+
+
+def test_plugin_extra_inputs_modified(run_in_tmpdir):
+    # Script that modifies its extra input in place
+    with open('script_template', 'w') as fh:
+        fh.write(
+            "import os\n"
+            "print(os.access('mesh.dat', os.W_OK))\n"
+            "if {{ x }} == 2:\n"
+            "    with open('mesh.dat', 'a') as fh:\n"
+            "        fh.write(' refined')\n"
+        )
+    Path('mesh.dat').write_text('mesh')
+    plugin = watts.PluginGeneric(
+        sys.executable, ['{self.executable}', '{self.input_name}'],
+        'script_template', extra_inputs=['mesh.dat'])
+
+    # The code is given a writable copy of the extra input, and modifying it
+    # leaves both the original and the stored copy alone
+    first = plugin(watts.Parameters(x=1))
+    second = plugin(watts.Parameters(x=2))
+    assert first.stdout == second.stdout == 'True\n'
+    assert Path('mesh.dat').read_text() == 'mesh'
+    assert (first.base_path / 'mesh.dat').read_text() == 'mesh'
+    assert (second.base_path / 'mesh.dat').read_text() == 'mesh refined'
+    assert (first.base_path / 'mesh.dat').stat().st_nlink > 1
+    assert (second.base_path / 'mesh.dat').stat().st_nlink == 1
+
+
+def test_openmc_output_discovery(run_in_tmpdir):
+    cwd = Path.cwd()
+    plugin = watts.PluginOpenMC()
+    exec_info = watts.ExecInfo(0, 'OpenMC', '', time.time_ns())
+    Path('OpenMC_log.txt').touch()
+    Path('model.xml').touch()
+    Path('statepoint.5.h5').touch()
+
+    # Files that were present before the run are not outputs
+    with plugin._snapshot(cwd):
+        for name in ['statepoint.10.h5', 'tallies.out', 'notes.txt']:
+            Path(name).touch()
+        result = plugin.postrun(watts.Parameters(), exec_info, cwd=cwd)
+    assert result.inputs == [cwd / 'model.xml']
+    assert result.outputs == [
+        cwd / 'OpenMC_log.txt', cwd / 'tallies.out', cwd / 'statepoint.10.h5']
+
+    # Without a snapshot, files modified before the execution started are
+    # excluded
+    os.utime('statepoint.5.h5', ns=(0, 0))
+    result = plugin.postrun(watts.Parameters(), exec_info, cwd=cwd)
+    assert result.outputs == [
+        cwd / 'OpenMC_log.txt', cwd / 'tallies.out', cwd / 'statepoint.10.h5']
+
+
+def test_plugin_log_compression(run_in_tmpdir):
+    with open('main_template', 'w') as fh:
+        fh.write("{% for i in range(x) %}line {{ i }}\n{% endfor %}")
+    plugin = watts.PluginGeneric(
+        'cat', ['{self.executable}', '{self.input_name}'], 'main_template')
+    plugin.log_compression = 'gzip'
+    plugin.log_max_size = 64
+    result = plugin(watts.Parameters(x=50))
+
+    # The log is rotated and compressed but can still be read as a whole
+    lines = [f'line {i}\n' for i in range(50)]
+    assert (result.base_path / 'Generic_log.txt.gz') in result.outputs
+    assert (result.base_path / 'Generic_log.txt.1.gz') in result.outputs
+    assert ''.join(lines).endswith(result.stdout)
+    assert len(result.stdout) == 64 + len(''.join(lines)) % 64
+    assert result.stdout_tail(2) == lines[-2:]
+    assert list(result.grep_stdout('line 4[89]')) == lines[-2:]
+
+
+def test_openmc_model_builder_cwd(run_in_tmpdir):
+    # The builder exports its inputs to the execution directory, and its return
+    # value is ignored
+    def build(params):
+        Path('geometry.xml').write_text('<geometry/>')
+        return {'cells': 1}
+
+    Path('run').mkdir()
+    plugin = watts.PluginOpenMC(build)
+    plugin.prerun(watts.Parameters(), cwd=Path('run').resolve())
+    assert Path('run', 'geometry.xml').read_text() == '<geometry/>'
+    assert not Path('geometry.xml').exists()
+
+
+def test_openmc_accepts_cwd():
+    from watts.plugin_openmc import _accepts_cwd
+    assert _accepts_cwd(lambda cwd=None: None)
+    assert not _accepts_cwd(lambda: None)
+
+    # Builtins without a signature are run by changing directory
+    assert not _accepts_cwd(max)
@@ -0,0 +1,123 @@
+# SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
+# SPDX-License-Identifier: MIT
+
+import json
+from pathlib import Path
+import sys
+import textwrap
+import threading
+
+import pytest
+import watts
+from watts.plugin_dakota import DakotaEvaluationServer, _evaluate_on_server
+
+
+# Stand-in for Dakota's interfacing library that reads variables from
+# params.in and writes responses to results.out
+FAKE_INTERFACING = """
+import json
+from types import SimpleNamespace
+
+class Results(list):
+    def __iter__(self):
+        for i, r in enumerate(list.__iter__(self)):
+            yield i, f'f{i}', r
+
+    def write(self):
+        with open('results.out', 'w') as fh:
+            json.dump([r.function for _, _, r in self], fh)
+
+def read_parameters_file():
+    with open('params.in') as fh:
+        data = json.load(fh)
+    params = SimpleNamespace(_variables=data['variables'])
+    results = Results(
+        SimpleNamespace(asv=SimpleNamespace(function=True), function=None)
+        for _ in range(data['responses'])
+    )
+    return params, results
+"""
+
+FAKE_DAKOTA = """#!{python}
+import json
+import sys
+sys.path.insert(0, {path!r})
+with open('params.in', 'w') as fh:
+    json.dump({{'variables': {{'x': 3.0, 'y': 4.0}}, 'responses': 2}}, fh)
+from watts.plugin_dakota import run_dakota_driver
+run_dakota_driver()
+"""
+
+
+def test_evaluation_server_concurrent(monkeypatch):
+    # Both evaluations must be in progress at once to pass the barrier
+    barrier = threading.Barrier(2, timeout=10)
+    def evaluate(variables):
+        barrier.wait()
+        return [variables['x'] ** 2]
+
+    retvals = {}
+    def client(x):
+        retvals[x] = _evaluate_on_server({'x': x}, env['WATTS_DAKOTA_SERVER'])
+
+    with DakotaEvaluationServer(evaluate) as server:
+        env = server.environment
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        threads = [threading.Thread(target=client, args=(x,)) for x in (2.0, 3.0)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert retvals == {2.0: {'fns': [4.0]}, 3.0: {'fns': [9.0]}}
+
+
+def test_evaluation_server_descriptors(monkeypatch):
+    # Output can also be given as parameters with 'dakota_descriptors'
+    def evaluate(variables):
+        params = watts.Parameters(area=variables['x'] * variables['y'])
+        params['dakota_descriptors'] = {'A': 'area', 'X': 'x'}
+        params['x'] = variables['x']
+        return params
+
+    def failing(variables):
+        raise ValueError('bad variables')
+
+    with DakotaEvaluationServer(evaluate) as server:
+        for key, value in server.environment.items():
+            monkeypatch.setenv(key, value)
+        retval = _evaluate_on_server({'x': 2.0, 'y': 5.0}, server.environment['WATTS_DAKOTA_SERVER'])
+    assert retval == {'fns': [10.0, 2.0]}
+
+    with DakotaEvaluationServer(failing) as server:
+        for key, value in server.environment.items():
+            monkeypatch.setenv(key, value)
+        with pytest.raises(RuntimeError, match='bad variables'):
+            _evaluate_on_server({'x': 2.0}, server.environment['WATTS_DAKOTA_SERVER'])
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='requires executable script')
+def test_plugin_dakota_evaluate(run_in_tmpdir):
+    # Create fake interfacing library and a fake Dakota that runs the driver
+    lib = Path('lib').resolve()
+    (lib / 'interfacing').mkdir(parents=True)
+    (lib / 'interfacing' / '__init__.py').touch()
+    (lib / 'interfacing' / 'interfacing.py').write_text(FAKE_INTERFACING)
+    dakota = Path('dakota.sh').resolve()
+    dakota.write_text(FAKE_DAKOTA.format(python=sys.executable, path=str(lib)))
+    dakota.chmod(0o755)
+    Path('dakota.in').write_text('variables {{ n }}')
+
+    calls = []
+    def evaluate(variables):
+        calls.append(variables)
+        return [variables['x'] + variables['y'], variables['x'] * variables['y']]
+
+    plugin = watts.PluginDakota('dakota.in', executable=dakota, evaluate=evaluate)
+    result = plugin(watts.Parameters(n=2))
+
+    # The evaluation ran in this process and its responses reached "Dakota"
+    assert calls == [{'x': 3.0, 'y': 4.0}]
+    assert json.loads((result.base_path / 'results.out').read_text()) == [7.0, 12.0]
+    assert not (result.base_path / 'params.json').exists()
@@ -4,6 +4,7 @@
 from pathlib import Path
 import os
 
+import numpy as np
 import pytest
 import watts
 
@@ -75,6 +76,11 @@ def test_openmc_plugin():
     # nu-fission/absorption > keff since there's leakage
     assert nu_fission / absorption > result.keff.n
 
+    # Extracted tally data matches the tally objects
+    tally = result.tallies[0]
+    assert result.tally_data[tally.id]['scores'] == tally.scores
+    np.testing.assert_allclose(result.tally_data[tally.id]['mean'], tally.mean)
+
     # Make sure result was added to database and agrees
     db = watts.Database()
     last_result = db[-1]
@@ -0,0 +1,123 @@
+# SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
+# SPDX-License-Identifier: MIT
+
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import pytest
+import watts
+
+
+PLOTFL = """\
+plotinf      3      4
+plotalf  time  p  p
+  tempf
+plotnum  0  010010000  020010000
+  010010000
+plotrec  0.000000e+00  1.000000e+05  2.000000e+05
+  3.000000e+02
+plotrec  1.000000e+00  1.500000e+05  2.500000e+05
+  3.500000e+02
+plotrec  2.000000e+00  1.750000e+05  2.750000e+05
+  3.750000e+02
+"""
+
+
+FAKE_RELAP5 = """#!{python}
+from pathlib import Path
+# RELAP5 needs its license key in the directory where it is run
+assert Path('license.key').read_text() == 'key'
+Path('plotfl').write_text({plotfl!r})
+"""
+
+
+def convert_plotfl(text):
+    Path('plotfl').write_text(text)
+    plugin = watts.PluginRELAP5.__new__(watts.PluginRELAP5)
+    plugin._plotfl_to_csv(Path.cwd())
+
+
+def test_plotfl_to_csv(run_in_tmpdir):
+    convert_plotfl(PLOTFL)
+    assert Path('R5-out.csv').read_text().splitlines() == [
+        ',time-0,p-010010000,p-020010000,tempf-010010000',
+        'value_t_0,0.0,100000.0,200000.0,300.0',
+        'value_t_1,1.0,150000.0,250000.0,350.0',
+        'value_t_2,2.0,175000.0,275000.0,375.0',
+    ]
+
+    # Data is read from the binary file and matches reading the CSV file
+    exec_info = watts.ExecInfo(1, 'RELAP5', 'pipe', time.time_ns())
+    outputs = [Path('R5-out.csv'), Path('R5-out.npy')]
+    results = watts.ResultsRELAP5(watts.Parameters(), exec_info, [], outputs)
+    np.testing.assert_equal(results.csv_data['time-0'], [0.0, 1.0, 2.0])
+    np.testing.assert_equal(results.csv_data['p-020010000'], [2.0e5, 2.5e5, 2.75e5])
+    np.testing.assert_equal(results.csv_data['tempf-010010000'], [300.0, 350.0, 375.0])
+
+    Path('R5-out.npy').unlink()
+    from_csv = watts.ResultsRELAP5(watts.Parameters(), exec_info, [], outputs[:1])
+    assert list(from_csv.csv_data) == list(results.csv_data)
+    for key, value in from_csv.csv_data.items():
+        np.testing.assert_equal(results.csv_data[key], value)
+
+
+def test_plotfl_incomplete_record(run_in_tmpdir):
+    with pytest.raises(RuntimeError, match='incomplete record'):
+        convert_plotfl(PLOTFL[:-len('  3.750000e+02\n')])
+
+
+def fake_relap5(script):
+    # Create a fake RELAP5 installation with a license key
+    relap5_dir = Path('relap5').resolve()
+    relap5_dir.mkdir()
+    executable = relap5_dir / 'relap5.x'
+    executable.write_text(script)
+    executable.chmod(0o755)
+    (relap5_dir / 'license.key').write_text('key')
+    Path('relap5_template').write_text('{{ x }}')
+    return executable
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='requires executable script')
+@pytest.mark.parametrize('runtime_files', ['link', 'symlink', 'copy'])
+def test_runtime_files(run_in_tmpdir, runtime_files):
+    executable = fake_relap5(FAKE_RELAP5.format(python=sys.executable, plotfl=PLOTFL))
+    relap5_dir = executable.parent
+
+    plugin = watts.PluginRELAP5(
+        'relap5_template', executable=executable, runtime_files=runtime_files)
+    result = plugin(watts.Parameters(x=1))
+    np.testing.assert_equal(result.csv_data['time-0'], [0.0, 1.0, 2.0])
+
+    # Linked runtime files are not stored with the results
+    names = {p.name for p in result.outputs}
+    stored = runtime_files == 'copy'
+    assert ('license.key' in names) == stored
+    assert ('relap5.x' in names) == stored
+    assert (result.base_path / 'license.key').exists() == stored
+    assert (relap5_dir / 'license.key').read_text() == 'key'
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='requires executable script')
+def test_runtime_files_failed_run(run_in_tmpdir):
+    # Links are removed even if RELAP5 fails and postrun is never called
+    executable = fake_relap5(f"#!{sys.executable}\nraise SystemExit(1)\n")
+    plugin = watts.PluginRELAP5('relap5_template', executable=executable)
+    assert plugin.runtime_files == 'symlink'
+    Path('run').mkdir()
+    plugin.run(cwd=Path('run'))
+    assert list(Path('run').iterdir()) == []
+
+    # A file RELAP5 replaced rather than wrote through the link is kept
+    executable.write_text(
+        f"#!{sys.executable}\n"
+        "import os\n"
+        "os.remove('license.key')\n"
+        "open('license.key', 'w').write('new')\n"
+        "raise SystemExit(1)\n"
+    )
+    plugin.run(cwd=Path('run'))
+    assert [p.name for p in Path('run').iterdir()] == ['license.key']
+    assert (executable.parent / 'license.key').read_text() == 'key'
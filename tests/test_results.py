@@ -62,6 +62,56 @@ def test_results_openmc(run_in_tmpdir):
     assert new_results.stdout == results.stdout
 
 
+def test_results_openmc_statepoint_cache(run_in_tmpdir, monkeypatch):
+    from watts import plugin_openmc
+
+    # Stand in for reading an actual statepoint file
+    calls = []
+    def read_statepoint(path):
+        calls.append(path)
+        return {'keff': (1.25, 0.01), 'tallies': {
+            1: {'name': 'flux', 'scores': ['flux'], 'nuclides': ['total'],
+                'mean': np.full((4, 1, 1), 2.0), 'std_dev': np.full((4, 1, 1), 0.1)}
+        }}
+    monkeypatch.setattr(plugin_openmc, '_read_statepoint', read_statepoint)
+    plugin_openmc._statepoint_cache.clear()
+
+    sp = Path('statepoint.10.h5')
+    sp.write_bytes(b'fake statepoint')
+    exec_info = watts.ExecInfo(1, 'OpenMC', 'cached', time.time_ns())
+    results = watts.ResultsOpenMC(watts.Parameters(), exec_info, [], [sp])
+    assert results.keff.n == 1.25
+    assert results.keff.s == 0.01
+    tally = results.tally_data[1]
+    assert tally['scores'] == ['flux']
+    np.testing.assert_equal(tally['mean'], np.full((4, 1, 1), 2.0))
+    assert len(calls) == 1
+
+    # Other results for the same statepoint share the in-memory cache
+    other = watts.ResultsOpenMC(watts.Parameters(), exec_info, [], [sp])
+    assert other.keff.n == 1.25
+    assert len(calls) == 1
+
+    # Without the in-memory cache, data is loaded from the persisted file
+    plugin_openmc._statepoint_cache.clear()
+    assert (Path('.statepoint_cache') / 'statepoint.10.h5.npz').is_file()
+    np.testing.assert_equal(other.tally_data[1]['std_dev'], np.full((4, 1, 1), 0.1))
+    assert other.tally_data[1]['name'] == 'flux'
+    assert len(calls) == 1
+
+    # The statepoint is read again once it changes
+    sp.write_bytes(b'new fake statepoint')
+    assert results.keff.n == 1.25
+    assert len(calls) == 2
+
+    # Data exceeding the memory limit isn't kept in memory
+    monkeypatch.setattr(watts.ResultsOpenMC, 'statepoint_cache_bytes', 0)
+    plugin_openmc._statepoint_cache.clear()
+    results.keff
+    assert plugin_openmc._statepoint_cache.get(
+        (str(sp.resolve()), sp.stat().st_size, sp.stat().st_mtime_ns)) is None
+
+
 def test_results_moose(run_in_tmpdir):
     params = watts.Parameters(city='Chicago', population=2.7e6)
     name = 'Elk'
@@ -119,6 +169,52 @@ prop1,prop2
     assert new_results.stdout == results.stdout
 
 
+def test_results_moose_lazy(run_in_tmpdir):
+    exec_info = watts.ExecInfo(1, 'MOOSE', 'Elk', time.time_ns())
+    moose_inp = Path('MOOSE.i')
+    moose_inp.touch()
+
+    # Main output and a vector postprocessor output
+    csv = Path('MOOSE_csv.csv')
+    csv.write_text('time,temp\n0.0,300.0\n1.0,350.0\n')
+    vpp = Path('MOOSE_csv_line_0001.csv')
+    vpp.write_text('id,temp,x,y,z\n0,1.5,0.0,0.0,0.0\n1,2.5,0.5,0.0,0.0\n')
+    outputs = [csv, vpp]
+
+    results = watts.ResultsMOOSE(watts.Parameters(), exec_info, [moose_inp], outputs)
+    csv_data = results.csv_data
+    assert list(csv_data) == [
+        'time', 'temp', 'MOOSE_csv_line_0001', 'MOOSE_csv_line_id',
+        'MOOSE_csv_line_x', 'MOOSE_csv_line_y', 'MOOSE_csv_line_z'
+    ]
+
+    # Columns are only read on access and are then cached in binary files
+    cache_dir = Path('.csv_cache')
+    assert not cache_dir.exists()
+    np.testing.assert_equal(csv_data['temp'], [300.0, 350.0])
+    np.testing.assert_equal(csv_data['MOOSE_csv_line_0001'], [1.5, 2.5])
+    np.testing.assert_equal(csv_data['MOOSE_csv_line_id'], [0.0, 1.0])
+    assert (cache_dir / 'MOOSE_csv.csv' / 'index.json').is_file()
+    assert (cache_dir / 'MOOSE_csv_line_0001.csv' / 'index.json').is_file()
+
+    # Data isn't pickled and is read from the cache when loaded again
+    p = Path('myresults.pkl')
+    results.save(p)
+    new_results = watts.Results.from_pickle(p)
+    assert new_results._csv_data is None
+    assert isinstance(new_results.csv_data['time'], np.memmap)
+    np.testing.assert_equal(new_results.csv_data['time'], [0.0, 1.0])
+
+    # Columns can be modified in place without changing the cache
+    new_results.csv_data['time'][0] = 5.0
+    assert watts.Results.from_pickle(p).csv_data['time'][0] == 0.0
+
+    # Cached columns aren't used once the CSV file changes
+    csv.write_text('time,temp,power\n0.0,300.0,10.0\n1.0,350.0,20.0\n2.0,375.0,30.0\n')
+    newer = watts.Results.from_pickle(p)
+    np.testing.assert_equal(newer.csv_data['power'], [10.0, 20.0, 30.0])
+
+
 def test_results_sas(run_in_tmpdir):
     params = watts.Parameters(city='Chicago', population=2.7e6)
     plugin = 'SAS'
@@ -291,3 +387,56 @@ prop1  prop2
     assert new_results.inputs == results.inputs
     assert new_results.outputs == results.outputs
     assert new_results.stdout == results.stdout
+
+
+def test_results_separate_arrays(run_in_tmpdir):
+    exec_info = watts.ExecInfo(1, 'Generic', 'arrays', time.time_ns())
+    big = np.linspace(0.0, 1.0, 10_000)
+    small = np.array([1.0, 2.0])
+    params = watts.Parameters(big=big, small=small)
+    results = watts.Results(params, exec_info, [], [])
+    results.output_data = {'nested': {'big': big * 2}, 'small': small}
+
+    # Large arrays are stored outside of the pickle
+    p = Path('results.pkl')
+    results.save(p, separate_arrays=True)
+    array_dir = Path('.result_arrays', 'results.pkl')
+    array_files = sorted(array_dir.iterdir())
+    assert len(array_files) == 2
+    assert p.stat().st_size < big.nbytes
+
+    # Saving again reuses files of unchanged arrays, arrays referenced twice
+    # are stored once, and arrays that are no longer referenced are removed
+    results.output_data['again'] = results.output_data['nested']['big']
+    results.save(p, separate_arrays=True)
+    assert sorted(array_dir.iterdir()) == array_files
+    results.output_data['nested']['big'] = big * 3
+    results.save(p, separate_arrays=True)
+    assert len(list(array_dir.iterdir())) == 3
+    del results.output_data['again']
+    results.output_data['nested']['big'] = big * 2
+    results.save(p, separate_arrays=True)
+    assert sorted(array_dir.iterdir()) == array_files
+    assert not list(Path.cwd().glob('*.tmp'))
+
+    # Arrays are memory-mapped on access and can still be modified in memory
+    new_results = watts.Results.from_pickle(p)
+    big_data = new_results.output_data['nested']['big']
+    np.testing.assert_equal(big_data, big * 2)
+    np.testing.assert_equal(new_results.parameters['big'], big)
+    np.testing.assert_equal(new_results.output_data['small'], small)
+    big_data[0] = -1.0
+    np.testing.assert_equal(watts.Results.from_pickle(p).output_data['nested']['big'], big * 2)
+
+    # Results saved to a database use separate arrays
+    db = watts.Database('array_db')
+    results.base_path = db.path / 'result'
+    results.base_path.mkdir()
+    db.add_result(results)
+    array_dir = results.base_path / '.result_arrays' / '.result_info.pkl'
+    assert len(list(array_dir.glob('*.npy'))) == 2
+    np.testing.assert_equal(db[0].output_data['nested']['big'], big * 2)
+
+    # Removing the result removes its arrays
+    db.remove(db[0])
+    assert not array_dir.exists()
@@ -1,6 +1,9 @@
 # SPDX-FileCopyrightText: 2022-2023 UChicago Argonne, LLC
 # SPDX-License-Identifier: MIT
 
+from pathlib import Path
+
+import dill
 import watts
 import jinja2
 import pytest
@@ -47,3 +50,29 @@ def test_extra_template_inputs(run_in_tmpdir):
     with open('extra_template', 'r') as fh:
         rendered = fh.read()
     assert rendered == '2'
+
+
+def test_template_cache(run_in_tmpdir):
+    with open('template', 'w') as fh:
+        fh.write("{{ x }}")
+    renderer = watts.TemplateRenderer('template', bytecode_cache='bytecode')
+
+    # The compiled template is reused while the file is unchanged
+    renderer(watts.Parameters(x=1), 'out1')
+    template = renderer._template
+    renderer(watts.Parameters(x=2), 'out2')
+    assert renderer._template is template
+    assert open('out2').read() == '2'
+    assert list(Path('bytecode').iterdir())
+
+    # Changing the file causes it to be compiled again
+    with open('template', 'w') as fh:
+        fh.write("x = {{ x }}")
+    renderer(watts.Parameters(x=3), 'out3')
+    assert renderer._template is not template
+    assert open('out3').read() == 'x = 3'
+
+    # Renderers can be pickled after rendering
+    clone = dill.loads(dill.dumps(renderer))
+    clone(watts.Parameters(x=4), 'out4')
+    assert open('out4').read() == 'x = 4'